@@ -5,40 +5,351 @@ Main application file with API endpoints
 This backend provides RESTful APIs for:
 1. Health check
 2. Image upload and metadata storage
-3. Dummy CHI generation
+3. CHI analysis (vegetation segmentation pipeline)
 4. Results retrieval
 5. Temporal comparison
+6. Parallel batch analysis
+7. Background jobs with progress polling
+8. Model versions with hot swapping
 
 Author: UCHI Development Team
 Date: January 2026
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, Response
 from flask_cors import CORS
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
-from pathlib import Path
-import io
+import json
+import mimetypes
+import shutil
+import tempfile
+import threading
+import zipfile
+import zlib
 
 # Import modules
-from database import Database
-from chi_generator import CHIGenerator
+from database import get_database
 from config import Config
-from supabase_client import get_supabase
+from storage import get_storage
+from jobs import JobQueue, JOB_STATUSES
+from result_cache import ResultCache
+from read_cache import get_read_cache, region_tags
+from ingest import spool_upload, IngestError
+from startup import lazy_import, import_report
+import model_registry
+
+# The analysis pipeline (preprocessing, vegetation_detection, chi_calculation
+# and their NumPy/model runtime imports) loads on first use or in warm_up(),
+# so importing this module stays fast
+pipeline = lazy_import('pipeline')
+artifacts = lazy_import('artifacts')
+batching = lazy_import('batching')
+
+
+
+class UploadRequest(Request):
+    """Request whose body limit depends on the endpoint"""
+    
+    @property
+    def max_content_length(self):
+        # A batch carries many files; each one is still held to
+        # MAX_FILE_SIZE while it is spooled (_spool_batch)
+        if self.endpoint == 'upload_batch':
+            return Config.MAX_BATCH_REQUEST_SIZE
+        return super().max_content_length
 
-# Import AI placeholder modules
-# These will be implemented with actual AI logic later
-import preprocessing
-import vegetation_detection
-import chi_calculation
 
 app = Flask(__name__)
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_FILE_SIZE
 CORS(app)  # Enable CORS for frontend communication
 
 # Initialize components
-db = Database()  # Now uses Supabase
-chi_gen = CHIGenerator()
-supabase = get_supabase()  # Supabase client for Storage
+db = get_database()  # Supabase or local SQLite (Config.DATABASE_BACKEND)
+storage = get_storage()  # Supabase Storage or local directory (Config.STORAGE_BACKEND)
+
+os.makedirs(Config.DATA_FOLDER, exist_ok=True)
+# Jobs of the previous run are settled by the serving process, see recover_jobs()
+job_queue = JobQueue(Config.JOB_DB_PATH, max_workers=Config.JOB_WORKERS,
+                     recover_interrupted=False)
+result_cache = ResultCache(Config.RESULT_CACHE_PATH, max_entries=Config.RESULT_CACHE_MAX_ENTRIES)
+read_cache = get_read_cache()  # dashboard reads, in-process or Redis (Config.READ_CACHE_URL)
+_writer = None  # write-behind buffer, see _get_writer()
+_writer_pid = None
+_writer_lock = threading.Lock()
+_io_pool = None  # storage uploads, see _get_io_pool()
+_io_pool_pid = None
+_io_pool_lock = threading.Lock()
+_warm = False
+_warm_lock = threading.Lock()
+
+VALID_SUB_REGIONS = ['Campus', 'Sports Ground', 'Parking', 'Hostel', 'Roadside']
+
+
+def warm_up():
+    """
+    Load the analysis pipeline and segmentation models (idempotent)
+    
+    Runs at startup of `python app.py`. Preforking servers should call it
+    in the master before forking so workers inherit the loaded modules and
+    models; otherwise the first analysis or model request in each process
+    runs it. Supabase clients are not created here: they hold sockets and
+    are opened per process on first use.
+    """
+    global _warm
+    with _warm_lock:
+        if not _warm:
+            model_registry.warm_up()
+            pipeline.pipeline_version()  # executes the lazily bound pipeline modules
+            artifacts.ArtifactStore(Config.ARTIFACT_PATH).purge_pending()
+            _warm = True
+
+
+def ai_module_ready():
+    """
+    Whether warm_up() has loaded the pipeline and a segmentation model is active
+    
+    Never loads anything, so /health stays cheap; with --no-warm-up it is
+    False until the first analysis.
+    """
+    return _warm and bool(model_registry.get_registry().active_versions())
+
+
+def shutdown():
+    """
+    Drain background work before the process exits (gunicorn worker_exit hook)
+    
+    Waits for running jobs, flushes the write-behind buffer, then stops the
+    storage upload pool, the batch pool and the segmentation batcher.
+    """
+    job_queue.shutdown(wait=True)
+    with _io_pool_lock:
+        if _io_pool is not None and _io_pool_pid == os.getpid():
+            _io_pool.shutdown(wait=True)
+    with _writer_lock:
+        if _writer is not None and _writer_pid == os.getpid():
+            _writer.shutdown(wait=True)
+    if _warm:
+        pipeline.shutdown()
+        import vegetation_detection
+        batcher = vegetation_detection.get_batcher()
+        if batcher is not None:
+            batcher.shutdown(wait=True)
+
+
+def _validate_fields(area_type, sub_region, date):
+    """Validate area_type / sub_region / date form fields, returning an error message or None"""
+    if area_type not in ['Bengaluru', 'RVCE']:
+        return 'Invalid area_type. Must be Bengaluru or RVCE'
+    if area_type == 'RVCE' and sub_region not in VALID_SUB_REGIONS:
+        return f'Invalid sub_region. Must be one of: {VALID_SUB_REGIONS}'
+    # Checked here so one bad row never reaches (and fails) a batched insert
+    try:
+        datetime.strptime(date or '', '%Y-%m-%d')
+    except ValueError:
+        return 'Invalid date. Must be YYYY-MM-DD'
+    return None
+
+
+def _upload_to_storage(storage_path, file_path, content_type, digest=None):
+    """
+    Stream a local file to the configured storage backend (failures are logged, not fatal)
+    
+    Returns:
+        Path the object was stored under (content-addressed for local storage)
+    """
+    try:
+        return storage.upload_file(storage_path, file_path, content_type, digest=digest)
+    except Exception as upload_error:
+        print(f"⚠️  Storage upload warning: {upload_error}")
+        # Continue anyway - storage might already exist or be configured differently
+        return storage_path
+
+
+def _get_io_pool():
+    """
+    Get this process's thread pool for storage uploads
+    
+    Uploads run here while the request thread analyzes the same image.
+    Created lazily, and again after a fork (threads do not survive it).
+    """
+    global _io_pool, _io_pool_pid
+    with _io_pool_lock:
+        if _io_pool is None or _io_pool_pid != os.getpid():
+            _io_pool = ThreadPoolExecutor(max_workers=Config.STORAGE_UPLOAD_WORKERS,
+                                          thread_name_prefix='uchi-storage')
+            _io_pool_pid = os.getpid()
+        return _io_pool
+
+
+def _discard_upload(upload):
+    """
+    Compensate a storage upload whose analysis or database insert failed
+    
+    Waits for the upload to finish (callers remove the spool file after
+    this returns), then deletes the orphaned object. Objects of
+    content-addressed backends may back other uploads and are kept.
+    """
+    try:
+        storage_path = upload.result()
+    except Exception:
+        return  # nothing was stored
+    if storage.content_addressed:
+        return
+    try:
+        storage.delete(storage_path)
+    except Exception as e:
+        print(f"⚠️  Could not remove orphaned upload {storage_path}: {e}")
+
+
+def _get_writer():
+    """
+    Get this process's write-behind buffer for analysis results
+    
+    Saves from concurrent requests, jobs and batch streams are flushed
+    together through Database.insert_analyses (one round trip per flush
+    instead of two per image). Created lazily, and again after a fork.
+    """
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = batching.MicroBatcher(
+                _insert_analyses,
+                max_batch_size=Config.WRITE_BATCH_MAX_SIZE,
+                max_wait_ms=Config.WRITE_BATCH_MAX_WAIT_MS,
+                name='uchi-write',
+                collate=list
+            )
+            _writer_pid = os.getpid()
+        return _writer
+
+
+def _insert_analyses(analyses):
+    """Write-behind flush: insert, then invalidate cached reads of the written regions"""
+    try:
+        return db.insert_analyses(analyses)
+    finally:
+        _invalidate_reads(analyses)
+
+
+def _invalidate_reads(analyses):
+    """Drop cached dashboard reads that the given insert_analyses items change"""
+    tags = set()
+    for analysis in analyses:
+        tags.update(region_tags(analysis['area_type'], analysis['sub_region']))
+    read_cache.invalidate(tags)
+
+
+def _queue_result(filename, storage_path, area_type, sub_region, date, analysis):
+    """
+    Queue image metadata and CHI result for the next write-behind flush
+    
+    Returns:
+        Future resolving to (image_id, result_id); pass it to _finish_result
+    """
+    return _get_writer().submit(
+        _analysis_record(filename, storage_path, area_type, sub_region, date, analysis)
+    )
+
+
+def _analysis_record(filename, storage_path, area_type, sub_region, date, analysis):
+    """Database.insert_analyses item for one analysis"""
+    return {
+        'filename': filename,
+        'storage_path': storage_path,  # Storage backend path
+        'area_type': area_type,
+        'sub_region': sub_region,
+        'date': date,
+        'chi_value': analysis['chi_value'],
+        'status': analysis['status'],
+        'interpretation': analysis['interpretation'],
+        'vegetation_coverage': analysis['vegetation_coverage'],
+        'healthy_vegetation': analysis['healthy_vegetation'],
+        'stressed_vegetation': analysis['stressed_vegetation']
+    }
+
+
+def _finish_result(ids, area_type, sub_region, date, analysis):
+    """Move the pending artifact under the new image id and build the API response dict"""
+    image_id, result_id = ids
+    
+    pending = analysis.get('artifact')
+    if pending is not None and image_id > 0:
+        try:
+            artifacts.ArtifactStore(Config.ARTIFACT_PATH).adopt(image_id, pending)  # for rescore.py
+        except Exception as e:
+            # The result is still valid; only later re-scoring of this image is lost
+            print(f"⚠️  Could not store artifact for image {image_id}: {e}")
+            _discard_artifact(analysis)
+    elif pending is not None:
+        _discard_artifact(analysis)
+    
+    return {
+        'id': result_id,
+        'imageId': image_id,
+        'areaType': area_type,
+        'subRegion': sub_region,
+        'chiValue': analysis['chi_value'],
+        'status': analysis['status'],
+        'interpretation': analysis['interpretation'],
+        'date': date,
+        'vegetationCoverage': round(analysis['vegetation_coverage'], 2),
+        'healthyVegetation': round(analysis['healthy_vegetation'], 2),
+        'stressedVegetation': round(analysis['stressed_vegetation'], 2)
+    }
+
+
+def _discard_artifact(analysis):
+    """Remove the pending artifact of an analysis that is not being stored"""
+    if isinstance(analysis, dict) and analysis.get('artifact') is not None:
+        artifacts.discard_pending(analysis['artifact'])
+
+
+def _save_result(filename, storage_path, area_type, sub_region, date, analysis):
+    """
+    Store image metadata and CHI result, returning the API response dict
+    
+    Args:
+        analysis: Dict with chi_value, status, interpretation, vegetation_coverage,
+                  healthy_vegetation and stressed_vegetation (and optionally
+                  the pending artifact to move under the new image id)
+    """
+    try:
+        ids = _queue_result(filename, storage_path, area_type, sub_region, date, analysis).result()
+    except Exception:
+        _discard_artifact(analysis)
+        raise
+    return _finish_result(ids, area_type, sub_region, date, analysis)
+
+
+def _pipeline_version():
+    """Version part of the result cache key (pipeline + active model versions)"""
+    warm_up()  # the key depends on the active model versions
+    return pipeline.pipeline_version()
+
+
+def _cache_region(area_type, sub_region, date):
+    """
+    Region part of the result cache key
+    
+    Includes the capture date: a hit skips the inserts, so the same image
+    uploaded for another date must still get its own rows.
+    """
+    return f"{area_type}/{sub_region or ''}@{date}"
+
+
+def _cache_result(digest, area_type, sub_region, date, result):
+    """Remember a stored result for duplicate uploads (only if both inserts succeeded)"""
+    if digest and result['id'] != -1 and result['imageId'] != -1:
+        result_cache.put(digest, _pipeline_version(), _cache_region(area_type, sub_region, date), result)
+
+
+def _allowed_file(filename):
+    """Check file extension against Config.ALLOWED_EXTENSIONS"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
 
 @app.route('/health', methods=['GET'])
@@ -49,6 +360,7 @@ def health_check():
     
     Returns:
         JSON with status, timestamp, version, and service availability
+        (aiModule: pipeline and segmentation model loaded, see ai_module_ready)
     """
     return jsonify({
         'status': 'healthy',
@@ -56,8 +368,8 @@ def health_check():
         'version': '1.0.0',
         'services': {
             'database': db.is_connected(),
-            'storage': supabase is not None,
-            'aiModule': False  # Will be True when AI is integrated
+            'storage': storage.is_available(),
+            'aiModule': ai_module_ready()
         }
     }), 200
 
@@ -69,144 +381,553 @@ def upload_image():
     POST /upload-image
     
     Expected form data:
-        - file: Image file (.jpg or .png)
+        - file: Image file (.jpg, .png or .tif)
         - area_type: "Bengaluru" or "RVCE"
         - sub_region: (optional) RVCE sub-region
         - date: Date of image capture (YYYY-MM-DD)
+        - async: (optional) "true" to queue the analysis as a background job
+    
+    Large files can instead be sent as the raw request body with an image/*
+    Content-Type, passing filename, area_type, sub_region, date and async as
+    query parameters. Either way the body is streamed to disk in chunks
+    (hashed and signature-checked on the fly), never read into memory.
     
     Returns:
-        JSON with CHI result
+        JSON with CHI result (201), or with async=true a job id (202) to
+        poll via GET /jobs/<job_id>
         
-    Future integration:
-        1. preprocessing.py - normalize and prepare image
+    Pipeline (pipeline.analyze_image):
+        1. preprocessing.py - tile and normalize the image
         2. vegetation_detection.py - detect and segment vegetation
-        3. chi_calculation.py - calculate actual CHI from vegetation data
+        3. chi_calculation.py - calculate CHI from vegetation data
     """
     try:
-        # Validate request
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
+        if request.mimetype.startswith('image/'):
+            # Raw body upload: metadata travels in the query string
+            fields = request.args
+            filename = os.path.basename(fields.get('filename', ''))
+            content_type = request.mimetype
+            stream = request.stream
+        else:
+            # Validate request
+            if 'file' not in request.files:
+                return jsonify({'error': 'No file provided'}), 400
+            
+            file = request.files['file']
+            fields = request.form
+            filename = file.filename
+            content_type = file.content_type
+            stream = file.stream
         
-        file = request.files['file']
-        if file.filename == '':
+        if not filename:
             return jsonify({'error': 'No file selected'}), 400
         
         # Get metadata
-        area_type = request.form.get('area_type')
-        sub_region = request.form.get('sub_region')
-        date = request.form.get('date')
+        area_type = fields.get('area_type')
+        sub_region = fields.get('sub_region')
+        date = fields.get('date')
         
-        # Validate area type
-        if area_type not in ['Bengaluru', 'RVCE']:
-            return jsonify({'error': 'Invalid area_type. Must be Bengaluru or RVCE'}), 400
+        # Validate area type / RVCE sub-region / capture date
+        error = _validate_fields(area_type, sub_region, date)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Validate RVCE sub-region if provided
-        valid_sub_regions = ['Campus', 'Sports Ground', 'Parking', 'Hostel', 'Roadside']
-        if area_type == 'RVCE' and sub_region not in valid_sub_regions:
-            return jsonify({'error': f'Invalid sub_region. Must be one of: {valid_sub_regions}'}), 400
-        
-        # Upload to Supabase Storage
-        filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-        storage_path = f"{area_type}/{filename}"
-        
-        # Read file content
-        file_content = file.read()
-        
-        # Upload to Supabase Storage bucket
+        # Stream the body to a spool file, hashing and checking the signature as it arrives
         try:
-            supabase.storage.from_(Config.SUPABASE_STORAGE_BUCKET).upload(
-                storage_path,
-                file_content,
-                {"content-type": file.content_type}
-            )
-        except Exception as upload_error:
-            print(f"⚠️  Storage upload warning: {upload_error}")
-            # Continue anyway - storage might already exist or be configured differently
-        
-        # TODO: AI Integration Point
-        # Uncomment and implement when AI modules are ready
-        # ---------------------------------------------------
-        # Step 1: Preprocess image
-        # processed_image = preprocessing.preprocess_image(filepath)
-        
-        # Step 2: Detect vegetation
-        # vegetation_mask = vegetation_detection.detect_vegetation(processed_image)
-        
-        # Step 3: Calculate CHI
-        # chi_data = chi_calculation.calculate_chi(processed_image, vegetation_mask)
-        # ---------------------------------------------------
+            spooled = spool_upload(stream, Config.INGEST_FOLDER, Config.MAX_FILE_SIZE)
+        except IngestError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # For now, generate dummy CHI
-        region = sub_region if sub_region else area_type
-        chi_value = chi_gen.generate_chi(region)
-        status = chi_gen.get_status(chi_value)
-        interpretation = chi_gen.get_interpretation(status)
+        try:
+            # Duplicate upload? Serve the cached breakdown, skip storage and analysis
+            cached = result_cache.get(spooled.digest, _pipeline_version(),
+                                      _cache_region(area_type, sub_region, date))
+            if cached:
+                return jsonify({**cached, 'cached': True}), 200
+            
+            if request.args.get('async', fields.get('async', '')).lower() in ('1', 'true', 'yes'):
+                # Hand the spool file to the job; the response only waits for the transfer
+                job_id = job_queue.submit(
+                    'upload-image',
+                    _run_upload_job,
+                    params={'filename': filename, 'areaType': area_type,
+                            'subRegion': sub_region, 'date': date},
+                    spool_path=spooled.path,
+                    original_filename=filename,
+                    content_type=content_type,
+                    area_type=area_type,
+                    sub_region=sub_region,
+                    date=date,
+                    digest=spooled.digest
+                )
+                spooled = None  # The job owns the file now
+                return jsonify({
+                    'jobId': job_id,
+                    'status': 'queued',
+                    'statusUrl': f'/jobs/{job_id}'
+                }), 202
+            
+            result = _process_upload(spooled.path, filename, content_type,
+                                     area_type, sub_region, date, digest=spooled.digest)
+            return jsonify(result), 201
+        finally:
+            if spooled:
+                os.remove(spooled.path)
         
-        # Generate dummy vegetation metrics
-        vegetation_coverage = 30 + (chi_value / 100) * 50
-        healthy_vegetation = 40 + (chi_value / 100) * 40
-        stressed_vegetation = 100 - healthy_vegetation
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/upload-batch', methods=['POST'])
+def upload_batch():
+    """
+    Batch image upload endpoint
+    POST /upload-batch
+    
+    Expected form data:
+        - files: One or more image files (.jpg, .png or .tif) and/or .zip archives of images
+        - area_type: "Bengaluru" or "RVCE" (applies to the whole batch)
+        - sub_region: (optional) RVCE sub-region
+        - date: Date of image capture (YYYY-MM-DD)
+    
+    The preprocess → detect → classify → CHI stages run in a process pool
+    sized to the host's cores (Config.BATCH_MAX_WORKERS).
+    
+    Returns:
+        Streamed NDJSON, one line per file in completion order:
+        {"filename": ..., "result": {...}} or {"filename": ..., "error": ...}
+    """
+    try:
+        uploads = request.files.getlist('files') + request.files.getlist('file')
+        if not uploads:
+            return jsonify({'error': 'No files provided'}), 400
         
-        # Store metadata in Supabase database
-        image_id = db.insert_image_metadata(
-            filename=filename,
-            storage_path=storage_path,  # Supabase Storage path
-            area_type=area_type,
-            sub_region=sub_region,
-            date=date
-        )
+        area_type = request.form.get('area_type')
+        sub_region = request.form.get('sub_region')
+        date = request.form.get('date')
         
-        # Store result
-        result_id = db.insert_chi_result(
-            image_id=image_id,
-            area_type=area_type,
-            sub_region=sub_region,
-            chi_value=chi_value,
-            status=status,
-            interpretation=interpretation,
-            date=date,
-            vegetation_coverage=vegetation_coverage,
-            healthy_vegetation=healthy_vegetation,
-            stressed_vegetation=stressed_vegetation
-        )
+        error = _validate_fields(area_type, sub_region, date)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Return result
-        result = {
-            'id': result_id,
-            'imageId': image_id,
-            'areaType': area_type,
-            'subRegion': sub_region,
-            'chiValue': chi_value,
-            'status': status,
-            'interpretation': interpretation,
-            'date': date,
-            'vegetationCoverage': round(vegetation_coverage, 2),
-            'healthyVegetation': round(healthy_vegetation, 2),
-            'stressedVegetation': round(stressed_vegetation, 2)
-        }
+        # Spool everything to a scratch directory the worker processes can read
+        os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+        batch_dir = tempfile.mkdtemp(prefix='batch_', dir=Config.UPLOAD_FOLDER)
+        try:
+            images, rejected = _spool_batch(uploads, batch_dir)
+        except ValueError as e:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify(result), 201
+        if not images and not rejected:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return jsonify({'error': 'No .jpg, .png or .tif images found in upload'}), 400
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        batch = None
+        pending = deque()
+        try:
+            paths = {name: path for name, path, _ in images}
+            digests = {name: digest for name, _, digest in images}
+            
+            # Files that could not be read are reported like failed analyses
+            for name, error in rejected:
+                yield json.dumps({'filename': name, 'error': error}) + '\n'
+            
+            # Duplicates of already analyzed frames are answered from the cache
+            items = []
+            for name, path, digest in images:
+                cached = result_cache.get(digest, _pipeline_version(),
+                                          _cache_region(area_type, sub_region, date))
+                if cached:
+                    yield json.dumps({'filename': name, 'result': {**cached, 'cached': True}}) + '\n'
+                else:
+                    items.append((name, path, area_type, sub_region))
+            
+            # Saves are queued, not awaited, so one flush writes many frames;
+            # lines are still emitted in completion order of the analyses
+            batch = pipeline.analyze_batch(items)
+            for name, future in batch:
+                analysis = None
+                try:
+                    analysis = future.result()
+                    
+                    filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{name}"
+                    storage_path = f"{area_type}/{filename}"
+                    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                    storage_path = _upload_to_storage(storage_path, paths[name], content_type,
+                                                      digest=digests[name])
+                    
+                    pending.append((name, analysis, _queue_result(
+                        filename, storage_path, area_type, sub_region, date, analysis)))
+                except Exception as e:
+                    _discard_artifact(analysis)
+                    pending.append((name, e, None))
+                while pending and (pending[0][2] is None or pending[0][2].done()):
+                    yield _batch_line(*pending.popleft(), area_type, sub_region, date, digests)
+            while pending:
+                yield _batch_line(*pending.popleft(), area_type, sub_region, date, digests)
+        finally:
+            # On client disconnect: cancel the analyses not started yet and
+            # still finish the queued saves (artifacts, result cache)
+            if batch is not None:
+                batch.close()
+            while pending:
+                _batch_line(*pending.popleft(), area_type, sub_region, date, digests)
+            shutil.rmtree(batch_dir, ignore_errors=True)
+    
+    return Response(generate(), status=200, mimetype='application/x-ndjson')
+
+
+def _batch_line(name, analysis, saved, area_type, sub_region, date, digests):
+    """NDJSON line for one /upload-batch frame (analysis is the error if saved is None)"""
+    if saved is None:
+        return json.dumps({'filename': name, 'error': str(analysis)}) + '\n'
+    try:
+        ids = saved.result()
+    except Exception as e:
+        _discard_artifact(analysis)
+        return json.dumps({'filename': name, 'error': str(e)}) + '\n'
+    try:
+        result = _finish_result(ids, area_type, sub_region, date, analysis)
+        _cache_result(digests[name], area_type, sub_region, date, result)
+        line = {'filename': name, 'result': result}
+    except Exception as e:
+        line = {'filename': name, 'error': str(e)}
+    return json.dumps(line) + '\n'
+
+
+def _spool_batch(uploads, batch_dir):
+    """
+    Write uploaded images (and the images inside .zip archives) to batch_dir
+    
+    A file that is not a valid image (or a .zip that cannot be read) is
+    rejected on its own; the rest of the batch still goes through.
+    
+    Returns:
+        Tuple of (images, rejected): images is a list of (original filename,
+        local path, content digest) with names made unique, rejected a list
+        of (filename, error message)
+    
+    Raises:
+        ValueError: If the batch has more than Config.BATCH_MAX_FILES files
+    """
+    images = []
+    rejected = []
+    seen = set()
+    
+    def add(name, stream):
+        name = os.path.basename(name)
+        base, ext = os.path.splitext(name)
+        unique, n = name, 1
+        while unique in seen:
+            unique = f"{base}_{n}{ext}"
+            n += 1
+        seen.add(unique)
+        if len(seen) > Config.BATCH_MAX_FILES:
+            raise ValueError(f'Too many files in batch (max {Config.BATCH_MAX_FILES})')
+        try:
+            spooled = spool_upload(stream, batch_dir, Config.MAX_FILE_SIZE)
+        except (IngestError, zipfile.BadZipFile, zlib.error) as e:
+            rejected.append((unique, str(e)))
+            return
+        path = os.path.join(batch_dir, f"{len(images):05d}{ext.lower()}")
+        os.replace(spooled.path, path)
+        images.append((unique, path, spooled.digest))
+    
+    for upload in uploads:
+        if upload.filename.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(upload.stream)
+            except zipfile.BadZipFile as e:
+                rejected.append((os.path.basename(upload.filename), str(e)))
+                continue
+            with archive:
+                for member in archive.infolist():
+                    if member.is_dir() or not _allowed_file(member.filename):
+                        continue
+                    try:
+                        stream = archive.open(member)
+                    except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+                        rejected.append((os.path.basename(member.filename), str(e)))
+                        continue
+                    with stream:
+                        add(member.filename, stream)
+        elif _allowed_file(upload.filename):
+            add(upload.filename, upload.stream)
+    
+    return images, rejected
+
+
+def _process_upload(spool_path, original_filename, content_type,
+                    area_type, sub_region, date, digest=None, progress=None):
+    """
+    Storage upload, CHI analysis and database inserts for one spooled image
+    
+    The upload and the analysis are independent and run concurrently (the
+    upload on the storage pool), so latency is about the slower of the two.
+    The insert needs both: the stored path and the CHI result. If the
+    analysis or the insert fails, the uploaded object is deleted again. A
+    failed upload is logged and the result is still stored, as before.
+    The upload has always finished when this returns.
+    
+    Args:
+        spool_path: Local file written by ingest.spool_upload (left in place)
+        digest: Content hash of the spooled file; the stored result is cached under it
+        progress: Optional callback(fraction, stage) for job progress reporting
+    
+    Returns:
+        API result dict (see _save_result)
+    """
+    report = progress or (lambda fraction, stage: None)
+    
+    # Build storage path
+    filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{original_filename}"
+    storage_path = f"{area_type}/{filename}"
+    
+    # Upload to storage backend in the background
+    report(0.1, 'analyzing')
+    upload = _get_io_pool().submit(storage.upload_file, storage_path, spool_path,
+                                   content_type, digest=digest)
+    
+    # Meanwhile preprocess → detect → classify → CHI, reading the spooled file in tiles
+    try:
+        warm_up()
+        analysis = pipeline.analyze_image(spool_path, area_type, sub_region)
+    except Exception:
+        _discard_upload(upload)
+        raise
+    
+    report(0.7, 'uploading')
+    try:
+        storage_path = upload.result()
+    except Exception as upload_error:
+        print(f"⚠️  Storage upload warning: {upload_error}")
+        # Continue anyway - storage might already exist or be configured differently
+    
+    # Store metadata and result in the database
+    report(0.8, 'saving')
+    try:
+        result = _save_result(filename, storage_path, area_type, sub_region, date, analysis)
+    except Exception:
+        _discard_upload(upload)
+        raise
+    if result['imageId'] == -1:
+        _discard_upload(upload)  # no image row references the object
+    _cache_result(digest, area_type, sub_region, date, result)
+    return result
+
+
+def _run_upload_job(spool_path, original_filename, content_type,
+                    area_type, sub_region, date, digest, progress):
+    """Background job body for /upload-image?async=true (owns the spool file)"""
+    try:
+        return _process_upload(spool_path, original_filename, content_type,
+                               area_type, sub_region, date, digest=digest, progress=progress)
+    finally:
+        os.remove(spool_path)
+
+
+def recover_jobs():
+    """
+    Settle the jobs of the previous run and resume its queued uploads
+    
+    Call it only in the process that serves requests (the dev server's
+    reloader child, gunicorn workers after fork): a process that imports
+    the app without serving would claim jobs and then exit. Under gunicorn
+    the master already failed the interrupted jobs before forking. Queued
+    upload jobs own their spool file and run again; model activations are
+    not replayed.
+    """
+    if not Config.PREFORKED:
+        job_queue.recover_interrupted()
+    job_queue.resume_queued({'upload-image': _run_upload_job})
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Job status endpoint
+    GET /jobs/<job_id>
+    
+    Returns:
+        JSON with status (queued, running, succeeded, failed), stage,
+        progress (0-1), and result or error once finished
+    """
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': f'Job not found: {job_id}'}), 404
+    return jsonify(job), 200
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """
+    List recent jobs
+    GET /jobs?status=<status>&limit=<n>
+    
+    Returns:
+        JSON array of jobs, newest first
+    """
+    status = request.args.get('status')
+    if status and status not in JOB_STATUSES:
+        return jsonify({'error': f'Invalid status. Must be one of: {list(JOB_STATUSES)}'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify(job_queue.list(status=status, limit=limit)), 200
+
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    """
+    List loaded model versions
+    GET /models
+    
+    Returns:
+        JSON array of {name, version, loadedAt, loadSeconds, active}
+    """
+    warm_up()
+    return jsonify(model_registry.get_registry().list()), 200
+
+
+@app.route('/models/<name>/activate', methods=['POST'])
+def activate_model(name):
+    """
+    Hot-swap a model family to another version
+    POST /models/<name>/activate
+    
+    Expected JSON or form data:
+        - version: Version to load and activate
+    
+    The new version is loaded in a background job while requests keep using
+    the current one, then swapped in atomically and the batch pool restarted.
+    The activation is published (Config.MODEL_STATE_PATH), so the other
+    worker processes switch too.
+    
+    Returns:
+        JSON with job id (202); poll GET /jobs/<job_id>
+    """
+    warm_up()
+    registry = model_registry.get_registry()
+    if name not in registry.active_versions():
+        return jsonify({'error': f'Unknown model: {name}'}), 404
+    
+    payload = request.get_json(silent=True) or request.form
+    version = payload.get('version')
+    if not version:
+        return jsonify({'error': 'No version provided'}), 400
+    
+    job_id = job_queue.submit('model-activate', _run_model_activate,
+                              params={'model': name, 'version': version},
+                              name=name, version=version)
+    return jsonify({
+        'jobId': job_id,
+        'status': 'queued',
+        'statusUrl': f'/jobs/{job_id}'
+    }), 202
+
+
+def _run_model_activate(name, version, progress):
+    """Background job body for /models/<name>/activate"""
+    progress(0.1, 'loading')
+    registry = model_registry.get_registry()
+    handle = registry.activate(name, version)
+    registry.publish(name, version)  # other worker processes switch on their next request
+    progress(0.9, 'restarting workers')
+    pipeline.restart_executor()
+    return handle.to_dict()
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Runtime metrics
+    GET /metrics
+    
+    Returns:
+        JSON with segmentation micro-batching stats (batch fill ratio,
+        queueing delay) for this process, or null when batching is disabled,
+        Supabase HTTP pool utilization (null in local mode) and dashboard
+        read cache hit/miss counters
+    """
+    import vegetation_detection
+    batcher = vegetation_detection.get_batcher()
+    pool = None
+    if 'supabase' in (Config.DATABASE_BACKEND, Config.STORAGE_BACKEND):
+        from supabase_client import pool_stats
+        pool = pool_stats()
+    return jsonify({
+        'batching': batcher.stats() if batcher else None,
+        'supabasePool': pool,
+        'readCache': read_cache.stats()
+    }), 200
 
 
 @app.route('/get-results', methods=['GET'])
 def get_results():
     """
-    Get all CHI results
+    Get CHI results, newest first
     GET /get-results
     
+    Query parameters (all optional):
+        - area_type, sub_region: Equality filters
+        - date_from, date_to: Inclusive capture-date range (YYYY-MM-DD)
+        - fields: Comma-separated field names to return (e.g. id,chiValue,date)
+        - limit, cursor: Return one page as {"results": [...], "nextCursor": ...};
+          pass nextCursor back as cursor to fetch the following page
+        - format=ndjson: Stream every matching result as one JSON object per line
+    
     Returns:
-        JSON array of all CHI results
+        JSON array of all matching CHI results (streamed page by page),
+        a single page envelope when limit/cursor is given, or NDJSON
     """
     try:
-        results = db.get_all_results()
-        return jsonify(results), 200
+        fields = request.args.get('fields')
+        filters = {
+            'fields': [f.strip() for f in fields.split(',') if f.strip()] if fields else None,
+            'area_type': request.args.get('area_type'),
+            'sub_region': request.args.get('sub_region'),
+            'date_from': request.args.get('date_from'),
+            'date_to': request.args.get('date_to')
+        }
+        
+        # Validate projection up front so errors are a 400, not a broken stream
+        db._project_columns(filters['fields'])
+        
+        if 'limit' in request.args or 'cursor' in request.args:
+            limit = int(request.args.get('limit', Config.RESULTS_PAGE_SIZE))
+            limit = min(max(limit, 1), Config.RESULTS_PAGE_MAX)
+            results, next_cursor = db.get_results_page(
+                limit=limit, cursor=request.args.get('cursor'), **filters
+            )
+            return jsonify({'results': results, 'nextCursor': next_cursor}), 200
+        
+        rows = db.iter_results(page_size=Config.RESULTS_PAGE_MAX, **filters)
+        
+        if request.args.get('format') == 'ndjson':
+            return Response((json.dumps(row) + '\n' for row in rows),
+                            status=200, mimetype='application/x-ndjson')
+        
+        return Response(_stream_json_array(rows), status=200, mimetype='application/json')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def _stream_json_array(rows):
+    """Serialize an iterable as a JSON array without building it in memory"""
+    yield '['
+    for i, row in enumerate(rows):
+        yield (',' if i else '') + json.dumps(row)
+    yield ']'
+
+
 @app.route('/get-bangalore-summary', methods=['GET'])
 def get_bangalore_summary():
     """
@@ -215,10 +936,11 @@ def get_bangalore_summary():
     
     Returns:
         JSON with overall CHI, status, total analyses, and trends
+        (cached, with an ETag; If-None-Match gets a 304)
     """
     try:
-        summary = db.get_bangalore_summary()
-        return jsonify(summary), 200
+        return _cached_json('summary', Config.READ_CACHE_TTLS['summary'], region_tags('Bengaluru'),
+                            db.get_bangalore_summary)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -231,10 +953,11 @@ def get_rvce_results():
     
     Returns:
         JSON array of RVCE results grouped by region
+        (cached, with an ETag; If-None-Match gets a 304)
     """
     try:
-        results = db.get_rvce_results()
-        return jsonify(results), 200
+        return _cached_json('rvce', Config.READ_CACHE_TTLS['rvce'], region_tags('RVCE'),
+                            db.get_rvce_results)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -250,25 +973,91 @@ def compare_temporal(region):
     
     Returns:
         JSON with comparison of last two CHI values
+        (cached for known regions, with an ETag; If-None-Match gets a 304)
     """
     try:
-        comparison = db.get_temporal_comparison(region)
-        if not comparison:
+        tags = _compare_tags(region)
+        if tags is None:
+            comparison = db.get_temporal_comparison(region)
+            if not comparison:
+                return jsonify({'error': f'No data available for region: {region}'}), 404
+            return jsonify(comparison), 200
+        
+        cached = read_cache.get_or_load(f'compare/{region}', Config.READ_CACHE_TTLS['compare'], tags,
+                                        lambda: db.get_temporal_comparison(region))
+        if cached.body == b'[]':
             return jsonify({'error': f'No data available for region: {region}'}), 404
-        return jsonify(comparison), 200
+        return _conditional_response(cached)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def _compare_tags(region):
+    """Read cache tags of /compare/<region>, or None for unknown regions (not cached)"""
+    if region == 'Bengaluru':
+        return region_tags('Bengaluru')
+    if region in VALID_SUB_REGIONS:
+        return region_tags('RVCE', region)
+    return None
+
+
+def _cached_json(key, ttl, tags, loader):
+    """Read-through cached JSON response (see read_cache.py)"""
+    return _conditional_response(read_cache.get_or_load(key, ttl, tags, loader))
+
+
+def _conditional_response(cached):
+    """200 with the cached body, or 304 if If-None-Match has its ETag"""
+    response = Response(cached.body, status=200, mimetype='application/json')
+    response.set_etag(cached.etag)
+    response.headers['Cache-Control'] = 'no-cache'  # clients revalidate, usually getting a 304
+    return response.make_conditional(request)
+
+
 if __name__ == '__main__':
+    import argparse
+    import time
+    
+    parser = argparse.ArgumentParser(description='UCHI backend development server')
+    parser.add_argument('--import-report', action='store_true',
+                        help='Print an import-time breakdown of app.py (and its warm-up) and exit')
+    parser.add_argument('--no-warm-up', action='store_true',
+                        help='Load the pipeline and models on the first request instead of now')
+    args = parser.parse_args()
+    
+    if args.import_report:
+        print(import_report('app'))
+        start = time.perf_counter()
+        warm_up()
+        print(f"\nwarm_up() (pipeline modules + models): {(time.perf_counter() - start) * 1000:.1f} ms")
+        raise SystemExit(0)
+    
     print("=" * 60)
     print("Dynamic Urban Canopy Health Index (UCHI) Backend")
     print("=" * 60)
-    print(f"Database: Supabase PostgreSQL")
-    print(f"Storage: Supabase Storage (bucket: {Config.SUPABASE_STORAGE_BUCKET})")
+    if Config.DATABASE_BACKEND == 'local':
+        print(f"Database: Local SQLite ({Config.LOCAL_DB_PATH})")
+    else:
+        print(f"Database: Supabase PostgreSQL")
+    if Config.STORAGE_BACKEND == 'local':
+        print(f"Storage: Local directory ({Config.LOCAL_STORAGE_PATH})")
+    else:
+        print(f"Storage: Supabase Storage (bucket: {Config.SUPABASE_STORAGE_BUCKET})")
     print(f"Server running on: http://localhost:{Config.PORT}")
     print("=" * 60)
     
+    # Start on the configured model versions, not those activated last run
+    model_registry.get_registry().clear_published()
+    
+    # Load segmentation models now so no request pays for a cold load
+    if not args.no_warm_up:
+        warm_up()
+    
+    # With the reloader (debug), this process only watches files; the
+    # child it spawns (WERKZEUG_RUN_MAIN set) serves and owns the jobs
+    if not Config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        recover_jobs()
+    
     app.run(
         host=Config.HOST,
         port=Config.PORT,
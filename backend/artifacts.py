@@ -0,0 +1,349 @@
+"""
+Artifacts Module
+Per-image segmentation artifacts persisted as chunked, compressed arrays
+
+Every analyzed image keeps its label raster (see mask_stats.LABEL_*) and
+its spectral index rasters (vegetation_detection.index_rasters) on disk,
+keyed by its image_metadata id, so CHI can be recomputed later
+(rescore.py) without downloading or re-segmenting the original image.
+
+Layout: one compressed .npz per image under Config.ARTIFACT_PATH, sharded
+by id (ARTIFACT_PATH/<id // 1000>/<id>.npz). The archive holds one entry
+per tile core (chunk r<row>_c<col>), each the 2-bit packed label planes
+from mask_stats.pack_labels, plus a JSON '__meta__' entry with the chunk
+positions and shapes. Entries are decompressed individually on access, so
+stats() streams one chunk at a time and never holds the full raster.
+
+Index rasters are stored per chunk as r<row>_c<col>.<index> entries of
+float16 block means (Config.ARTIFACT_INDEX_BLOCK pixels square, 'indexBlock'
+in the meta), not at full resolution: at the default 8 they add about as
+much as the labels. Formulas that need per-pixel index values must be
+re-scored from the images, or run with ARTIFACT_INDEX_BLOCK=1.
+
+While an image is analyzed its archive is written chunk by chunk to
+ARTIFACT_PATH/pending-*.npz and renamed to its id path after the insert.
+"""
+
+import json
+import os
+import tempfile
+import time
+import zipfile
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from config import Config
+from mask_stats import (
+    MaskStats, PackedLabels, combine_stats, compute_label_stats, pack_labels, unpack_labels
+)
+
+
+ARTIFACT_FORMAT_VERSION = 1
+META_KEY = '__meta__'
+LABEL_BITS = 2  # LABEL_NON_VEGETATION / LABEL_HEALTHY / LABEL_STRESSED
+PENDING_PREFIX = 'pending-'
+
+
+class LabelChunk(NamedTuple):
+    """Packed labels of one tile core"""
+    row: int
+    col: int
+    labels: PackedLabels
+
+
+class LabelArtifact(NamedTuple):
+    """Packed label raster of one image, as a list of tile chunks"""
+    chunks: List[LabelChunk]
+    pipeline_version: str = ''
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(rows, cols) of the full image covered by the chunks"""
+        rows = max((c.row + c.labels.shape[0] for c in self.chunks), default=0)
+        cols = max((c.col + c.labels.shape[1] for c in self.chunks), default=0)
+        return rows, cols
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.labels.nbytes for c in self.chunks)
+
+
+class ArtifactRecorder:
+    """
+    Captures the label raster while it streams through the pipeline
+
+    Wraps the tile generator and the per-tile label generator, pairing each
+    label core with its tile position (detect_vegetation_tiled yields
+    labels in tile order) and packing it as it passes. Packed chunks go
+    straight into a pending archive in the store's root, so neither the
+    worker nor the result it sends back holds the raster; the caller
+    renames the archive once the image has an id (ArtifactStore.adopt).
+    """
+
+    def __init__(self, root: Optional[str] = None, index_block: Optional[int] = None):
+        """
+        Args:
+            root: Store directory for the pending archive (Config.ARTIFACT_PATH)
+            index_block: Block size of the stored index means
+                (Config.ARTIFACT_INDEX_BLOCK; 0 = no index rasters)
+        """
+        root = root or Config.ARTIFACT_PATH
+        os.makedirs(root, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=root, prefix=PENDING_PREFIX, suffix='.npz')
+        self._archive = zipfile.ZipFile(os.fdopen(fd, 'wb'), 'w', zipfile.ZIP_DEFLATED)
+        self.index_block = Config.ARTIFACT_INDEX_BLOCK if index_block is None else index_block
+        self._indices: List[str] = []
+        self._chunks: List[Dict] = []
+        self._shape = (0, 0)
+
+    def record(self, tiles: Iterable[Any],
+               detect: Callable[[Iterable[Any]], Iterator[Any]],
+               indices: Optional[Callable[[Any], Dict[str, Any]]] = None) -> Iterator[Any]:
+        """
+        Run detect over tiles, recording every label core it yields
+
+        Args:
+            tiles: Iterable of preprocessing.Tile
+            detect: e.g. vegetation_detection.detect_vegetation_tiled
+            indices: Callable(core pixels) -> {name: index raster}, e.g.
+                vegetation_detection.index_rasters; recorded as block means
+
+        Yields:
+            The label rasters from detect, unchanged
+        """
+        pending = deque()
+
+        def track(tiles):
+            for tile in tiles:
+                pending.append(tile)
+                yield tile
+
+        for labels in detect(track(tiles)):
+            tile = pending.popleft()
+            self._add(LabelChunk(tile.row, tile.col, pack_labels(labels, bits=LABEL_BITS)))
+            if indices is not None and self.index_block > 0:
+                self._add_indices(tile.row, tile.col, indices(tile.data[tile.core]))
+            yield labels
+
+    def _add(self, chunk: LabelChunk) -> None:
+        key = _chunk_key(chunk.row, chunk.col)
+        _write_entry(self._archive, key, chunk.labels.planes)
+        self._chunks.append({'key': key, 'row': chunk.row, 'col': chunk.col,
+                             'shape': list(chunk.labels.shape)})
+        self._shape = (max(self._shape[0], chunk.row + chunk.labels.shape[0]),
+                       max(self._shape[1], chunk.col + chunk.labels.shape[1]))
+
+    def _add_indices(self, row: int, col: int, rasters: Dict[str, Any]) -> None:
+        key = _chunk_key(row, col)
+        for name, raster in rasters.items():
+            _write_entry(self._archive, f'{key}.{name}', block_means(raster, self.index_block))
+            if name not in self._indices:
+                self._indices.append(name)
+
+    def finish(self, pipeline_version: str = '') -> str:
+        """Complete the pending archive and return its path"""
+        _write_meta(self._archive, self._shape, self._chunks, pipeline_version,
+                    indices=self._indices, index_block=self.index_block if self._indices else 0)
+        self._close()
+        return self.path
+
+    def abort(self) -> None:
+        """Drop the pending archive (the analysis failed)"""
+        self._close()
+        discard_pending(self.path)
+
+    def _close(self) -> None:
+        fp = self._archive.fp
+        self._archive.close()
+        if fp is not None:
+            fp.close()
+
+
+class ArtifactStore:
+    """Directory of per-image label artifacts"""
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Args:
+            root: Base directory, defaults to Config.ARTIFACT_PATH
+        """
+        self.root = root or Config.ARTIFACT_PATH
+
+    def path(self, image_id: int) -> str:
+        """Archive path of an image's artifact"""
+        return os.path.join(self.root, str(int(image_id) // 1000), f'{int(image_id)}.npz')
+
+    def exists(self, image_id: int) -> bool:
+        return os.path.exists(self.path(image_id))
+
+    def save(self, image_id: int, artifact: LabelArtifact) -> str:
+        """
+        Write an image's artifact (atomically replacing an older one)
+
+        Returns:
+            Archive path
+        """
+        path = self.path(image_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f, zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for c in artifact.chunks:
+                    _write_entry(archive, _chunk_key(c.row, c.col), c.labels.planes)
+                _write_meta(archive, artifact.shape, [
+                    {'key': _chunk_key(c.row, c.col), 'row': c.row, 'col': c.col,
+                     'shape': list(c.labels.shape)}
+                    for c in artifact.chunks
+                ], artifact.pipeline_version)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return path
+
+    def adopt(self, image_id: int, pending_path: str) -> str:
+        """
+        Move a pending archive (ArtifactRecorder.finish) to an image's path
+
+        Returns:
+            Archive path
+        """
+        path = self.path(image_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(pending_path, path)
+        return path
+
+    def purge_pending(self, older_than: float = 86400) -> int:
+        """Remove pending archives left behind by crashed workers; returns the count"""
+        removed = 0
+        cutoff = time.time() - older_than
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                if name.startswith(PENDING_PREFIX) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def metadata(self, image_id: int) -> Dict:
+        """Stored meta entry (shape, chunk layout, pipeline version)"""
+        with np.load(self.path(image_id)) as archive:
+            return _read_meta(archive)
+
+    def iter_chunks(self, image_id: int) -> Iterator[LabelChunk]:
+        """Stream an image's chunks, decompressing one at a time"""
+        with np.load(self.path(image_id)) as archive:
+            for chunk in _read_meta(archive)['chunks']:
+                packed = PackedLabels(planes=archive[chunk['key']], shape=tuple(chunk['shape']))
+                yield LabelChunk(chunk['row'], chunk['col'], packed)
+
+    def iter_index_chunks(self, image_id: int, name: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Stream an index raster as (row, col, block means) per chunk
+
+        Each array holds the means of metadata()['indexBlock'] pixel blocks
+        of the chunk core, starting at (row, col).
+
+        Raises:
+            KeyError: If the artifact has no such index (older artifact or
+                index rasters disabled)
+        """
+        with np.load(self.path(image_id)) as archive:
+            meta = _read_meta(archive)
+            if name not in meta.get('indices', []):
+                raise KeyError(f'No {name} index in artifact of image {image_id}')
+            for chunk in meta['chunks']:
+                yield chunk['row'], chunk['col'], archive[f"{chunk['key']}.{name}"]
+
+    def load(self, image_id: int) -> LabelArtifact:
+        """Read a whole artifact (packed)"""
+        meta = self.metadata(image_id)
+        return LabelArtifact(list(self.iter_chunks(image_id)), meta.get('pipelineVersion', ''))
+
+    def load_labels(self, image_id: int) -> Any:
+        """Reassemble the full uint8 label raster"""
+        meta = self.metadata(image_id)
+        labels = np.zeros(tuple(meta['shape']), dtype=np.uint8)
+        for chunk in self.iter_chunks(image_id):
+            core = unpack_labels(chunk.labels)
+            labels[chunk.row:chunk.row + core.shape[0], chunk.col:chunk.col + core.shape[1]] = core
+        return labels
+
+    def stats(self, image_id: int) -> MaskStats:
+        """Pixel statistics of a stored artifact, counted on the packed chunks"""
+        return combine_stats(compute_label_stats(chunk.labels)
+                             for chunk in self.iter_chunks(image_id))
+
+    def delete(self, image_id: int) -> bool:
+        """Remove an image's artifact; returns False if there was none"""
+        try:
+            os.remove(self.path(image_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def discard_pending(pending_path: str) -> None:
+    """Remove a pending archive whose analysis was not stored"""
+    try:
+        os.remove(pending_path)
+    except FileNotFoundError:
+        pass
+
+
+def _chunk_key(row: int, col: int) -> str:
+    return f'r{row}_c{col}'
+
+
+def block_means(raster: Any, block: int) -> Any:
+    """Means of block x block pixel blocks (ragged at the edges) as float16"""
+    raster = np.asarray(raster, dtype=np.float32)
+    if block <= 1 or raster.size == 0:
+        return raster.astype(np.float16)
+    rows = np.arange(0, raster.shape[0], block)
+    cols = np.arange(0, raster.shape[1], block)
+    sums = np.add.reduceat(np.add.reduceat(raster, rows, axis=0), cols, axis=1)
+    counts = np.outer(np.diff(np.append(rows, raster.shape[0])),
+                      np.diff(np.append(cols, raster.shape[1])))
+    return (sums / counts).astype(np.float16)
+
+
+def _write_entry(archive: zipfile.ZipFile, key: str, array: Any) -> None:
+    """Add one array to an open archive, in np.savez's layout"""
+    with archive.open(f'{key}.npy', 'w', force_zip64=True) as f:
+        np.lib.format.write_array(f, np.asanyarray(array), allow_pickle=False)
+
+
+def _write_meta(archive: zipfile.ZipFile, shape: Tuple[int, int], chunks: List[Dict],
+                pipeline_version: str, indices: Iterable[str] = (), index_block: int = 0) -> None:
+    meta = {
+        'format': ARTIFACT_FORMAT_VERSION,
+        'shape': list(shape),
+        'bits': LABEL_BITS,
+        'indices': list(indices),
+        'indexBlock': index_block,
+        'pipelineVersion': pipeline_version,
+        'createdAt': datetime.now().isoformat(),
+        'chunks': chunks
+    }
+    _write_entry(archive, META_KEY, np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8))
+
+
+def _read_meta(archive: Any) -> Dict:
+    meta = json.loads(archive[META_KEY].tobytes().decode('utf-8'))
+    if meta.get('format') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format: {meta.get('format')}")
+    return meta
@@ -0,0 +1,386 @@
+"""
+Dynamic Urban Canopy Health Index (UCHI) - ASGI Backend
+asyncio variant of app.py for I/O-bound concurrency
+
+The upload and read endpoints are native coroutines: Supabase queries and
+Storage uploads go through the asyncio clients (async_backends.py), CPU
+stages run on the analysis process pool, and the storage upload runs
+concurrently with the analysis. A request waiting on I/O holds no thread,
+so one process can keep hundreds of uploads in flight.
+
+    pip install starlette uvicorn python-multipart a2wsgi
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+Native routes: /health, /upload-image, /get-results,
+/get-bangalore-summary, /get-rvce-results and /compare/<region>. The
+remaining routes (/upload-batch, /jobs, /models, /metrics) are served by
+the Flask app through a WSGI bridge, so both variants expose the same API
+and share one job queue, result cache and model registry.
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as flask_backend
+from async_backends import get_async_database, get_async_storage
+from config import Config
+from ingest import spool_upload, spool_upload_async, IngestError
+from read_cache import region_tags
+from supabase_client import close_async_supabase
+
+
+@asynccontextmanager
+async def lifespan(asgi_app):
+    """Warm the pipeline, open the async clients; drain background work on exit"""
+    await asyncio.to_thread(flask_backend.warm_up)
+    asgi_app.state.db = get_async_database(flask_backend.db)
+    asgi_app.state.storage = get_async_storage(flask_backend.storage)
+    asgi_app.state.read_locks = {}  # read cache key -> asyncio.Lock, see _cached_json
+    try:
+        yield
+    finally:
+        await asgi_app.state.db.aclose()
+        await close_async_supabase()  # shared by state.db and state.storage
+        await asyncio.to_thread(flask_backend.shutdown)
+
+
+async def health_check(request):
+    """
+    Health check endpoint
+    GET /health
+    """
+    return JSONResponse({
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'version': '1.0.0',
+        'services': {
+            'database': request.app.state.db.is_connected(),
+            'storage': request.app.state.storage.is_available(),
+            'aiModule': flask_backend.ai_module_ready()
+        }
+    })
+
+
+async def upload_image(request):
+    """
+    Image upload endpoint
+    POST /upload-image
+
+    Same form fields, raw-body mode, async=true job mode and responses as
+    app.upload_image.
+    """
+    try:
+        content_type = request.headers.get('content-type', '').split(';')[0].strip()
+        if content_type.startswith('image/'):
+            # Raw body upload: metadata travels in the query string
+            fields = request.query_params
+            filename = os.path.basename(fields.get('filename', ''))
+            upload = None
+        else:
+            fields = await request.form()
+            upload = fields.get('file')
+            if not isinstance(upload, UploadFile):
+                return JSONResponse({'error': 'No file provided'}, status_code=400)
+            filename = upload.filename
+            content_type = upload.content_type
+
+        if not filename:
+            return JSONResponse({'error': 'No file selected'}, status_code=400)
+
+        area_type = fields.get('area_type')
+        sub_region = fields.get('sub_region')
+        date = fields.get('date')
+
+        error = flask_backend._validate_fields(area_type, sub_region, date)
+        if error:
+            return JSONResponse({'error': error}, status_code=400)
+
+        try:
+            if upload is None:
+                spooled = await spool_upload_async(request.stream(), Config.INGEST_FOLDER,
+                                                   Config.MAX_FILE_SIZE)
+            else:
+                spooled = await asyncio.to_thread(spool_upload, upload.file, Config.INGEST_FOLDER,
+                                                  Config.MAX_FILE_SIZE)
+        except IngestError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+        try:
+            cached = await asyncio.to_thread(
+                lambda: flask_backend.result_cache.get(
+                    spooled.digest, flask_backend._pipeline_version(),
+                    flask_backend._cache_region(area_type, sub_region, date)
+                )
+            )
+            if cached:
+                return JSONResponse({**cached, 'cached': True}, status_code=200)
+
+            if request.query_params.get('async', fields.get('async', '')).lower() in ('1', 'true', 'yes'):
+                job_id = flask_backend.job_queue.submit(
+                    'upload-image',
+                    flask_backend._run_upload_job,
+                    params={'filename': filename, 'areaType': area_type,
+                            'subRegion': sub_region, 'date': date},
+                    spool_path=spooled.path,
+                    original_filename=filename,
+                    content_type=content_type,
+                    area_type=area_type,
+                    sub_region=sub_region,
+                    date=date,
+                    digest=spooled.digest
+                )
+                spooled = None  # The job owns the file now
+                return JSONResponse({
+                    'jobId': job_id,
+                    'status': 'queued',
+                    'statusUrl': f'/jobs/{job_id}'
+                }, status_code=202)
+
+            result = await _process_upload(request.app.state, spooled.path, filename, content_type,
+                                           area_type, sub_region, date, spooled.digest)
+            return JSONResponse(result, status_code=201)
+        finally:
+            if spooled:
+                os.remove(spooled.path)
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def _discard_upload(storage, upload):
+    """Async app._discard_upload"""
+    try:
+        storage_path = await upload
+    except Exception:
+        return  # nothing was stored
+    if storage.content_addressed:
+        return
+    try:
+        await storage.delete(storage_path)
+    except Exception as e:
+        print(f"⚠️  Could not remove orphaned upload {storage_path}: {e}")
+
+
+async def _process_upload(state, spool_path, original_filename, content_type,
+                          area_type, sub_region, date, digest):
+    """
+    Async app._process_upload
+
+    The storage upload and the analysis (on the pipeline process pool) run
+    concurrently; metadata and result are then inserted in one call. The
+    uploaded object is deleted again if the analysis or the insert fails.
+    """
+    filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{original_filename}"
+    storage_path = f"{area_type}/{filename}"
+
+    loop = asyncio.get_running_loop()
+    pipeline = flask_backend.pipeline
+    upload = asyncio.ensure_future(
+        state.storage.upload_file(storage_path, spool_path, content_type, digest=digest)
+    )
+    try:
+        analysis = await loop.run_in_executor(pipeline.get_executor(), pipeline.analyze_image,
+                                              spool_path, area_type, sub_region)
+    except BaseException:  # including cancellation by a disconnected client
+        await _discard_upload(state.storage, upload)
+        raise
+
+    try:
+        storage_path = await upload
+    except Exception as upload_error:
+        print(f"⚠️  Storage upload warning: {upload_error}")
+
+    record = flask_backend._analysis_record(filename, storage_path, area_type, sub_region, date, analysis)
+    try:
+        ids = (await state.db.insert_analyses([record]))[0]
+    except Exception:
+        flask_backend._discard_artifact(analysis)
+        await _discard_upload(state.storage, upload)
+        raise
+    finally:
+        flask_backend._invalidate_reads([record])
+    if ids[0] == -1:
+        await _discard_upload(state.storage, upload)  # no image row references the object
+
+    # Artifact and result cache writes are local disk
+    def finish():
+        result = flask_backend._finish_result(ids, area_type, sub_region, date, analysis)
+        flask_backend._cache_result(digest, area_type, sub_region, date, result)
+        return result
+    return await asyncio.to_thread(finish)
+
+
+async def get_results(request):
+    """
+    Get CHI results, newest first
+    GET /get-results
+
+    Same query parameters and response shapes as app.get_results.
+    """
+    try:
+        args = request.query_params
+        fields = args.get('fields')
+        filters = {
+            'fields': [f.strip() for f in fields.split(',') if f.strip()] if fields else None,
+            'area_type': args.get('area_type'),
+            'sub_region': args.get('sub_region'),
+            'date_from': args.get('date_from'),
+            'date_to': args.get('date_to')
+        }
+
+        # Validate projection up front so errors are a 400, not a broken stream
+        flask_backend.db._project_columns(filters['fields'])
+        db = request.app.state.db
+
+        if 'limit' in args or 'cursor' in args:
+            limit = int(args.get('limit', Config.RESULTS_PAGE_SIZE))
+            limit = min(max(limit, 1), Config.RESULTS_PAGE_MAX)
+            results, next_cursor = await db.get_results_page(
+                limit=limit, cursor=args.get('cursor'), **filters
+            )
+            return JSONResponse({'results': results, 'nextCursor': next_cursor})
+
+        rows = db.iter_results(page_size=Config.RESULTS_PAGE_MAX, **filters)
+
+        if args.get('format') == 'ndjson':
+            async def ndjson():
+                async for row in rows:
+                    yield json.dumps(row) + '\n'
+            return StreamingResponse(ndjson(), media_type='application/x-ndjson')
+
+        return StreamingResponse(_stream_json_array(rows), media_type='application/json')
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def _stream_json_array(rows):
+    """Serialize an async iterable as a JSON array without building it in memory"""
+    yield '['
+    first = True
+    async for row in rows:
+        yield ('' if first else ',') + json.dumps(row)
+        first = False
+    yield ']'
+
+
+async def get_bangalore_summary(request):
+    """
+    Get Bengaluru summary statistics
+    GET /get-bangalore-summary
+    """
+    try:
+        return await _cached_json(request, 'summary', Config.READ_CACHE_TTLS['summary'],
+                                  region_tags('Bengaluru'), request.app.state.db.get_bangalore_summary)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def get_rvce_results(request):
+    """
+    Get RVCE region-wise results
+    GET /get-rvce-results
+    """
+    try:
+        return await _cached_json(request, 'rvce', Config.READ_CACHE_TTLS['rvce'],
+                                  region_tags('RVCE'), request.app.state.db.get_rvce_results)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def compare_temporal(request):
+    """
+    Temporal comparison endpoint
+    GET /compare/<region>
+    """
+    region = request.path_params['region']
+    try:
+        tags = flask_backend._compare_tags(region)
+        if tags is None:
+            comparison = await request.app.state.db.get_temporal_comparison(region)
+            if not comparison:
+                return JSONResponse({'error': f'No data available for region: {region}'}, status_code=404)
+            return JSONResponse(comparison)
+
+        response = await _cached_json(request, f'compare/{region}', Config.READ_CACHE_TTLS['compare'], tags,
+                                      lambda: request.app.state.db.get_temporal_comparison(region))
+        if response.body == b'[]':
+            return JSONResponse({'error': f'No data available for region: {region}'}, status_code=404)
+        return response
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def _cached_json(request, key, ttl, tags, load):
+    """
+    Async app._cached_json (load is a coroutine function)
+
+    The cache is shared with the Flask routes. Concurrent misses of one key
+    wait for a single load, as in ReadCache.get_or_load.
+    """
+    cache = flask_backend.read_cache
+    cached = await _cache_call(cache, cache.get, key)
+    if cached is None:
+        load_lock = request.app.state.read_locks.setdefault(key, asyncio.Lock())
+        async with load_lock:
+            cached = await _cache_call(cache, cache.get, key)
+            if cached is None:
+                cache.record(hit=False)
+                token = await _cache_call(cache, cache.token, tags)
+                cached = await _cache_call(cache, cache.put, key, await load(), ttl, tags, token)
+            else:
+                cache.record(hit=True)
+    else:
+        cache.record(hit=True)
+
+    headers = {'ETag': f'"{cached.etag}"', 'Cache-Control': 'no-cache'}
+    if _etag_matches(request.headers.get('if-none-match'), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type='application/json', headers=headers)
+
+
+async def _cache_call(cache, method, *args):
+    """Call a read cache method; Redis round trips run on a worker thread, off the loop"""
+    if cache.backend == 'memory':
+        return method(*args)
+    return await asyncio.to_thread(method, *args)
+
+
+def _etag_matches(if_none_match, etag):
+    """Does an If-None-Match header list etag (weak comparison)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/').strip('"') == etag:
+            return True
+    return False
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health_check, methods=['GET']),
+        Route('/upload-image', upload_image, methods=['POST']),
+        Route('/get-results', get_results, methods=['GET']),
+        Route('/get-bangalore-summary', get_bangalore_summary, methods=['GET']),
+        Route('/get-rvce-results', get_rvce_results, methods=['GET']),
+        Route('/compare/{region}', compare_temporal, methods=['GET']),
+        # Everything else comes from the Flask app
+        Mount('/', app=WSGIMiddleware(flask_backend.app))
+    ],
+    # Same open policy as CORS(app) in app.py
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
@@ -0,0 +1,227 @@
+"""
+Async Backends Module
+asyncio adapters of the repository (database.py) and storage (storage.py)
+
+asgi_app.py awaits these instead of blocking a thread per request:
+
+- AsyncDatabase / AsyncStorage run any sync backend on worker threads
+  (local SQLite and directory storage have no async driver).
+- AsyncSupabaseDatabase / AsyncSupabaseStorage talk to Supabase with the
+  asyncio PostgREST and Storage clients (supabase_client.get_async_supabase),
+  so hundreds of queries and uploads can be in flight on one event loop.
+
+Row shaping (field projection, cursors, summaries) is shared with the sync
+repository, so both APIs return identical JSON.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from config import Config
+from database import BaseDatabase, decode_cursor, get_database
+from storage import StorageBackend, get_storage
+
+
+class AsyncDatabase:
+    """Coroutine facade over a sync repository (calls run on worker threads)"""
+
+    def __init__(self, db: BaseDatabase):
+        self.db = db
+
+    def is_connected(self) -> bool:
+        return self.db.is_connected()
+
+    async def insert_analyses(self, analyses: List[Dict]) -> List[Tuple[int, int]]:
+        """See BaseDatabase.insert_analyses"""
+        return await asyncio.to_thread(self.db.insert_analyses, analyses)
+
+    async def get_results_page(self, limit: int = 100, cursor: Optional[str] = None,
+                               fields: Optional[List[str]] = None, area_type: Optional[str] = None,
+                               sub_region: Optional[str] = None, date_from: Optional[str] = None,
+                               date_to: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """See BaseDatabase.get_results_page"""
+        return await asyncio.to_thread(
+            self.db.get_results_page, limit=limit, cursor=cursor, fields=fields,
+            area_type=area_type, sub_region=sub_region, date_from=date_from, date_to=date_to
+        )
+
+    async def get_bangalore_summary(self) -> Dict:
+        return await asyncio.to_thread(self.db.get_bangalore_summary)
+
+    async def get_rvce_results(self) -> List[Dict]:
+        return await asyncio.to_thread(self.db.get_rvce_results)
+
+    async def get_temporal_comparison(self, region: str) -> List[Dict]:
+        return await asyncio.to_thread(self.db.get_temporal_comparison, region)
+
+    async def iter_results(self, page_size: int = 500, **filters) -> AsyncIterator[Dict]:
+        """Async version of BaseDatabase.iter_results (one page in memory at a time)"""
+        cursor = None
+        while True:
+            rows, cursor = await self.get_results_page(limit=page_size, cursor=cursor, **filters)
+            for row in rows:
+                yield row
+            if not cursor:
+                return
+
+    async def aclose(self) -> None:
+        """Release async resources (none for thread-backed repositories)"""
+
+
+class AsyncSupabaseDatabase(AsyncDatabase):
+    """Supabase repository on the asyncio PostgREST client"""
+
+    def __init__(self, db: BaseDatabase, clients):
+        super().__init__(db)
+        self.postgrest = clients.postgrest
+        self._clients = clients
+
+    async def insert_analyses(self, analyses: List[Dict]) -> List[Tuple[int, int]]:
+        """One insert_analyses RPC, then one per analysis if it fails (see Database.insert_analyses)"""
+        if not analyses:
+            return []
+        try:
+            items = [{**analysis, 'uploaded_at': datetime.now().isoformat()} for analysis in analyses]
+            response = await self.postgrest.rpc('insert_analyses', {'items': items}).execute()
+            rows = sorted(response.data or [], key=lambda row: row['ordinal'])
+            if len(rows) == len(analyses):
+                return [(row['new_image_id'], row['new_result_id']) for row in rows]
+            print(f"⚠️  insert_analyses returned {len(rows)} rows for {len(analyses)} analyses")
+        except Exception as e:
+            print(f"❌ Error inserting {len(analyses)} analyses: {e}")
+        if len(analyses) == 1:
+            return [(-1, -1)]
+        return [(await self.insert_analyses([analysis]))[0] for analysis in analyses]
+
+    async def get_results_page(self, limit: int = 100, cursor: Optional[str] = None,
+                               fields: Optional[List[str]] = None, area_type: Optional[str] = None,
+                               sub_region: Optional[str] = None, date_from: Optional[str] = None,
+                               date_to: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Keyset page of CHI results (same query as Database.get_results_page)"""
+        columns = self.db._project_columns(fields)
+        position = decode_cursor(cursor) if cursor else None
+
+        try:
+            query = self.postgrest.table('chi_results').select(','.join(columns))
+            if area_type:
+                query = query.eq('area_type', area_type)
+            if sub_region:
+                query = query.eq('sub_region', sub_region)
+            if date_from:
+                query = query.gte('date', date_from)
+            if date_to:
+                query = query.lte('date', date_to)
+            if position:
+                created_at, row_id = position
+                query = query.or_(
+                    f'created_at.lt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.lt.{row_id})'
+                )
+            response = await query.order('created_at', desc=True).order('id', desc=True)\
+                .limit(limit).execute()
+            return self.db._page_from_rows(response.data, limit, fields)
+        except Exception as e:
+            print(f"❌ Error fetching results page: {e}")
+            raise  # an empty page would read as the end of the results
+
+    async def get_bangalore_summary(self) -> Dict:
+        """Bengaluru summary from the chi_area_summary view"""
+        try:
+            response = await self.postgrest.table('chi_area_summary').select('*')\
+                .eq('area_type', 'Bengaluru').execute()
+            if not response.data:
+                return self.db._default_summary()
+            return self.db._summary_from_row(response.data[0])
+        except Exception as e:
+            print(f"❌ Error fetching Bangalore summary: {e}")
+            return self.db._default_summary()
+
+    async def get_rvce_results(self) -> List[Dict]:
+        """RVCE region-wise results from the chi_region_summary view"""
+        try:
+            response = await self.postgrest.table('chi_region_summary')\
+                .select('sub_region, avg_chi, analyses, last_updated')\
+                .eq('area_type', 'RVCE').order('last_updated', desc=True).execute()
+            return [self.db._region_from_row(row) for row in response.data]
+        except Exception as e:
+            print(f"❌ Error fetching RVCE results: {e}")
+            return []
+
+    async def get_temporal_comparison(self, region: str) -> List[Dict]:
+        """Last 10 CHI values of a region"""
+        try:
+            query = self.postgrest.table('chi_results').select('chi_value, date, created_at')
+            if region == 'Bengaluru':
+                query = query.eq('area_type', 'Bengaluru')
+            else:
+                query = query.eq('area_type', 'RVCE').eq('sub_region', region)
+            response = await query.order('date', desc=True).limit(10).execute()
+            return [{'date': row['date'], 'chiValue': row['chi_value'], 'timestamp': row['created_at']}
+                    for row in response.data]
+        except Exception as e:
+            print(f"❌ Error fetching temporal comparison for {region}: {e}")
+            return []
+
+
+class AsyncStorage:
+    """Coroutine facade over a sync storage backend (calls run on worker threads)"""
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+
+    @property
+    def content_addressed(self) -> bool:
+        """See StorageBackend.content_addressed"""
+        return self.storage.content_addressed
+
+    def is_available(self) -> bool:
+        return self.storage.is_available()
+
+    async def upload_file(self, storage_path: str, file_path: str, content_type: str,
+                          digest: Optional[str] = None) -> str:
+        """See StorageBackend.upload_file"""
+        return await asyncio.to_thread(self.storage.upload_file, storage_path, file_path,
+                                       content_type, digest)
+
+    async def delete(self, storage_path: str) -> None:
+        await asyncio.to_thread(self.storage.delete, storage_path)
+
+
+class AsyncSupabaseStorage(AsyncStorage):
+    """Supabase Storage bucket on the asyncio Storage client"""
+
+    def __init__(self, storage: StorageBackend, clients):
+        super().__init__(storage)
+        self.bucket = clients.storage.from_(Config.SUPABASE_STORAGE_BUCKET)
+
+    async def upload_file(self, storage_path: str, file_path: str, content_type: str,
+                          digest: Optional[str] = None) -> str:
+        # storage3 opens the path itself and streams it as the request body
+        await self.bucket.upload(storage_path, file_path, {"content-type": content_type})
+        return storage_path
+
+    async def delete(self, storage_path: str) -> None:
+        await self.bucket.remove([storage_path])
+
+
+def get_async_database(db: Optional[BaseDatabase] = None) -> AsyncDatabase:
+    """Async repository for Config.DATABASE_BACKEND (wrapping db, or a new one)"""
+    db = db or get_database()
+    if Config.DATABASE_BACKEND == 'supabase':
+        from supabase_client import get_async_supabase
+        clients = get_async_supabase()
+        if clients is not None:
+            return AsyncSupabaseDatabase(db, clients)
+    return AsyncDatabase(db)
+
+
+def get_async_storage(storage: Optional[StorageBackend] = None) -> AsyncStorage:
+    """Async storage for Config.STORAGE_BACKEND (wrapping storage, or a new one)"""
+    storage = storage or get_storage()
+    if Config.STORAGE_BACKEND == 'supabase':
+        from supabase_client import get_async_supabase
+        clients = get_async_supabase()
+        if clients is not None:
+            return AsyncSupabaseStorage(storage, clients)
+    return AsyncStorage(storage)
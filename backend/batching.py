@@ -0,0 +1,182 @@
+"""
+Micro-batching Module
+Coalesces concurrent inference calls into stacked batches
+
+Tiles submitted by concurrent requests wait in a queue until either
+max_batch_size items are pending or the oldest has waited max_wait_ms.
+Same-shaped items are then stacked into one (N, H, W, C) array and run
+through the batch function in a single call, and each result is handed
+back to its caller's Future. This keeps the vectorized kernel (or a
+model's batched forward pass) fed with large arrays instead of many
+small ones.
+
+Metrics (stats()) report batch fill ratio and queueing delay so the knobs
+in Config (MICROBATCH_*) can be tuned.
+
+The scheduler is not tied to arrays: with collate=list it also coalesces
+database writes (see app.py's write-behind buffer).
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Dynamic batching scheduler running on background threads"""
+
+    def __init__(self, batch_fn: Callable[[Any], Any], max_batch_size: int = 16,
+                 max_wait_ms: float = 10.0, workers: int = 1, name: str = 'batcher',
+                 collate: Callable[[List[Any]], Any] = None):
+        """
+        Args:
+            batch_fn: Callable taking a stacked array (N, ...) and returning
+                N results (array or sequence) in the same order
+            max_batch_size: Largest batch handed to batch_fn
+            max_wait_ms: Longest time the first item of a batch waits for more
+            workers: Threads running batches (batch_fn may run concurrently)
+            name: Thread name prefix
+            collate: Builds the batch_fn argument from the items of one group
+                (defaults to np.stack; pass list for non-array items)
+        """
+        if max_batch_size < 1 or max_wait_ms < 0 or workers < 1:
+            raise ValueError('max_batch_size and workers must be >= 1, max_wait_ms >= 0')
+
+        self.batch_fn = batch_fn
+        self.collate = collate or np.stack
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+        self._recent_delays = deque(maxlen=1024)
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'{name}-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue one input; the Future resolves to its result"""
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def predict(self, item: Any) -> Any:
+        """Submit one input and wait for its result"""
+        return self.submit(item).result()
+
+    def _worker(self):
+        """Collect batches until shutdown"""
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch = [first]
+            deadline = first[2] + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch: List[tuple]):
+        """Stack same-shaped items, run batch_fn and scatter results"""
+        started = time.perf_counter()
+        self._record(batch, started)
+
+        groups: Dict[tuple, List[tuple]] = {}
+        for entry in batch:
+            item = entry[0]
+            groups.setdefault((np.shape(item), str(getattr(item, 'dtype', ''))), []).append(entry)
+
+        for entries in groups.values():
+            # Callers that cancelled while queued drop out
+            entries = [entry for entry in entries if entry[1].set_running_or_notify_cancel()]
+            if not entries:
+                continue
+            futures = [future for _, future, _ in entries]
+            try:
+                results = list(self.batch_fn(self.collate([item for item, _, _ in entries])))
+                if len(results) != len(futures):
+                    # zip() would leave the unmatched callers waiting forever
+                    raise ValueError(f'batch_fn returned {len(results)} results '
+                                     f'for {len(futures)} items')
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _record(self, batch: List[tuple], started: float):
+        """Update fill ratio and queueing delay metrics"""
+        delays = [started - enqueued for _, _, enqueued in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._delay_total += sum(delays)
+            self._delay_max = max(self._delay_max, max(delays))
+            self._recent_delays.extend(delays)
+
+    def stats(self) -> Dict:
+        """
+        Batching metrics since start
+
+        Returns:
+            Dictionary with batches, items, avgBatchSize, fillRatio
+            (avg batch size / max_batch_size), queue delay avg/p95/max in ms,
+            pending items and the configured knobs
+        """
+        with self._stats_lock:
+            recent = sorted(self._recent_delays)
+            batches, items = self._batches, self._items
+            delay_total, delay_max = self._delay_total, self._delay_max
+
+        avg_batch = items / batches if batches else 0.0
+        return {
+            'batches': batches,
+            'items': items,
+            'avgBatchSize': round(avg_batch, 2),
+            'fillRatio': round(avg_batch / self.max_batch_size, 3),
+            'queueDelayAvgMs': round(delay_total / items * 1000, 3) if items else 0.0,
+            'queueDelayP95Ms': round(recent[int(0.95 * (len(recent) - 1))] * 1000, 3) if recent else 0.0,
+            'queueDelayMaxMs': round(delay_max * 1000, 3),
+            'pending': self._queue.qsize(),
+            'maxBatchSize': self.max_batch_size,
+            'maxWaitMs': self.max_wait * 1000
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stop the workers after the queued items have been processed"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
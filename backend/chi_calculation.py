@@ -23,12 +23,16 @@ try:
     import numpy as np
 except Exception:
     np = None
-from typing import Dict, Tuple, Any
+from typing import Dict, Tuple, Any, Iterable
+
+from mask_stats import MaskStats, PackedLabels, compute_mask_stats, compute_label_stats, combine_stats
 
 
 def calculate_chi(image: Any, vegetation_mask: Any, 
                   healthy_mask: Any = None, 
-                  stressed_mask: Any = None) -> Dict[str, float]:
+                  stressed_mask: Any = None,
+                  stats: MaskStats = None,
+                  labels: Any = None) -> Dict[str, float]:
     """
     Calculate Canopy Health Index from vegetation data
     
@@ -47,6 +51,9 @@ def calculate_chi(image: Any, vegetation_mask: Any,
         vegetation_mask: Binary mask of all vegetation
         healthy_mask: Mask of healthy vegetation (optional)
         stressed_mask: Mask of stressed vegetation (optional)
+        stats: Precomputed mask_stats.MaskStats; skips counting the masks again
+        labels: Label raster (plain or PackedLabels) in place of the three
+            masks; vegetation_mask may then be None
         
     Returns:
         Dictionary containing:
@@ -100,51 +107,54 @@ def calculate_chi(image: Any, vegetation_mask: Any,
     """
     print("[CHI CALCULATION] Calculating Canopy Health Index")
     print("[CHI CALCULATION] ⚠️ Using placeholder - implement actual algorithm")
-    
+
     # Placeholder implementation
-    # If numpy is unavailable, compute using pure Python fallbacks
-    if np is None:
-        print('[CHI_CALC] NumPy not available — using fallback calculations')
-        total_pixels = len(vegetation_mask) * len(vegetation_mask[0]) if vegetation_mask and vegetation_mask[0] else 1
-        veg_pixels = sum(sum(1 for v in row if v) for row in vegetation_mask)
-        coverage = (veg_pixels / (total_pixels + 1e-6)) * 100
-
-        if healthy_mask is not None and stressed_mask is not None:
-            healthy_pixels = sum(sum(1 for v in row if v) for row in healthy_mask)
-            stressed_pixels = sum(sum(1 for v in row if v) for row in stressed_mask)
-            health_ratio = (healthy_pixels / (veg_pixels + 1e-6)) * 100
-            stress_ratio = (stressed_pixels / (veg_pixels + 1e-6)) * 100
-        else:
-            health_ratio = 70.0
-            stress_ratio = 30.0
-
-        chi_value = (coverage * 0.4 + health_ratio * 0.6)
-        chi_value = max(0.0, min(100.0, chi_value))
+    if stats is None:
+        stats = (compute_label_stats(labels) if labels is not None
+                 else compute_mask_stats(vegetation_mask, healthy_mask, stressed_mask))
+    return _chi_from_stats(stats)
 
-        return {
-            'chi_value': round(chi_value, 2),
-            'vegetation_coverage': round(coverage, 2),
-            'healthy_percentage': round(health_ratio, 2),
-            'stressed_percentage': round(stress_ratio, 2),
-            'confidence': 0.75
-        }
 
-    total_pixels = vegetation_mask.size
-    veg_pixels = np.sum(vegetation_mask)
-    coverage = (veg_pixels / (total_pixels + 1e-6)) * 100
+def calculate_chi_tiled(tile_masks: Iterable[Any]) -> Dict[str, float]:
+    """
+    Calculate CHI for an image processed tile by tile
+    
+    Only running pixel counts are kept, so memory stays bounded by a single
+    tile no matter how large the mosaic is. The result is identical to
+    calling calculate_chi on the stitched masks.
+    
+    Args:
+        tile_masks: Iterable of label rasters, plain (e.g. from
+            vegetation_detection.detect_vegetation_tiled) or PackedLabels
+            (stored artifacts), or of (vegetation_mask, healthy_mask,
+            stressed_mask) tuples
+        
+    Returns:
+        Same dictionary as calculate_chi
+    """
+    # PackedLabels is a NamedTuple, so it must be told apart from mask tuples first
+    stats = combine_stats(
+        compute_mask_stats(*masks) if isinstance(masks, tuple) and not isinstance(masks, PackedLabels)
+        else compute_label_stats(masks)
+        for masks in tile_masks
+    )
+    return _chi_from_stats(stats)
 
-    if healthy_mask is not None and stressed_mask is not None:
-        healthy_pixels = np.sum(healthy_mask)
-        stressed_pixels = np.sum(stressed_mask)
-        health_ratio = (healthy_pixels / (veg_pixels + 1e-6)) * 100
-        stress_ratio = (stressed_pixels / (veg_pixels + 1e-6)) * 100
+
+def _chi_from_stats(stats: MaskStats) -> Dict[str, float]:
+    """Combine pixel statistics into the CHI result dictionary"""
+    coverage = stats.coverage
+
+    if stats.has_health:
+        health_ratio = stats.healthy_percentage
+        stress_ratio = stats.stressed_percentage
     else:
         health_ratio = 70.0
         stress_ratio = 30.0
 
     # Dummy CHI calculation
     chi_value = (coverage * 0.4 + health_ratio * 0.6)
-    chi_value = np.clip(chi_value, 0, 100)
+    chi_value = max(0.0, min(100.0, chi_value))
 
     return {
         'chi_value': round(chi_value, 2),
@@ -155,46 +165,219 @@ def calculate_chi(image: Any, vegetation_mask: Any,
     }
 
 
-def calculate_spectral_indices(image: Any) -> Dict[str, float]:
+# Band layout of analysis rasters: RGB as decoded by preprocessing (PIL),
+# with NIR as an optional fourth band for multispectral captures
+DEFAULT_BANDS = {'red': 0, 'green': 1, 'blue': 2, 'nir': 3}
+
+# Pixels processed per pass; bounds the float32 scratch buffers
+SPECTRAL_CHUNK_PIXELS = 1 << 20
+
+MULTISPECTRAL_INDICES = ('ndvi', 'evi', 'savi', 'ndwi')
+VISIBLE_INDICES = ('vari', 'exg')
+
+_EPS = 1e-6
+
+
+def calculate_spectral_indices(image: Any, bands: Dict[str, int] = None,
+                               chunk_pixels: int = SPECTRAL_CHUNK_PIXELS) -> Dict[str, float]:
     """
-    Calculate vegetation spectral indices
+    Calculate vegetation spectral indices (image-wide means)
     
-    TODO: Implement spectral index calculations
+    Indices:
+    - NDVI: Normalized Difference Vegetation Index   (needs NIR)
+    - EVI: Enhanced Vegetation Index                 (needs NIR)
+    - SAVI: Soil-Adjusted Vegetation Index           (needs NIR)
+    - NDWI: Normalized Difference Water Index        (needs NIR)
+    - VARI: Visible Atmospherically Resistant Index  (RGB fallback)
+    - ExG: Excess Green, chromatic form              (RGB fallback)
     
-    Common indices:
-    - NDVI: Normalized Difference Vegetation Index
-    - EVI: Enhanced Vegetation Index
-    - SAVI: Soil-Adjusted Vegetation Index
-    - NDWI: Normalized Difference Water Index
+    The image is streamed in row blocks through fused kernels that write
+    into preallocated float32 buffers and share the NIR+Red / NIR-Red
+    terms between indices. Means are accumulated in float64 without ever
+    materializing a full-size raster, so a 20k x 20k tile needs only a few
+    chunk-sized buffers instead of several full-size float64 temporaries.
     
     Args:
-        image: Multispectral image (must have NIR and Red bands)
+        image: (H, W, C) array, RGB or RGB+NIR (uint8/uint16 or 0-1 floats)
+        bands: Band index mapping, defaults to DEFAULT_BANDS
+        chunk_pixels: Pixels per processing block
         
     Returns:
-        Dictionary of spectral indices
-        
-    Example for NDVI:
-    ```python
-    nir = image[:, :, 3]  # NIR band
-    red = image[:, :, 2]  # Red band
+        Dictionary of mean index values; NIR indices only when a NIR band exists
+    """
+    print("[CHI CALCULATION] Calculating spectral indices")
+
+    if np is None:
+        print('[CHI_CALC] NumPy not available — returning default spectral indices')
+        return {
+            'ndvi': 0.6,
+            'evi': 0.5,
+            'savi': 0.55
+        }
+
+    bands = bands or DEFAULT_BANDS
+    names = _available_indices(image, bands)
+    totals = dict.fromkeys(names, 0.0)
+    pixel_count = 0
+
+    scratch = None
+    for top, bottom in _row_blocks(image, chunk_pixels):
+        block = image[top:bottom].reshape(-1, image.shape[2])
+        if scratch is None:
+            scratch = _allocate_scratch(block.shape[0], names)
+        n = block.shape[0]
+        out = {name: scratch[name][:n] for name in names}
+
+        _index_kernel(block, bands, scratch, out)
+
+        for name in names:
+            totals[name] += float(np.add.reduce(out[name], dtype=np.float64))
+        pixel_count += n
+
+    pixel_count = max(pixel_count, 1)
+    return {name: round(total / pixel_count, 4) for name, total in totals.items()}
+
+
+def spectral_index_rasters(image: Any, bands: Dict[str, int] = None,
+                           out: Dict[str, Any] = None,
+                           chunk_pixels: int = SPECTRAL_CHUNK_PIXELS) -> Dict[str, Any]:
+    """
+    Compute per-pixel spectral index rasters
     
-    ndvi = (nir - red) / (nir + red + 1e-6)
-    ndvi = np.clip(ndvi, -1, 1)
+    Same kernels as calculate_spectral_indices, but results are written
+    straight into (H, W) float32 output arrays. Pass `out` to reuse
+    buffers (or memory-mapped arrays) across images.
     
-    return {'ndvi': np.mean(ndvi)}
-    ```
+    Args:
+        image: (H, W, C) array, RGB or RGB+NIR
+        bands: Band index mapping, defaults to DEFAULT_BANDS
+        out: Optional dict of preallocated C-contiguous (H, W) float32 arrays
+        chunk_pixels: Pixels per processing block
+        
+    Returns:
+        Dictionary mapping index name to float32 raster
     """
-    print("[CHI CALCULATION] Calculating spectral indices")
-    print("[CHI CALCULATION] ⚠️ Spectral indices not implemented yet")
+    bands = bands or DEFAULT_BANDS
+    names = _available_indices(image, bands)
+    height, width = image.shape[:2]
+
+    if out is None:
+        out = {}
+    for name in names:
+        if name not in out:
+            out[name] = np.empty((height, width), dtype=np.float32)
+
+    scratch = None
+    for top, bottom in _row_blocks(image, chunk_pixels):
+        block = image[top:bottom].reshape(-1, image.shape[2])
+        if scratch is None:
+            scratch = _allocate_scratch(block.shape[0])
+        _index_kernel(block, bands, scratch,
+                      {name: out[name][top:bottom].reshape(-1) for name in names})
+
+    return {name: out[name] for name in names}
+
+
+def _available_indices(image: Any, bands: Dict[str, int]) -> Tuple[str, ...]:
+    """Indices computable from the bands present in image"""
+    if image.ndim != 3 or image.shape[2] < 3:
+        raise ValueError('Spectral indices need an (H, W, C) image with at least 3 bands')
+    nir = bands.get('nir')
+    if nir is not None and nir < image.shape[2]:
+        return MULTISPECTRAL_INDICES + VISIBLE_INDICES
+    return VISIBLE_INDICES
+
+
+def _row_blocks(image: Any, chunk_pixels: int):
+    """Split image into row ranges of roughly chunk_pixels pixels"""
+    height, width = image.shape[:2]
+    rows = max(1, chunk_pixels // max(width, 1))
+    for top in range(0, height, rows):
+        yield top, min(top + rows, height)
+
+
+def _allocate_scratch(size: int, names: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """Preallocate flat float32 buffers for bands, shared terms and outputs"""
+    keys = ('red', 'green', 'blue', 'nir', 'sum', 'diff', 'tmp', 'tmp2') + tuple(names)
+    return {key: np.empty(size, dtype=np.float32) for key in keys}
+
+
+def _index_kernel(block: Any, bands: Dict[str, int],
+                  scratch: Dict[str, Any], out: Dict[str, Any]) -> None:
+    """
+    Fused index kernel over a flat (N, C) block of pixels
     
-    return {
-        'ndvi': 0.6,
-        'evi': 0.5,
-        'savi': 0.55
-    }
+    Every operation writes into a preallocated buffer (out=...), so no
+    per-operator temporaries are created. Results land in out[name].
+    """
+    n = block.shape[0]
+    scale = 1.0 / np.iinfo(block.dtype).max if np.issubdtype(block.dtype, np.integer) else 1.0
+
+    red, green, blue = scratch['red'][:n], scratch['green'][:n], scratch['blue'][:n]
+    total, diff = scratch['sum'][:n], scratch['diff'][:n]
+    tmp, tmp2 = scratch['tmp'][:n], scratch['tmp2'][:n]
+
+    np.multiply(block[:, bands['red']], scale, out=red, casting='unsafe')
+    np.multiply(block[:, bands['green']], scale, out=green, casting='unsafe')
+    np.multiply(block[:, bands['blue']], scale, out=blue, casting='unsafe')
+
+    if 'ndvi' in out:
+        nir = scratch['nir'][:n]
+        np.multiply(block[:, bands['nir']], scale, out=nir, casting='unsafe')
 
+        # Shared terms: NIR + Red and NIR - Red
+        np.add(nir, red, out=total)
+        np.subtract(nir, red, out=diff)
 
-def analyze_canopy_density(vegetation_mask: Any) -> float:
+        # NDVI = (NIR - Red) / (NIR + Red)
+        np.add(total, _EPS, out=tmp)
+        np.divide(diff, tmp, out=out['ndvi'])
+
+        # SAVI = 1.5 * (NIR - Red) / (NIR + Red + 0.5)
+        np.add(total, 0.5, out=tmp)
+        np.divide(diff, tmp, out=out['savi'])
+        out['savi'] *= 1.5
+
+        # EVI = 2.5 * (NIR - Red) / (NIR + 6 Red - 7.5 Blue + 1)
+        np.multiply(red, 6.0, out=tmp)
+        tmp += nir
+        np.multiply(blue, 7.5, out=tmp2)
+        tmp -= tmp2
+        tmp += 1.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(diff, tmp, out=out['evi'])
+        out['evi'] *= 2.5
+        np.nan_to_num(out['evi'], copy=False, nan=0.0)
+        np.clip(out['evi'], -1.0, 1.0, out=out['evi'])
+
+        # NDWI = (Green - NIR) / (Green + NIR)
+        np.subtract(green, nir, out=tmp)
+        np.add(green, nir, out=tmp2)
+        tmp2 += _EPS
+        np.divide(tmp, tmp2, out=out['ndwi'])
+
+    # VARI = (Green - Red) / (Green + Red - Blue)
+    np.subtract(green, red, out=tmp)
+    np.add(green, red, out=tmp2)
+    tmp2 -= blue
+    tmp2 += _EPS
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(tmp, tmp2, out=out['vari'])
+    np.nan_to_num(out['vari'], copy=False, nan=0.0)
+    np.clip(out['vari'], -1.0, 1.0, out=out['vari'])
+
+    # ExG = (2 Green - Red - Blue) / (Red + Green + Blue)
+    np.multiply(green, 2.0, out=tmp)
+    tmp -= red
+    tmp -= blue
+    np.add(red, green, out=tmp2)
+    tmp2 += blue
+    tmp2 += _EPS
+    np.divide(tmp, tmp2, out=out['exg'])
+
+
+def analyze_canopy_density(vegetation_mask: Any, stats: MaskStats = None,
+                           labels: Any = None) -> float:
     """
     Analyze canopy density from vegetation mask
     
@@ -207,20 +390,19 @@ def analyze_canopy_density(vegetation_mask: Any) -> float:
     
     Args:
         vegetation_mask: Binary vegetation mask
+        stats: Precomputed mask_stats.MaskStats (optional)
+        labels: Label raster (plain or PackedLabels) in place of the mask
         
     Returns:
         Canopy density score (0-100)
     """
     print("[CHI CALCULATION] Analyzing canopy density")
 
-    if np is None:
-        veg_pixels = sum(sum(1 for v in row if v) for row in vegetation_mask)
-        density = veg_pixels / (len(vegetation_mask) * len(vegetation_mask[0]) if vegetation_mask and vegetation_mask[0] else 1)
-        return round(density * 100, 2)
-
     # Placeholder
-    density = np.sum(vegetation_mask) / vegetation_mask.size
-    return round(density * 100, 2)
+    if stats is None:
+        stats = (compute_label_stats(labels) if labels is not None
+                 else compute_mask_stats(vegetation_mask))
+    return round(stats.density * 100, 2)
 
 
 def normalize_to_range(value: float, min_val: float, max_val: float, 
@@ -14,8 +14,22 @@ class Config:
     
     # Server settings
     HOST = '0.0.0.0'
-    PORT = 5000
-    DEBUG = True
+    PORT = int(os.getenv('UCHI_PORT', 5000))
+    DEBUG = os.getenv('UCHI_DEBUG', '1').lower() in ('1', 'true', 'yes')  # dev server only
+    
+    # Production serving (gunicorn -c gunicorn.conf.py): preforked worker
+    # processes x threads per worker. Workers inherit the pipeline and models
+    # loaded in the master before fork.
+    SERVER_WORKERS = int(os.getenv('UCHI_SERVER_WORKERS', os.cpu_count() or 1))
+    SERVER_THREADS = int(os.getenv('UCHI_SERVER_THREADS', 4))
+    SERVER_TIMEOUT = int(os.getenv('UCHI_SERVER_TIMEOUT', 300))  # seconds per request (large uploads)
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv('UCHI_SERVER_GRACEFUL_TIMEOUT', 60))
+    SERVER_KEEPALIVE = int(os.getenv('UCHI_SERVER_KEEPALIVE', 5))
+    SERVER_MAX_REQUESTS = int(os.getenv('UCHI_SERVER_MAX_REQUESTS', 0))  # recycle workers (0 = never)
+    # Load models in the master before fork. Turn off for runtimes whose
+    # thread pools do not survive fork (TensorFlow, ONNX with >1 thread)
+    SERVER_PRELOAD_MODELS = os.getenv('UCHI_SERVER_PRELOAD_MODELS', '1').lower() in ('1', 'true', 'yes')
+    PREFORKED = os.getenv('UCHI_PREFORKED', '0').lower() in ('1', 'true', 'yes')  # set by gunicorn.conf.py
     
     # Supabase settings (MUST be set in .env file)
     SUPABASE_URL = os.getenv('SUPABASE_URL', 'YOUR_SUPABASE_URL')
@@ -28,9 +42,115 @@ class Config:
     
     SUPABASE_STORAGE_BUCKET = 'uchi-images'
     
+    # HTTP connection pool shared by the Supabase REST and Storage clients
+    # (per worker process); size it to the concurrent requests one worker
+    # serves (JOB_WORKERS + request threads)
+    SUPABASE_POOL_SIZE = int(os.getenv('UCHI_SUPABASE_POOL_SIZE', 20))
+    SUPABASE_KEEPALIVE_SECONDS = float(os.getenv('UCHI_SUPABASE_KEEPALIVE_SECONDS', 60))
+    SUPABASE_CONNECT_TIMEOUT = float(os.getenv('UCHI_SUPABASE_CONNECT_TIMEOUT', 5))
+    SUPABASE_TIMEOUT = float(os.getenv('UCHI_SUPABASE_TIMEOUT', 60))  # read/write/pool wait
+    SUPABASE_RETRIES = int(os.getenv('UCHI_SUPABASE_RETRIES', 3))
+    SUPABASE_RETRY_BACKOFF = float(os.getenv('UCHI_SUPABASE_RETRY_BACKOFF', 0.2))  # seconds, doubled per attempt
+    
+    # Backend selection: 'supabase' (cloud) or 'local' (SQLite + uploads/ directory)
+    DATABASE_BACKEND = os.getenv('UCHI_DATABASE_BACKEND', 'supabase')
+    STORAGE_BACKEND = os.getenv('UCHI_STORAGE_BACKEND', 'supabase')
+    
+    # Local SQLite database (local_database.LocalDatabase)
+    LOCAL_DB_PATH = os.getenv(
+        'UCHI_LOCAL_DB_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'uchi.db')
+    )
+    
     # File upload settings
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
-    MAX_FILE_SIZE = 16 * 1024 * 1024  # 16 MB
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'tif', 'tiff'}
+    # Uploads are streamed to disk (ingest.py), so large orthophotos don't grow RSS
+    MAX_FILE_SIZE = int(os.getenv('UCHI_MAX_FILE_SIZE', 2 * 1024 * 1024 * 1024))  # 2 GB
+    # Whole /upload-batch request body (every other request is held to MAX_FILE_SIZE)
+    MAX_BATCH_REQUEST_SIZE = int(os.getenv('UCHI_MAX_BATCH_REQUEST_SIZE', 64 * 1024 * 1024 * 1024))  # 64 GB
+    # Decompression-bomb guard for decoded rasters (preprocessing.open_raster)
+    MAX_IMAGE_PIXELS = int(os.getenv('UCHI_MAX_IMAGE_PIXELS', 1_500_000_000))
+    # Largest image decoded in one piece when no windowed reader applies
+    # (single-stream PNG/JPEG without rasterio); about 3 bytes per pixel of RAM
+    MAX_FULL_DECODE_PIXELS = int(os.getenv('UCHI_MAX_FULL_DECODE_PIXELS', 100_000_000))
+    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    INGEST_FOLDER = os.path.join(UPLOAD_FOLDER, 'incoming')
+    LOCAL_STORAGE_PATH = os.getenv('UCHI_LOCAL_STORAGE_PATH', os.path.join(UPLOAD_FOLDER, 'objects'))
+    
+    DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    
+    # Background job settings (/jobs)
+    JOB_DB_PATH = os.path.join(DATA_FOLDER, 'jobs.db')
+    JOB_WORKERS = int(os.getenv('UCHI_JOB_WORKERS', 4))
+    
+    # /get-results pagination
+    RESULTS_PAGE_SIZE = 100
+    RESULTS_PAGE_MAX = 1000
+    
+    # Duplicate-upload result cache (keyed by image hash + pipeline version)
+    # Bump PIPELINE_VERSION whenever the analysis pipeline changes (the active
+    # model version is part of the cache key already)
+    PIPELINE_VERSION = '1.0.0'
+    RESULT_CACHE_PATH = os.path.join(DATA_FOLDER, 'result_cache.db')
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('UCHI_RESULT_CACHE_SIZE', 10000))
+    
+    # Read-through cache of the dashboard endpoints (read_cache.py); entries
+    # are dropped on writes to their region, TTLs (seconds, 0 = off) bound
+    # staleness from writes in other processes
+    READ_CACHE_URL = os.getenv('UCHI_READ_CACHE_URL', '')  # redis://...; empty = in-process
+    READ_CACHE_MAX_ENTRIES = int(os.getenv('UCHI_READ_CACHE_SIZE', 1000))
+    # Touched by read_cache.clear_shared(); in-process caches drop everything when it changes
+    READ_CACHE_EPOCH_PATH = os.path.join(DATA_FOLDER, 'read_cache.epoch')
+    READ_CACHE_TTLS = {
+        'summary': float(os.getenv('UCHI_READ_CACHE_TTL_SUMMARY', 60)),
+        'rvce': float(os.getenv('UCHI_READ_CACHE_TTL_RVCE', 60)),
+        'compare': float(os.getenv('UCHI_READ_CACHE_TTL_COMPARE', 30))
+    }
+    
+    # Per-image label artifacts (artifacts.py), used by rescore.py to
+    # recompute CHI without re-running segmentation
+    ARTIFACTS_ENABLED = os.getenv('UCHI_ARTIFACTS', '1').lower() in ('1', 'true', 'yes')
+    ARTIFACT_PATH = os.getenv('UCHI_ARTIFACT_PATH', os.path.join(DATA_FOLDER, 'artifacts'))
+    # Spectral index rasters (ExG, GRVI) are kept as float16 means of
+    # ARTIFACT_INDEX_BLOCK x ARTIFACT_INDEX_BLOCK pixel blocks (1 = full
+    # resolution, 0 = not kept)
+    ARTIFACT_INDEX_BLOCK = int(os.getenv('UCHI_ARTIFACT_INDEX_BLOCK', 8))
+    RESCORE_PAGE_SIZE = 1000  # results per page (one worker task and one batched write)
+    RESCORE_CHECKPOINT_PATH = os.path.join(DATA_FOLDER, 'rescore_checkpoint.json')
+    
+    # Segmentation models (model_registry.py); 'classical-*' is the built-in
+    # ExG segmenter, other versions load MODEL_FOLDER/vegetation/<version>.onnx
+    # (or .keras)
+    MODEL_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+    VEGETATION_MODEL_VERSION = os.getenv('UCHI_VEGETATION_MODEL', 'classical-1')
+    # Versions activated through /models/<name>/activate, shared by all
+    # worker processes (model_registry.py); removed at server start
+    MODEL_STATE_PATH = os.path.join(DATA_FOLDER, 'active_models.json')
+    
+    # ONNX Runtime CPU threads per session (onnx_inference.py); keep
+    # intra-op threads x batch workers <= cores to avoid oversubscription
+    ONNX_INTRA_OP_THREADS = int(os.getenv('UCHI_ONNX_INTRA_OP_THREADS', 1))
+    ONNX_INTER_OP_THREADS = int(os.getenv('UCHI_ONNX_INTER_OP_THREADS', 1))
+    
+    # Micro-batching of tile segmentation across concurrent requests (batching.py)
+    MICROBATCH_ENABLED = os.getenv('UCHI_MICROBATCH', '1').lower() in ('1', 'true', 'yes')
+    MICROBATCH_MAX_SIZE = int(os.getenv('UCHI_MICROBATCH_MAX_SIZE', 16))
+    MICROBATCH_MAX_WAIT_MS = float(os.getenv('UCHI_MICROBATCH_MAX_WAIT_MS', 10))
+    MICROBATCH_WORKERS = int(os.getenv('UCHI_MICROBATCH_WORKERS', 2))
+    
+    # Write-behind buffer for analysis results (Database.insert_analyses):
+    # concurrent saves are flushed together after WRITE_BATCH_MAX_WAIT_MS or
+    # once WRITE_BATCH_MAX_SIZE are pending
+    WRITE_BATCH_MAX_SIZE = int(os.getenv('UCHI_WRITE_BATCH_MAX_SIZE', 100))
+    WRITE_BATCH_MAX_WAIT_MS = float(os.getenv('UCHI_WRITE_BATCH_MAX_WAIT_MS', 20))
+    
+    # Threads (per worker process) that run storage uploads concurrently
+    # with the analysis of the same image (app._process_upload)
+    STORAGE_UPLOAD_WORKERS = int(os.getenv('UCHI_STORAGE_UPLOAD_WORKERS', 8))
+    
+    # Batch analysis settings (/upload-batch)
+    BATCH_MAX_WORKERS = int(os.getenv('UCHI_BATCH_WORKERS', os.cpu_count() or 1))
+    BATCH_MAX_FILES = 5000
     
     # CHI ranges by region (as per requirements)
     CHI_RANGES = {
@@ -3,18 +3,292 @@ Database module for UCHI
 Handles all database operations using Supabase PostgreSQL
 """
 
-from supabase import Client
 from datetime import datetime
-from typing import List, Dict, Optional
-from supabase_client import get_supabase
+from typing import List, Dict, Optional, Iterator, Tuple, TYPE_CHECKING
+import base64
+import json
+from config import Config
 
+if TYPE_CHECKING:
+    from supabase import Client
 
-class Database:
+
+# API field name -> chi_results column, for fields= projection
+RESULT_FIELDS = {
+    'id': 'id',
+    'imageId': 'image_id',
+    'areaType': 'area_type',
+    'subRegion': 'sub_region',
+    'chiValue': 'chi_value',
+    'status': 'status',
+    'interpretation': 'interpretation',
+    'date': 'date',
+    'vegetationCoverage': 'vegetation_coverage',
+    'healthyVegetation': 'healthy_vegetation',
+    'stressedVegetation': 'stressed_vegetation',
+    'createdAt': 'created_at'
+}
+
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque cursor"""
+    raw = json.dumps([created_at, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(created_at), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+class BaseDatabase:
+    """
+    Repository interface for UCHI results
+    
+    Implementations: Database (Supabase PostgreSQL) and
+    local_database.LocalDatabase (SQLite). Use get_database() to create
+    the one selected by Config.DATABASE_BACKEND.
+    """
+    
+    def is_connected(self) -> bool:
+        """Check if the backing store is reachable"""
+        raise NotImplementedError
+    
+    def insert_image_metadata(self, filename: str, storage_path: str, area_type: str,
+                              sub_region: Optional[str], date: str) -> int:
+        """Insert image metadata, returning its id (-1 on failure)"""
+        raise NotImplementedError
+    
+    def insert_chi_result(self, image_id: int, area_type: str, sub_region: Optional[str],
+                          chi_value: float, status: str, interpretation: str, date: str,
+                          vegetation_coverage: float, healthy_vegetation: float,
+                          stressed_vegetation: float) -> int:
+        """Insert a CHI result, returning its id (-1 on failure)"""
+        raise NotImplementedError
+    
+    def insert_analyses(self, analyses: List[Dict]) -> List[Tuple[int, int]]:
+        """
+        Insert image metadata and CHI result for many analyses at once
+        
+        Args:
+            analyses: Dicts with the insert_image_metadata arguments (filename,
+                      storage_path, area_type, sub_region, date) and the
+                      insert_chi_result scores (chi_value, status,
+                      interpretation, vegetation_coverage,
+                      healthy_vegetation, stressed_vegetation)
+        
+        Returns:
+            (image_id, result_id) per analysis, in order; (-1, -1) on failure
+        """
+        ids = []
+        for analysis in analyses:
+            image_id = self.insert_image_metadata(
+                analysis['filename'], analysis['storage_path'], analysis['area_type'],
+                analysis['sub_region'], analysis['date']
+            )
+            result_id = self.insert_chi_result(
+                image_id, analysis['area_type'], analysis['sub_region'],
+                analysis['chi_value'], analysis['status'], analysis['interpretation'],
+                analysis['date'], analysis['vegetation_coverage'],
+                analysis['healthy_vegetation'], analysis['stressed_vegetation']
+            )
+            ids.append((image_id, result_id))
+        return ids
+    
+    def update_chi_result(self, result_id: int, chi_value: float, status: str,
+                          interpretation: str, vegetation_coverage: float,
+                          healthy_vegetation: float, stressed_vegetation: float) -> bool:
+        """
+        Overwrite the scores of an existing CHI result (used by rescore.py)
+        
+        region_rollups is maintained on insert only; call
+        rebuild_region_rollups() after a round of updates.
+        """
+        raise NotImplementedError
+    
+    def update_chi_results(self, rows: List[Dict]) -> int:
+        """
+        Overwrite the scores of many CHI results in one round trip
+        
+        Only existing rows are updated; a result deleted meanwhile stays
+        deleted and is not counted.
+        
+        Args:
+            rows: Dicts with id and the score columns (chi_value, status,
+                  interpretation, vegetation_coverage, healthy_vegetation,
+                  stressed_vegetation); other keys are ignored
+        
+        Returns:
+            Number of rows written
+        
+        Raises:
+            Exception: From the database client; nothing is written then
+        """
+        raise NotImplementedError
+    
+    def rebuild_region_rollups(self) -> bool:
+        """Recompute region_rollups from the full chi_results history"""
+        raise NotImplementedError
+    
+    def get_all_results(self) -> List[Dict]:
+        """Get all CHI results, newest first"""
+        raise NotImplementedError
+    
+    def get_results_page(self, limit: int = 100, cursor: Optional[str] = None,
+                         fields: Optional[List[str]] = None, area_type: Optional[str] = None,
+                         sub_region: Optional[str] = None, date_from: Optional[str] = None,
+                         date_to: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one keyset-paginated page of CHI results (see Database.get_results_page)"""
+        raise NotImplementedError
+    
+    def get_bangalore_summary(self) -> Dict:
+        """Get Bengaluru summary statistics"""
+        raise NotImplementedError
+    
+    def get_rvce_results(self) -> List[Dict]:
+        """Get RVCE region-wise results"""
+        raise NotImplementedError
+    
+    def get_temporal_comparison(self, region: str) -> List[Dict]:
+        """Get temporal CHI data for a specific region"""
+        raise NotImplementedError
+    
+    def iter_results(self, page_size: int = 500, **filters) -> Iterator[Dict]:
+        """
+        Stream all matching CHI results page by page
+        
+        Only one page is held in memory at a time.
+        
+        Args:
+            page_size: Rows fetched per round trip
+            **filters: fields / area_type / sub_region / date_from / date_to
+                       as for get_results_page
+        """
+        cursor = None
+        while True:
+            results, cursor = self.get_results_page(limit=page_size, cursor=cursor, **filters)
+            yield from results
+            if cursor is None:
+                return
+    
+    def _result_from_row(self, row: Dict) -> Dict:
+        """Convert a chi_results row to the camelCase API representation"""
+        return {
+            'id': row['id'],
+            'imageId': row['image_id'],
+            'areaType': row['area_type'],
+            'subRegion': row['sub_region'],
+            'chiValue': row['chi_value'],
+            'status': row['status'],
+            'interpretation': row['interpretation'],
+            'date': row['date'],
+            'vegetationCoverage': row.get('vegetation_coverage'),
+            'healthyVegetation': row.get('healthy_vegetation'),
+            'stressedVegetation': row.get('stressed_vegetation')
+        }
+    
+    def _project_columns(self, fields: Optional[List[str]]) -> List[str]:
+        """Columns to select for the requested API fields (always incl. the keyset)"""
+        if not fields:
+            return list(RESULT_FIELDS.values())
+        unknown = [field for field in fields if field not in RESULT_FIELDS]
+        if unknown:
+            raise ValueError(f'Unknown fields: {unknown}. Must be among: {list(RESULT_FIELDS)}')
+        columns = {RESULT_FIELDS[field] for field in fields} | {'id', 'created_at'}
+        return [column for column in RESULT_FIELDS.values() if column in columns]
+    
+    def _page_from_rows(self, rows: List[Dict], limit: int,
+                        fields: Optional[List[str]]) -> Tuple[List[Dict], Optional[str]]:
+        """Project a page of rows and compute the cursor for the next page"""
+        if fields:
+            results = [{field: row.get(RESULT_FIELDS[field]) for field in fields} for row in rows]
+        else:
+            results = [self._result_from_row(row) for row in rows]
+        
+        next_cursor = None
+        if len(rows) == limit and rows:
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return results, next_cursor
+    
+    def _default_summary(self) -> Dict:
+        """Summary returned when no Bengaluru analyses exist yet"""
+        return {
+            'avgCHI': 62.0,
+            'status': 'Good',
+            'trend': 'stable',
+            'lastUpdated': datetime.now().isoformat(),
+            'totalAnalyses': 0
+        }
+    
+    def _summary_from_row(self, row: Dict) -> Dict:
+        """Build the summary response from an aggregated area row"""
+        avg_chi = float(row['avg_chi'])
+        
+        # Simple trend calculation (compare last 2)
+        trend = 'stable'
+        if row['previous_chi'] is not None:
+            recent = row['latest_chi']
+            previous = row['previous_chi']
+            if recent > previous + 2:
+                trend = 'improving'
+            elif recent < previous - 2:
+                trend = 'declining'
+        
+        return {
+            'avgCHI': round(avg_chi, 2),
+            'status': self._get_status_from_chi(avg_chi),
+            'trend': trend,
+            'lastUpdated': row['last_updated'],
+            'totalAnalyses': row['analyses']
+        }
+    
+    def _region_from_row(self, row: Dict) -> Dict:
+        """Build an RVCE region entry from an aggregated region row"""
+        avg_chi = float(row['avg_chi'])
+        return {
+            'region': row['sub_region'] or 'Unknown',
+            'avgCHI': round(avg_chi, 2),
+            'status': self._get_status_from_chi(avg_chi),
+            'analyses': row['analyses']
+        }
+    
+    def _get_status_from_chi(self, chi_value: float) -> str:
+        """Determine status from CHI value"""
+        if chi_value >= 75:
+            return 'Excellent'
+        elif chi_value >= 60:
+            return 'Good'
+        elif chi_value >= 45:
+            return 'Moderate'
+        elif chi_value >= 30:
+            return 'Poor'
+        else:
+            return 'Critical'
+
+
+class Database(BaseDatabase):
     """Database manager for UCHI application using Supabase"""
     
     def __init__(self):
-        """Initialize database connection to Supabase"""
-        self.supabase: Client = get_supabase()
+        """Initialize database connection to Supabase (the client is created on first use)"""
+        self._supabase: Optional['Client'] = None
+    
+    @property
+    def supabase(self) -> 'Client':
+        """Supabase client, imported and connected on first access"""
+        if self._supabase is None:
+            from supabase_client import get_supabase
+            self._supabase = get_supabase()
+        return self._supabase
     
     def is_connected(self) -> bool:
         """Check if Supabase client is accessible"""
@@ -108,120 +382,193 @@ class Database:
             print(f"❌ Error inserting CHI result: {e}")
             return -1
     
+    def insert_analyses(self, analyses: List[Dict]) -> List[Tuple[int, int]]:
+        """
+        Insert many analyses in one round trip and one transaction
+        
+        Calls the insert_analyses() function from supabase_schema.sql, which
+        writes each image_metadata row and its chi_results row together.
+        If the transaction fails, the analyses are retried one by one so a
+        bad row only fails itself.
+        
+        Returns:
+            (image_id, result_id) per analysis, in order; (-1, -1) on failure
+        """
+        if not analyses:
+            return []
+        try:
+            items = [{**analysis, 'uploaded_at': datetime.now().isoformat()} for analysis in analyses]
+            response = self.supabase.rpc('insert_analyses', {'items': items}).execute()
+            rows = sorted(response.data or [], key=lambda row: row['ordinal'])
+            if len(rows) == len(analyses):
+                return [(row['new_image_id'], row['new_result_id']) for row in rows]
+            print(f"⚠️  insert_analyses returned {len(rows)} rows for {len(analyses)} analyses")
+        except Exception as e:
+            print(f"❌ Error inserting {len(analyses)} analyses: {e}")
+        if len(analyses) == 1:
+            return [(-1, -1)]
+        return [self.insert_analyses([analysis])[0] for analysis in analyses]
+    
+    def update_chi_result(
+        self,
+        result_id: int,
+        chi_value: float,
+        status: str,
+        interpretation: str,
+        vegetation_coverage: float,
+        healthy_vegetation: float,
+        stressed_vegetation: float
+    ) -> bool:
+        """
+        Overwrite the scores of a CHI result in Supabase
+        
+        Returns:
+            True if the row was updated
+        """
+        try:
+            response = self.supabase.table('chi_results').update({
+                'chi_value': chi_value,
+                'status': status,
+                'interpretation': interpretation,
+                'vegetation_coverage': vegetation_coverage,
+                'healthy_vegetation': healthy_vegetation,
+                'stressed_vegetation': stressed_vegetation
+            }).eq('id', result_id).execute()
+            return bool(response.data)
+        except Exception as e:
+            print(f"❌ Error updating CHI result {result_id}: {e}")
+            return False
+    
+    def update_chi_results(self, rows: List[Dict]) -> int:
+        """
+        Overwrite many CHI results with one UPDATE ... FROM statement
+        
+        update_chi_results() in supabase_schema.sql; an upsert would
+        re-insert results deleted during a rescore (and fire the rollup
+        trigger for them).
+        
+        Returns:
+            Number of rows written
+        """
+        if not rows:
+            return 0
+        try:
+            response = self.supabase.rpc('update_chi_results', {'items': rows}).execute()
+            return int(response.data or 0)
+        except Exception as e:
+            print(f"❌ Error updating {len(rows)} CHI results: {e}")
+            raise
+    
+    def rebuild_region_rollups(self) -> bool:
+        """Recompute region_rollups server-side (rebuild_region_rollups() in supabase_schema.sql)"""
+        try:
+            self.supabase.rpc('rebuild_region_rollups', {}).execute()
+            return True
+        except Exception as e:
+            print(f"❌ Error rebuilding region rollups: {e}")
+            return False
+    
     def get_all_results(self) -> List[Dict]:
         """Get all CHI results from Supabase"""
         try:
             response = self.supabase.table('chi_results').select('*').order('created_at', desc=True).execute()
             
-            results = []
-            for row in response.data:
-                results.append({
-                    'id': row['id'],
-                    'imageId': row['image_id'],
-                    'areaType': row['area_type'],
-                    'subRegion': row['sub_region'],
-                    'chiValue': row['chi_value'],
-                    'status': row['status'],
-                    'interpretation': row['interpretation'],
-                    'date': row['date'],
-                    'vegetationCoverage': row.get('vegetation_coverage'),
-                    'healthyVegetation': row.get('healthy_vegetation'),
-                    'stressedVegetation': row.get('stressed_vegetation')
-                })
-            
-            return results
+            return [self._result_from_row(row) for row in response.data]
             
         except Exception as e:
             print(f"❌ Error fetching all results: {e}")
             return []
     
-    def get_bangalore_summary(self) -> Dict:
-        """Get Bengaluru summary statistics from Supabase"""
+    def get_results_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        area_type: Optional[str] = None,
+        sub_region: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Get one page of CHI results, newest first
+        
+        Uses keyset pagination on (created_at, id), so every page is an
+        index range scan no matter how deep the client pages.
+        
+        Args:
+            limit: Maximum rows to return
+            cursor: nextCursor from the previous page (None for the first page)
+            fields: API field names to return (see RESULT_FIELDS), default all
+            area_type / sub_region: Optional equality filters
+            date_from / date_to: Optional inclusive capture-date range (YYYY-MM-DD)
+            
+        Returns:
+            Tuple of (results, next_cursor); next_cursor is None on the last page
+            
+        Raises:
+            ValueError: For unknown fields or a malformed cursor
+            Exception: From the Supabase client when the query fails
+        """
+        columns = self._project_columns(fields)
+        position = decode_cursor(cursor) if cursor else None
+        
         try:
-            # Get all Bengaluru results
-            response = self.supabase.table('chi_results')\
-                .select('chi_value, created_at')\
-                .eq('area_type', 'Bengaluru')\
-                .execute()
+            query = self.supabase.table('chi_results').select(','.join(columns))
             
-            if not response.data or len(response.data) == 0:
-                return {
-                    'avgCHI': 62.0,
-                    'status': 'Good',
-                    'trend': 'stable',
-                    'lastUpdated': datetime.now().isoformat(),
-                    'totalAnalyses': 0
-                }
+            if area_type:
+                query = query.eq('area_type', area_type)
+            if sub_region:
+                query = query.eq('sub_region', sub_region)
+            if date_from:
+                query = query.gte('date', date_from)
+            if date_to:
+                query = query.lte('date', date_to)
+            if position:
+                created_at, row_id = position
+                query = query.or_(
+                    f'created_at.lt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.lt.{row_id})'
+                )
             
-            # Calculate average
-            chi_values = [row['chi_value'] for row in response.data]
-            avg_chi = sum(chi_values) / len(chi_values)
+            response = query\
+                .order('created_at', desc=True)\
+                .order('id', desc=True)\
+                .limit(limit)\
+                .execute()
             
-            # Get status
-            status = self._get_status_from_chi(avg_chi)
+            return self._page_from_rows(response.data, limit, fields)
             
-            # Simple trend calculation (compare last 2)
-            trend = 'stable'
-            if len(chi_values) >= 2:
-                recent = chi_values[0]
-                previous = chi_values[1]
-                if recent > previous + 2:
-                    trend = 'improving'
-                elif recent < previous - 2:
-                    trend = 'declining'
+        except Exception as e:
+            print(f"❌ Error fetching results page: {e}")
+            raise  # an empty page would read as the end of the results
+    
+    def get_bangalore_summary(self) -> Dict:
+        """Get Bengaluru summary statistics (aggregated by the chi_area_summary view)"""
+        try:
+            response = self.supabase.table('chi_area_summary')\
+                .select('*')\
+                .eq('area_type', 'Bengaluru')\
+                .execute()
             
-            # Get last update time
-            last_updated = response.data[0]['created_at']
+            if not response.data or len(response.data) == 0:
+                return self._default_summary()
             
-            return {
-                'avgCHI': round(avg_chi, 2),
-                'status': status,
-                'trend': trend,
-                'lastUpdated': last_updated,
-                'totalAnalyses': len(response.data)
-            }
+            return self._summary_from_row(response.data[0])
             
         except Exception as e:
             print(f"❌ Error fetching Bangalore summary: {e}")
-            return {
-                'avgCHI': 62.0,
-                'status': 'Good',
-                'trend': 'stable',
-                'lastUpdated': datetime.now().isoformat(),
-                'totalAnalyses': 0
-            }
+            return self._default_summary()
     
     def get_rvce_results(self) -> List[Dict]:
-        """Get RVCE region-wise results from Supabase"""
+        """Get RVCE region-wise results (aggregated by the chi_region_summary view)"""
         try:
-            response = self.supabase.table('chi_results')\
-                .select('*')\
+            response = self.supabase.table('chi_region_summary')\
+                .select('sub_region, avg_chi, analyses, last_updated')\
                 .eq('area_type', 'RVCE')\
-                .order('created_at', desc=True)\
+                .order('last_updated', desc=True)\
                 .execute()
             
-            # Group by sub_region
-            regions = {}
-            for row in response.data:
-                region = row['sub_region'] or 'Unknown'
-                if region not in regions:
-                    regions[region] = []
-                regions[region].append(row['chi_value'])
-            
-            # Calculate averages
-            results = []
-            for region, chi_values in regions.items():
-                avg_chi = sum(chi_values) / len(chi_values)
-                status = self._get_status_from_chi(avg_chi)
-                
-                results.append({
-                    'region': region,
-                    'avgCHI': round(avg_chi, 2),
-                    'status': status,
-                    'analyses': len(chi_values)
-                })
-            
-            return results
+            return [self._region_from_row(row) for row in response.data]
             
         except Exception as e:
             print(f"❌ Error fetching RVCE results: {e}")
@@ -260,16 +607,15 @@ class Database:
         except Exception as e:
             print(f"❌ Error fetching temporal comparison for {region}: {e}")
             return []
-    
-    def _get_status_from_chi(self, chi_value: float) -> str:
-        """Determine status from CHI value"""
-        if chi_value >= 75:
-            return 'Excellent'
-        elif chi_value >= 60:
-            return 'Good'
-        elif chi_value >= 45:
-            return 'Moderate'
-        elif chi_value >= 30:
-            return 'Poor'
-        else:
-            return 'Critical'
+
+
+def get_database() -> BaseDatabase:
+    """Create the repository selected by Config.DATABASE_BACKEND ('supabase' or 'local')"""
+    if Config.DATABASE_BACKEND == 'supabase':
+        return Database()
+    if Config.DATABASE_BACKEND == 'local':
+        from local_database import LocalDatabase
+        return LocalDatabase()
+    raise ValueError(
+        f"Unknown DATABASE_BACKEND '{Config.DATABASE_BACKEND}'. Must be one of: ['supabase', 'local']"
+    )
@@ -0,0 +1,74 @@
+"""
+Production serving configuration (gunicorn, Linux/macOS)
+
+    gunicorn -c gunicorn.conf.py
+
+Runs app:app on Config.SERVER_WORKERS preforked processes with
+Config.SERVER_THREADS threads each. The master loads the read-only shared
+state (the pipeline modules, CHI configuration tables and segmentation
+model weights) once before forking, so workers start warm and share those
+pages copy-on-write. Each worker imports app.py itself (cheap, see
+startup.py) and opens its own SQLite and Supabase connections. On SIGTERM
+workers stop accepting connections, finish in-flight requests within
+Config.SERVER_GRACEFUL_TIMEOUT and drain background work (app.shutdown).
+"""
+
+import os
+
+# Every worker sees these before it imports config.py
+os.environ['UCHI_PREFORKED'] = '1'
+# Split cores between server workers and their batch pools instead of
+# giving every worker a pool as large as the machine
+_workers = int(os.getenv('UCHI_SERVER_WORKERS', os.cpu_count() or 1))
+os.environ.setdefault('UCHI_BATCH_WORKERS', str(max(1, (os.cpu_count() or 1) // _workers)))
+
+from config import Config  # noqa: E402
+
+wsgi_app = 'app:app'
+bind = f'{Config.HOST}:{Config.PORT}'
+workers = Config.SERVER_WORKERS
+threads = Config.SERVER_THREADS
+worker_class = 'gthread'
+timeout = Config.SERVER_TIMEOUT
+graceful_timeout = Config.SERVER_GRACEFUL_TIMEOUT
+keepalive = Config.SERVER_KEEPALIVE
+max_requests = Config.SERVER_MAX_REQUESTS
+max_requests_jitter = Config.SERVER_MAX_REQUESTS // 10
+# app.py is imported per worker (not preload_app): its SQLite connections and
+# thread pools must not cross fork
+preload_app = False
+
+
+def on_starting(server):
+    """Master, before forking: recover interrupted jobs and warm shared state"""
+    import time
+    import model_registry
+    from jobs import JobQueue
+
+    os.makedirs(Config.DATA_FOLDER, exist_ok=True)
+    JobQueue(Config.JOB_DB_PATH, max_workers=1).shutdown()  # settles jobs of the previous run
+    model_registry.get_registry().clear_published()  # configured versions, not last run's
+
+    if not Config.SERVER_PRELOAD_MODELS:
+        return
+    start = time.perf_counter()
+    import pipeline
+    model_registry.warm_up()
+    pipeline.pipeline_version()
+    server.log.info(f"Pipeline and models loaded in {time.perf_counter() - start:.2f}s "
+                    f"(active: {model_registry.get_registry().active_versions()})")
+
+
+def post_worker_init(worker):
+    """Worker: mark the inherited pipeline and models as warm, resume queued jobs"""
+    import app
+    app.warm_up()  # registry already holds the models, so this only activates them
+    app.recover_jobs()  # each queued job is claimed by one worker
+
+
+def worker_exit(server, worker):
+    """Worker: drain jobs, flush buffered writes and stop pools"""
+    import sys
+    app = sys.modules.get('app')
+    if app is not None:
+        app.shutdown()
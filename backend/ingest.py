@@ -0,0 +1,152 @@
+"""
+Upload Ingest Module
+Streams uploaded image bodies to disk without holding them in memory
+
+While chunks arrive the ingest path:
+1. Validates the file signature (magic bytes) from the first chunk
+2. Hashes the content (BLAKE2b, same digest as the result cache)
+3. Enforces Config.MAX_FILE_SIZE
+4. Spools the bytes to a temp file the pipeline can memory-map
+
+Resident memory per upload is one chunk, independent of file size.
+"""
+
+import os
+import tempfile
+from typing import AsyncIterator, BinaryIO, NamedTuple
+
+from result_cache import new_digest, HASH_CHUNK_SIZE
+
+
+# File signatures of accepted image formats
+MAGIC_NUMBERS = {
+    b'\x89PNG\r\n\x1a\n': 'png',
+    b'\xff\xd8\xff': 'jpg',
+    b'II*\x00': 'tif',
+    b'MM\x00*': 'tif',
+}
+MAGIC_LENGTH = max(len(magic) for magic in MAGIC_NUMBERS)
+
+
+class IngestError(ValueError):
+    """Raised when an upload is rejected (bad signature, too large, empty)"""
+
+
+class SpooledUpload(NamedTuple):
+    """An upload written to local disk"""
+    path: str
+    digest: str
+    size: int
+    kind: str
+
+
+def sniff_image_type(header: bytes) -> str:
+    """
+    Identify an image format from its leading bytes
+
+    Returns:
+        'png', 'jpg' or 'tif', or '' if the signature is unknown
+    """
+    for magic, kind in MAGIC_NUMBERS.items():
+        if header.startswith(magic):
+            return kind
+    return ''
+
+
+class _Spool:
+    """Incremental writer behind spool_upload / spool_upload_async"""
+
+    def __init__(self, dest_dir: str, max_size: int):
+        os.makedirs(dest_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix='ingest_', dir=dest_dir)
+        self.out = os.fdopen(fd, 'wb')
+        self.max_size = max_size
+        self.digest = new_digest()
+        self.size = 0
+        self.kind = None
+        self.header = b''
+
+    def write(self, chunk: bytes):
+        """Validate, hash and write one chunk"""
+        if self.kind is None:
+            self.header += chunk[:MAGIC_LENGTH - len(self.header)]
+            if len(self.header) >= MAGIC_LENGTH:
+                self.kind = sniff_image_type(self.header)
+                if not self.kind:
+                    raise IngestError('Unsupported file type. Upload a PNG, JPEG or TIFF image')
+
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise IngestError(f'File too large (max {self.max_size // (1024 * 1024)} MB)')
+
+        self.digest.update(chunk)
+        self.out.write(chunk)
+
+    def finish(self) -> SpooledUpload:
+        """Close the file and give it its real extension"""
+        self.out.close()
+        if self.size == 0:
+            raise IngestError('Empty file')
+        if self.kind is None:
+            # Shorter than the longest signature
+            self.kind = sniff_image_type(self.header)
+            if not self.kind:
+                raise IngestError('Unsupported file type. Upload a PNG, JPEG or TIFF image')
+
+        # Give the spool file its real extension so readers pick the right decoder
+        typed_path = f'{self.path}.{self.kind}'
+        os.replace(self.path, typed_path)
+        self.path = typed_path
+
+        return SpooledUpload(path=self.path, digest=self.digest.hexdigest(),
+                             size=self.size, kind=self.kind)
+
+    def abort(self):
+        """Discard the partial file"""
+        self.out.close()
+        os.remove(self.path)
+
+
+def spool_upload(stream: BinaryIO, dest_dir: str, max_size: int,
+                 chunk_size: int = HASH_CHUNK_SIZE) -> SpooledUpload:
+    """
+    Copy a stream to a temp file in dest_dir, validating and hashing on the fly
+
+    Args:
+        stream: Readable binary stream (werkzeug FileStorage.stream or request.stream)
+        dest_dir: Directory for the spooled file (created if needed)
+        max_size: Maximum accepted size in bytes
+
+    Returns:
+        SpooledUpload; the caller owns (and must remove) the file
+
+    Raises:
+        IngestError: If the upload is empty, too large or not a supported image
+    """
+    spool = _Spool(dest_dir, max_size)
+    try:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            spool.write(chunk)
+        return spool.finish()
+    except BaseException:
+        spool.abort()
+        raise
+
+
+async def spool_upload_async(chunks: AsyncIterator[bytes], dest_dir: str,
+                             max_size: int) -> SpooledUpload:
+    """
+    spool_upload for an async body (e.g. an ASGI request stream)
+
+    Chunks are written as they arrive; local disk writes of one chunk are
+    short enough to do on the event loop.
+    """
+    spool = _Spool(dest_dir, max_size)
+    try:
+        async for chunk in chunks:
+            if chunk:
+                spool.write(chunk)
+        return spool.finish()
+    except BaseException:
+        spool.abort()
+        raise
@@ -0,0 +1,220 @@
+"""
+Background Job Module
+Runs long CHI analyses outside the request thread and tracks their progress
+
+Job state lives in a small SQLite database (Config.JOB_DB_PATH), so any
+worker thread can report progress and /jobs/<id> keeps answering for
+finished jobs after a restart. Work itself runs on a local thread pool;
+CPU-heavy stages are expected to hand off to pipeline.get_executor().
+
+Jobs still queued at a restart never started, so they are run again
+(resume_queued) when their kind has a handler and their arguments were
+JSON serializable. Jobs that were running are failed: their side effects
+may be half done.
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+
+class JobQueue:
+    """SQLite-backed job registry with an in-process worker pool"""
+
+    def __init__(self, db_path: str, max_workers: int = 4, recover_interrupted: bool = True):
+        """
+        Args:
+            db_path: SQLite file for job state (':memory:' for tests)
+            max_workers: Number of worker threads
+            recover_interrupted: Settle jobs left queued/running by a
+                previous run (see recover_interrupted()). Preforked workers
+                share the file, so there only the master recovers (see
+                gunicorn.conf.py).
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='uchi-job')
+        self._init_schema()
+        if recover_interrupted:
+            self.recover_interrupted()
+
+    def _init_schema(self):
+        """Create the jobs table"""
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    params TEXT,
+                    args TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at DESC)')
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+            if 'args' not in columns:  # jobs.db from before queued jobs were resumable
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN args TEXT')
+
+    def recover_interrupted(self) -> int:
+        """
+        Settle jobs left over by a previous run, returning how many failed
+
+        Running jobs are failed. Queued jobs with stored arguments are kept
+        queued at stage 'interrupted' for resume_queued(); the rest fail.
+        """
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET stage = 'interrupted' WHERE status = 'queued' AND args IS NOT NULL"
+            )
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted by server restart', "
+                "finished_at = ? WHERE status = 'running' "
+                "OR (status = 'queued' AND stage != 'interrupted')",
+                (now,)
+            ).rowcount
+
+    def resume_queued(self, handlers: Dict[str, Callable[..., Any]]) -> int:
+        """
+        Run the queued jobs recover_interrupted() kept, returning how many
+
+        Every process may call this; each job is claimed by exactly one.
+        Kept jobs of a kind without a handler are failed.
+
+        Args:
+            handlers: Job kind -> callable, as passed to submit()
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, args FROM jobs WHERE status = 'queued' AND stage = 'interrupted' "
+                "ORDER BY created_at"
+            ).fetchall()
+
+        resumed = 0
+        for row in rows:
+            fn = handlers.get(row['kind'])
+            with self._lock, self._conn:
+                if fn is None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = 'Interrupted by server restart', "
+                        "finished_at = ? WHERE id = ? AND stage = 'interrupted'",
+                        (datetime.now().isoformat(), row['id'])
+                    )
+                    continue
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET stage = 'queued' WHERE id = ? AND stage = 'interrupted'",
+                    (row['id'],)
+                ).rowcount
+            if claimed:
+                self._executor.submit(self._run, row['id'], fn, json.loads(row['args']))
+                resumed += 1
+        if resumed:
+            print(f"🔁 Resumed {resumed} queued job(s) from the previous run")
+        return resumed
+
+    def submit(self, kind: str, fn: Callable[..., Any], params: Dict = None, **kwargs) -> str:
+        """
+        Queue fn(**kwargs, progress=callback) and return the job id immediately
+
+        Args:
+            kind: Job type label (e.g. 'upload-image')
+            fn: Callable doing the work; its return value must be JSON serializable
+            params: Public job parameters echoed back by /jobs
+            **kwargs: Arguments passed to fn
+
+        Returns:
+            Job id
+        """
+        job_id = uuid.uuid4().hex
+        try:
+            args = json.dumps(kwargs)  # kept to resume the job after a restart
+        except (TypeError, ValueError):
+            args = None
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO jobs (id, kind, status, stage, params, args, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, 'queued', 'queued', json.dumps(params or {}), args,
+                 datetime.now().isoformat())
+            )
+
+        self._executor.submit(self._run, job_id, fn, kwargs)
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[..., Any], kwargs: Dict):
+        """Execute one job, recording status transitions"""
+        self._update(job_id, status='running', stage='running', started_at=datetime.now().isoformat())
+
+        def progress(fraction: float, stage: str):
+            self._update(job_id, progress=round(max(0.0, min(1.0, fraction)), 3), stage=stage)
+
+        try:
+            result = fn(progress=progress, **kwargs)
+            self._update(job_id, status='succeeded', stage='done', progress=1.0,
+                         result=json.dumps(result), finished_at=datetime.now().isoformat())
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {e}")
+            self._update(job_id, status='failed', error=str(e), finished_at=datetime.now().isoformat())
+
+    def _update(self, job_id: str, **fields):
+        """Update columns of a job row"""
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Get a job by id, or None if unknown"""
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """List most recent jobs, optionally filtered by status"""
+        query = 'SELECT * FROM jobs'
+        args: list = []
+        if status:
+            query += ' WHERE status = ?'
+            args.append(status)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        args.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and wait for running ones"""
+        self._executor.shutdown(wait=wait)
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        """Convert a jobs row to the camelCase API representation"""
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'stage': row['stage'],
+            'progress': row['progress'],
+            'params': json.loads(row['params']) if row['params'] else {},
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'createdAt': row['created_at'],
+            'startedAt': row['started_at'],
+            'finishedAt': row['finished_at']
+        }
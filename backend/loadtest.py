@@ -0,0 +1,81 @@
+"""
+HTTP Load Test
+Measure API throughput of a running server (dev server vs gunicorn vs uvicorn)
+
+    python loadtest.py --url http://localhost:5000 --endpoint upload --requests 200 --concurrency 8
+
+Each upload is a distinct generated image (so the duplicate-result cache
+is not hit). Prints requests/s and latency percentiles.
+"""
+
+import argparse
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def _image_bytes(index: int, size: int) -> bytes:
+    """A distinct PNG per request"""
+    from PIL import Image
+    image = Image.new('RGB', (size, size), (40 + index % 100, 140, 40 + index // 100 % 100))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def run(url: str, endpoint: str, total: int, concurrency: int, size: int):
+    """Fire total requests from concurrency client threads and print the results"""
+    local = threading.local()
+
+    def session():
+        # One keep-alive session per client thread
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    payloads = [_image_bytes(i, size) for i in range(total)] if endpoint == 'upload' else []
+
+    def call(index):
+        started = time.perf_counter()
+        if endpoint == 'upload':
+            response = session().post(f'{url}/upload-image', files={
+                'file': (f'load_{index}.png', payloads[index], 'image/png')
+            }, data={'area_type': 'RVCE', 'sub_region': 'Campus', 'date': '2026-01-01'})
+        elif endpoint == 'summary':
+            response = session().get(f'{url}/get-bangalore-summary')
+        else:
+            response = session().get(f'{url}/health')
+        return time.perf_counter() - started, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status >= 400)
+
+    def percentile(p):
+        return latencies[int(p * (len(latencies) - 1))] * 1000
+
+    print(f"{endpoint}: {total} requests, concurrency {concurrency}, {errors} errors")
+    print(f"  {total / elapsed:.1f} req/s, p50 {percentile(0.5):.1f} ms, "
+          f"p95 {percentile(0.95):.1f} ms, p99 {percentile(0.99):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure UCHI API throughput')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--endpoint', choices=['upload', 'summary', 'health'], default='upload')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--size', type=int, default=512, help='Generated image side (px)')
+    args = parser.parse_args()
+    run(args.url.rstrip('/'), args.endpoint, args.requests, args.concurrency, args.size)
+
+
+if __name__ == '__main__':
+    main()
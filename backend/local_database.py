@@ -0,0 +1,340 @@
+"""
+Local Database module for UCHI
+SQLite-backed implementation of the Database API for offline/air-gapped use
+
+Uses local_schema.sql, which mirrors supabase_schema.sql including the
+chi_area_summary / chi_region_summary aggregation views, so the dashboard
+endpoints behave identically on both backends.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+from config import Config
+from database import BaseDatabase, decode_cursor
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'local_schema.sql')
+
+
+class LocalDatabase(BaseDatabase):
+    """Database manager for UCHI application using a local SQLite file"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Open (and create if needed) the SQLite database
+
+        Args:
+            db_path: SQLite file path, defaults to Config.LOCAL_DB_PATH
+        """
+        self.db_path = db_path or Config.LOCAL_DB_PATH
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('PRAGMA foreign_keys=ON')
+            # region_rollups is derived: a table from before last_id is dropped
+            # and rebuilt by the schema's backfill
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(region_rollups)')]
+            if columns and 'last_id' not in columns:
+                self._conn.execute('DROP TABLE region_rollups')
+            with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+                self._conn.executescript(f.read())
+
+    def is_connected(self) -> bool:
+        """Check if the SQLite connection is open"""
+        return self._conn is not None
+
+    def _query(self, sql: str, args: tuple = ()) -> List[Dict]:
+        """Run a SELECT and return rows as dicts"""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, args).fetchall()]
+
+    def _insert(self, table: str, data: Dict) -> int:
+        """Insert one row and return its id"""
+        columns = ', '.join(data)
+        placeholders = ', '.join('?' for _ in data)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f'INSERT INTO {table} ({columns}) VALUES ({placeholders})',
+                tuple(data.values())
+            )
+        return cursor.lastrowid
+
+    def insert_image_metadata(
+        self,
+        filename: str,
+        storage_path: str,
+        area_type: str,
+        sub_region: Optional[str],
+        date: str
+    ) -> int:
+        """
+        Insert image metadata into SQLite
+
+        Returns:
+            ID of inserted record
+        """
+        try:
+            return self._insert('image_metadata', {
+                'filename': filename,
+                'storage_path': storage_path,
+                'area_type': area_type,
+                'sub_region': sub_region,
+                'date': date,
+                'uploaded_at': datetime.now().isoformat()
+            })
+        except Exception as e:
+            print(f"❌ Error inserting image metadata: {e}")
+            return -1
+
+    def insert_chi_result(
+        self,
+        image_id: int,
+        area_type: str,
+        sub_region: Optional[str],
+        chi_value: float,
+        status: str,
+        interpretation: str,
+        date: str,
+        vegetation_coverage: float,
+        healthy_vegetation: float,
+        stressed_vegetation: float
+    ) -> int:
+        """
+        Insert CHI result into SQLite
+
+        Returns:
+            ID of inserted record
+        """
+        try:
+            return self._insert('chi_results', {
+                'image_id': image_id,
+                'area_type': area_type,
+                'sub_region': sub_region,
+                'chi_value': chi_value,
+                'status': status,
+                'interpretation': interpretation,
+                'date': date,
+                'vegetation_coverage': vegetation_coverage,
+                'healthy_vegetation': healthy_vegetation,
+                'stressed_vegetation': stressed_vegetation
+            })
+        except Exception as e:
+            print(f"❌ Error inserting CHI result: {e}")
+            return -1
+
+    def insert_analyses(self, analyses: List[Dict]) -> List[Tuple[int, int]]:
+        """
+        Insert many analyses in a single transaction (one commit and fsync)
+
+        If the transaction fails, the analyses are retried one by one so a
+        bad row only fails itself.
+
+        Returns:
+            (image_id, result_id) per analysis, in order; (-1, -1) on failure
+        """
+        if not analyses:
+            return []
+        uploaded_at = datetime.now().isoformat()
+        try:
+            ids = []
+            with self._lock, self._conn:
+                for analysis in analyses:
+                    image_id = self._conn.execute(
+                        'INSERT INTO image_metadata (filename, storage_path, area_type, sub_region, '
+                        'date, uploaded_at) VALUES (?, ?, ?, ?, ?, ?)',
+                        (analysis['filename'], analysis['storage_path'], analysis['area_type'],
+                         analysis['sub_region'], analysis['date'], uploaded_at)
+                    ).lastrowid
+                    result_id = self._conn.execute(
+                        'INSERT INTO chi_results (image_id, area_type, sub_region, chi_value, status, '
+                        'interpretation, date, vegetation_coverage, healthy_vegetation, '
+                        'stressed_vegetation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (image_id, analysis['area_type'], analysis['sub_region'],
+                         analysis['chi_value'], analysis['status'], analysis['interpretation'],
+                         analysis['date'], analysis['vegetation_coverage'],
+                         analysis['healthy_vegetation'], analysis['stressed_vegetation'])
+                    ).lastrowid
+                    ids.append((image_id, result_id))
+            return ids
+        except Exception as e:
+            print(f"❌ Error inserting {len(analyses)} analyses: {e}")
+        if len(analyses) == 1:
+            return [(-1, -1)]
+        return [self.insert_analyses([analysis])[0] for analysis in analyses]
+
+    def update_chi_result(
+        self,
+        result_id: int,
+        chi_value: float,
+        status: str,
+        interpretation: str,
+        vegetation_coverage: float,
+        healthy_vegetation: float,
+        stressed_vegetation: float
+    ) -> bool:
+        """
+        Overwrite the scores of a CHI result in SQLite
+
+        Returns:
+            True if the row was updated
+        """
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    'UPDATE chi_results SET chi_value = ?, status = ?, interpretation = ?, '
+                    'vegetation_coverage = ?, healthy_vegetation = ?, stressed_vegetation = ? '
+                    'WHERE id = ?',
+                    (chi_value, status, interpretation, vegetation_coverage,
+                     healthy_vegetation, stressed_vegetation, result_id)
+                )
+            return cursor.rowcount > 0
+        except Exception as e:
+            print(f"❌ Error updating CHI result {result_id}: {e}")
+            return False
+
+    def update_chi_results(self, rows: List[Dict]) -> int:
+        """
+        Overwrite many CHI results in one transaction
+
+        Returns:
+            Number of rows written
+        """
+        if not rows:
+            return 0
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.executemany(
+                    'UPDATE chi_results SET chi_value = ?, status = ?, interpretation = ?, '
+                    'vegetation_coverage = ?, healthy_vegetation = ?, stressed_vegetation = ? '
+                    'WHERE id = ?',
+                    [(row['chi_value'], row['status'], row['interpretation'],
+                      row['vegetation_coverage'], row['healthy_vegetation'],
+                      row['stressed_vegetation'], row['id']) for row in rows]
+                )
+            return cursor.rowcount
+        except Exception as e:
+            print(f"❌ Error updating {len(rows)} CHI results: {e}")
+            raise
+
+    def rebuild_region_rollups(self) -> bool:
+        """
+        Recompute region_rollups from chi_results
+
+        Empties the table and re-runs the schema script, whose one-time
+        backfill then rebuilds every region-day in a single transaction.
+        """
+        try:
+            with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+                schema = f.read()
+            with self._lock:
+                self._conn.executescript(f'BEGIN; DELETE FROM region_rollups; {schema}\nCOMMIT;')
+            return True
+        except Exception as e:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            print(f"❌ Error rebuilding region rollups: {e}")
+            return False
+
+    def get_all_results(self) -> List[Dict]:
+        """Get all CHI results from SQLite"""
+        try:
+            rows = self._query('SELECT * FROM chi_results ORDER BY created_at DESC, id DESC')
+            return [self._result_from_row(row) for row in rows]
+        except Exception as e:
+            print(f"❌ Error fetching all results: {e}")
+            return []
+
+    def get_results_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        area_type: Optional[str] = None,
+        sub_region: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of CHI results, newest first (see Database.get_results_page)"""
+        columns = self._project_columns(fields)
+        position = decode_cursor(cursor) if cursor else None
+
+        conditions, args = [], []
+        for column, op, value in (('area_type', '=', area_type), ('sub_region', '=', sub_region),
+                                  ('date', '>=', date_from), ('date', '<=', date_to)):
+            if value:
+                conditions.append(f'{column} {op} ?')
+                args.append(value)
+        if position:
+            conditions.append('(created_at < ? OR (created_at = ? AND id < ?))')
+            args.extend([position[0], position[0], position[1]])
+
+        sql = f"SELECT {', '.join(columns)} FROM chi_results"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        args.append(limit)
+
+        try:
+            return self._page_from_rows(self._query(sql, tuple(args)), limit, fields)
+        except Exception as e:
+            print(f"❌ Error fetching results page: {e}")
+            raise  # an empty page would read as the end of the results
+
+    def get_bangalore_summary(self) -> Dict:
+        """Get Bengaluru summary statistics (aggregated by the chi_area_summary view)"""
+        try:
+            rows = self._query("SELECT * FROM chi_area_summary WHERE area_type = 'Bengaluru'")
+            if not rows:
+                return self._default_summary()
+            return self._summary_from_row(rows[0])
+        except Exception as e:
+            print(f"❌ Error fetching Bangalore summary: {e}")
+            return self._default_summary()
+
+    def get_rvce_results(self) -> List[Dict]:
+        """Get RVCE region-wise results (aggregated by the chi_region_summary view)"""
+        try:
+            rows = self._query(
+                "SELECT sub_region, avg_chi, analyses, last_updated FROM chi_region_summary "
+                "WHERE area_type = 'RVCE' ORDER BY last_updated DESC"
+            )
+            return [self._region_from_row(row) for row in rows]
+        except Exception as e:
+            print(f"❌ Error fetching RVCE results: {e}")
+            return []
+
+    def get_temporal_comparison(self, region: str) -> List[Dict]:
+        """Get temporal CHI data for a specific region"""
+        try:
+            if region == 'Bengaluru':
+                rows = self._query(
+                    "SELECT chi_value, date, created_at FROM chi_results "
+                    "WHERE area_type = 'Bengaluru' ORDER BY date DESC LIMIT 10"
+                )
+            else:
+                rows = self._query(
+                    "SELECT chi_value, date, created_at FROM chi_results "
+                    "WHERE area_type = 'RVCE' AND sub_region = ? ORDER BY date DESC LIMIT 10",
+                    (region,)
+                )
+
+            return [{
+                'date': row['date'],
+                'chiValue': row['chi_value'],
+                'timestamp': row['created_at']
+            } for row in rows]
+
+        except Exception as e:
+            print(f"❌ Error fetching temporal comparison for {region}: {e}")
+            return []
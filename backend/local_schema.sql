@@ -0,0 +1,172 @@
+-- ============================================================
+-- UCHI Database Schema for the local SQLite backend
+-- ============================================================
+-- Mirrors supabase_schema.sql (tables, indexes, rollup trigger and views)
+-- so LocalDatabase has the same semantics as the Supabase Database.
+-- Applied automatically by local_database.py; safe to re-run.
+-- ============================================================
+
+-- Table: image_metadata
+CREATE TABLE IF NOT EXISTS image_metadata (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    storage_path TEXT NOT NULL,
+    area_type TEXT NOT NULL CHECK (area_type IN ('Bengaluru', 'RVCE')),
+    sub_region TEXT,
+    date TEXT NOT NULL,
+    uploaded_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+-- Table: chi_results
+CREATE TABLE IF NOT EXISTS chi_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    image_id INTEGER REFERENCES image_metadata(id) ON DELETE CASCADE,
+    area_type TEXT NOT NULL CHECK (area_type IN ('Bengaluru', 'RVCE')),
+    sub_region TEXT,
+    chi_value REAL NOT NULL CHECK (chi_value >= 0 AND chi_value <= 100),
+    status TEXT NOT NULL CHECK (status IN ('Excellent', 'Good', 'Moderate', 'Poor', 'Critical')),
+    interpretation TEXT NOT NULL,
+    date TEXT NOT NULL,
+    vegetation_coverage REAL,
+    healthy_vegetation REAL,
+    stressed_vegetation REAL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+-- Indexes for faster queries
+CREATE INDEX IF NOT EXISTS idx_chi_results_area_type ON chi_results(area_type);
+CREATE INDEX IF NOT EXISTS idx_chi_results_sub_region ON chi_results(sub_region);
+CREATE INDEX IF NOT EXISTS idx_chi_results_date ON chi_results(date DESC);
+CREATE INDEX IF NOT EXISTS idx_chi_results_created_at ON chi_results(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_image_metadata_area_type ON image_metadata(area_type);
+
+CREATE INDEX IF NOT EXISTS idx_chi_results_region_date ON chi_results(area_type, sub_region, date DESC);
+CREATE INDEX IF NOT EXISTS idx_chi_results_keyset ON chi_results(created_at DESC, id DESC);
+
+-- Table: region_rollups (per-region daily aggregates, see supabase_schema.sql)
+CREATE TABLE IF NOT EXISTS region_rollups (
+    area_type TEXT NOT NULL,
+    sub_region TEXT NOT NULL DEFAULT '',
+    day TEXT NOT NULL,
+    analyses INTEGER NOT NULL DEFAULT 0,
+    chi_sum REAL NOT NULL DEFAULT 0,
+    chi_sum_sq REAL NOT NULL DEFAULT 0,
+    chi_min REAL,
+    chi_max REAL,
+    last_chi REAL,
+    prev_chi REAL,
+    last_at TEXT,
+    last_id INTEGER,  -- chi_results id of last_chi; breaks last_at ties (rows inserted together)
+    PRIMARY KEY (area_type, sub_region, day)
+);
+
+DROP INDEX IF EXISTS idx_region_rollups_last_at;
+CREATE INDEX IF NOT EXISTS idx_region_rollups_latest ON region_rollups(area_type, sub_region, last_at DESC, last_id DESC);
+
+-- Trigger: update the rollup in the same transaction as the insert
+-- (recreated on every start, like the views, so changes apply to existing files)
+DROP TRIGGER IF EXISTS trg_chi_results_rollup;
+CREATE TRIGGER trg_chi_results_rollup
+AFTER INSERT ON chi_results
+BEGIN
+    INSERT INTO region_rollups (
+        area_type, sub_region, day, analyses, chi_sum, chi_sum_sq,
+        chi_min, chi_max, last_chi, prev_chi, last_at, last_id
+    )
+    VALUES (
+        NEW.area_type, COALESCE(NEW.sub_region, ''), NEW.date, 1, NEW.chi_value,
+        NEW.chi_value * NEW.chi_value, NEW.chi_value, NEW.chi_value, NEW.chi_value,
+        (
+            SELECT last_chi FROM region_rollups
+            WHERE area_type = NEW.area_type AND sub_region = COALESCE(NEW.sub_region, '')
+            ORDER BY last_at DESC, last_id DESC
+            LIMIT 1
+        ),
+        NEW.created_at, NEW.id
+    )
+    ON CONFLICT (area_type, sub_region, day) DO UPDATE SET
+        analyses = analyses + 1,
+        chi_sum = chi_sum + excluded.chi_sum,
+        chi_sum_sq = chi_sum_sq + excluded.chi_sum_sq,
+        chi_min = MIN(chi_min, excluded.chi_min),
+        chi_max = MAX(chi_max, excluded.chi_max),
+        last_chi = excluded.last_chi,
+        prev_chi = excluded.prev_chi,
+        last_at = excluded.last_at,
+        last_id = excluded.last_id;
+END;
+
+-- One-time backfill from existing history (no-op once rollups exist)
+INSERT INTO region_rollups (
+    area_type, sub_region, day, analyses, chi_sum, chi_sum_sq,
+    chi_min, chi_max, last_chi, prev_chi, last_at, last_id
+)
+SELECT
+    area_type, sub_region, day, COUNT(*), SUM(chi_value), SUM(chi_value * chi_value),
+    MIN(chi_value), MAX(chi_value),
+    MAX(chi_value) FILTER (WHERE rn = 1),
+    MAX(prev_chi) FILTER (WHERE rn = 1),
+    MAX(created_at),
+    MAX(id) FILTER (WHERE rn = 1)
+FROM (
+    SELECT
+        area_type,
+        COALESCE(sub_region, '') AS sub_region,
+        date AS day,
+        id,
+        chi_value,
+        created_at,
+        LAG(chi_value) OVER (PARTITION BY area_type, COALESCE(sub_region, '') ORDER BY created_at, id) AS prev_chi,
+        ROW_NUMBER() OVER (PARTITION BY area_type, COALESCE(sub_region, ''), date ORDER BY created_at DESC, id DESC) AS rn
+    FROM chi_results
+) AS ordered
+WHERE NOT EXISTS (SELECT 1 FROM region_rollups)
+GROUP BY area_type, sub_region, day;
+
+-- Views are recreated on every start so schema changes apply to existing files
+DROP VIEW IF EXISTS chi_area_summary;
+DROP VIEW IF EXISTS chi_region_summary;
+
+-- View: chi_area_summary (one row per area_type)
+CREATE VIEW chi_area_summary AS
+WITH ranked AS (
+    SELECT
+        r.*,
+        ROW_NUMBER() OVER (PARTITION BY area_type ORDER BY last_at DESC, last_id DESC) AS rn
+    FROM region_rollups r
+)
+SELECT
+    area_type,
+    SUM(analyses) AS analyses,
+    SUM(chi_sum) / NULLIF(SUM(analyses), 0) AS avg_chi,
+    MAX(last_at) AS last_updated,
+    MAX(last_chi) FILTER (WHERE rn = 1) AS latest_chi,
+    MAX(prev_chi) FILTER (WHERE rn = 1) AS previous_chi,
+    MIN(chi_min) AS min_chi,
+    MAX(chi_max) AS max_chi,
+    SUM(chi_sum_sq) AS chi_sum_sq
+FROM ranked
+GROUP BY area_type;
+
+-- View: chi_region_summary (one row per area_type + sub_region)
+CREATE VIEW chi_region_summary AS
+WITH ranked AS (
+    SELECT
+        r.*,
+        ROW_NUMBER() OVER (PARTITION BY area_type, sub_region ORDER BY last_at DESC, last_id DESC) AS rn
+    FROM region_rollups r
+)
+SELECT
+    area_type,
+    NULLIF(sub_region, '') AS sub_region,
+    SUM(analyses) AS analyses,
+    SUM(chi_sum) / NULLIF(SUM(analyses), 0) AS avg_chi,
+    MAX(last_at) AS last_updated,
+    MAX(last_chi) FILTER (WHERE rn = 1) AS latest_chi,
+    MAX(prev_chi) FILTER (WHERE rn = 1) AS previous_chi,
+    MIN(chi_min) AS min_chi,
+    MAX(chi_max) AS max_chi,
+    SUM(chi_sum_sq) AS chi_sum_sq
+FROM ranked
+GROUP BY area_type, sub_region;
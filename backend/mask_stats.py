@@ -0,0 +1,245 @@
+"""
+Mask Statistics Module
+Single-pass pixel statistics shared by vegetation metrics and CHI
+
+compute_mask_stats() reads each mask exactly once (np.count_nonzero on the
+boolean view, several times faster than np.sum on uint8 masks) and returns
+a MaskStats. calculate_chi, calculate_chi_tiled, analyze_canopy_density and
+calculate_vegetation_metrics all accept that object, so the pipeline never
+counts the same mask twice.
+
+Segmentation results are carried as one uint8 label raster (LABEL_* values)
+instead of three full-size masks, and can be bit-packed (pack_labels) for
+storage and transfer: 2 bits per pixel for the three current classes, 12x
+smaller than three uint8 masks (24x for a plain vegetation mask).
+compute_label_stats() counts packed labels without unpacking them.
+"""
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+from typing import Any, Iterable, NamedTuple, Optional, Tuple
+
+
+_EPS = 1e-6
+_BINCOUNT_CHUNK = 1 << 16  # pixels per np.bincount call in compute_label_stats
+
+# Label raster classes (uint8); values up to 255 are free for future classes
+LABEL_NON_VEGETATION = 0
+LABEL_HEALTHY = 1
+LABEL_STRESSED = 2
+
+
+class MaskStats(NamedTuple):
+    """Pixel counts of one image (or the sum over tiles)"""
+    total_pixels: int
+    vegetation_pixels: int
+    healthy_pixels: Optional[int] = None  # None when no health masks were given
+    stressed_pixels: Optional[int] = None
+
+    @property
+    def has_health(self) -> bool:
+        return self.healthy_pixels is not None and self.stressed_pixels is not None
+
+    @property
+    def coverage(self) -> float:
+        """Vegetation coverage in percent of all pixels"""
+        return self.vegetation_pixels / (self.total_pixels + _EPS) * 100
+
+    @property
+    def healthy_percentage(self) -> float:
+        """Healthy share of vegetation in percent"""
+        return self.healthy_pixels / (self.vegetation_pixels + _EPS) * 100
+
+    @property
+    def stressed_percentage(self) -> float:
+        """Stressed share of vegetation in percent"""
+        return self.stressed_pixels / (self.vegetation_pixels + _EPS) * 100
+
+    @property
+    def density(self) -> float:
+        """Canopy density input (0-1): vegetated fraction of the area"""
+        return self.vegetation_pixels / self.total_pixels if self.total_pixels else 0.0
+
+    def merge(self, other: 'MaskStats') -> 'MaskStats':
+        """Counts of two disjoint regions (e.g. tiles) combined"""
+        return MaskStats(
+            self.total_pixels + other.total_pixels,
+            self.vegetation_pixels + other.vegetation_pixels,
+            self.healthy_pixels + other.healthy_pixels if self.has_health and other.has_health else None,
+            self.stressed_pixels + other.stressed_pixels if self.has_health and other.has_health else None
+        )
+
+
+EMPTY_STATS = MaskStats(0, 0, 0, 0)
+
+
+def compute_mask_stats(mask: Any, healthy_mask: Any = None,
+                       stressed_mask: Any = None) -> MaskStats:
+    """
+    Count vegetation, healthy and stressed pixels in one pass per mask
+
+    Args:
+        mask: Vegetation mask (any nonzero = vegetation)
+        healthy_mask: Healthy vegetation mask (optional)
+        stressed_mask: Stressed vegetation mask (optional)
+
+    Returns:
+        MaskStats; health counts are None unless both health masks are given
+    """
+    with_health = healthy_mask is not None and stressed_mask is not None
+
+    if np is None:
+        def count(rows):
+            return sum(sum(1 for v in row if v) for row in rows)
+        total = len(mask) * len(mask[0]) if mask and mask[0] else 0
+        return MaskStats(total, count(mask),
+                         count(healthy_mask) if with_health else None,
+                         count(stressed_mask) if with_health else None)
+
+    return MaskStats(
+        int(np.size(mask)),
+        _count(mask),
+        _count(healthy_mask) if with_health else None,
+        _count(stressed_mask) if with_health else None
+    )
+
+
+def combine_stats(stats: Iterable[MaskStats]) -> MaskStats:
+    """Sum the stats of disjoint regions (e.g. tile cores)"""
+    total = None
+    for item in stats:
+        total = item if total is None else total.merge(item)
+    return total if total is not None else EMPTY_STATS
+
+
+def _count(mask: Any) -> int:
+    """Nonzero pixels of a mask, counted on its boolean view when possible"""
+    mask = np.asarray(mask)
+    if mask.dtype == np.uint8:
+        # Same-size reinterpretation, no copy; count_nonzero's bool path is ~2x faster
+        mask = mask.view(bool)
+    return int(np.count_nonzero(mask))
+
+
+class PackedLabels(NamedTuple):
+    """Bit-packed label raster: bit plane k holds bit k of every label"""
+    planes: Any  # uint8 array (bits, ceil(pixels / 8)) from np.packbits
+    shape: Tuple[int, ...]
+
+    @property
+    def bits(self) -> int:
+        return len(self.planes)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.planes.nbytes)
+
+
+def masks_to_labels(mask: Any, healthy_mask: Any = None, stressed_mask: Any = None) -> Any:
+    """
+    Combine separate masks into one uint8 label raster
+
+    Vegetation not marked stressed is labeled healthy.
+    """
+    labels = np.array(mask, dtype=bool).view(np.uint8)
+    if stressed_mask is not None:
+        stressed = np.asarray(stressed_mask, dtype=bool) & labels.view(bool)
+        labels += stressed.view(np.uint8)  # 1 -> 2 where stressed
+    return labels
+
+
+def split_labels(labels: Any) -> Tuple[Any, Any, Any]:
+    """Expand a label raster into (vegetation, healthy, stressed) uint8 masks"""
+    labels = np.asarray(labels)
+    return ((labels != LABEL_NON_VEGETATION).view(np.uint8),
+            (labels == LABEL_HEALTHY).view(np.uint8),
+            (labels == LABEL_STRESSED).view(np.uint8))
+
+
+def pack_labels(labels: Any, bits: int = None) -> PackedLabels:
+    """
+    Bit-pack a label raster
+
+    Args:
+        labels: uint8 label raster
+        bits: Bits per pixel; defaults to what the largest label needs
+              (pass 2 for LABEL_* rasters to skip scanning for the maximum)
+    """
+    labels = np.asarray(labels, dtype=np.uint8)
+    if bits is None:
+        bits = max(int(labels.max(initial=0)).bit_length(), 1)
+    flat = labels.ravel()
+    planes = np.stack([np.packbits((flat >> k) & 1) for k in range(bits)])
+    return PackedLabels(planes=planes, shape=labels.shape)
+
+
+def unpack_labels(packed: PackedLabels) -> Any:
+    """Restore the uint8 label raster from its packed form"""
+    count = int(np.prod(packed.shape))
+    labels = np.zeros(count, dtype=np.uint8)
+    for k, plane in enumerate(packed.planes):
+        labels |= np.unpackbits(plane, count=count) << k
+    return labels.reshape(packed.shape)
+
+
+def compute_label_stats(labels: Any) -> MaskStats:
+    """
+    Pixel statistics of a label raster (plain or PackedLabels)
+
+    Packed rasters are counted directly on the bit planes with popcounts,
+    touching 2 bits per pixel instead of a full byte.
+    """
+    if isinstance(labels, PackedLabels):
+        return _packed_label_stats(labels)
+
+    if np is None:
+        flat = [v for row in labels for v in row]
+        return MaskStats(len(flat), sum(1 for v in flat if v),
+                         sum(1 for v in flat if v == LABEL_HEALTHY),
+                         sum(1 for v in flat if v == LABEL_STRESSED))
+
+    # One histogram pass; bincount widens its input to intp, so it runs
+    # over slices of the raster to keep that copy small and cache-resident
+    flat = np.asarray(labels).ravel()
+    counts = np.zeros(LABEL_STRESSED + 1, dtype=np.int64)
+    for start in range(0, flat.size, _BINCOUNT_CHUNK):
+        counts += np.bincount(flat[start:start + _BINCOUNT_CHUNK],
+                              minlength=LABEL_STRESSED + 1)[:LABEL_STRESSED + 1]
+    return MaskStats(
+        int(flat.size),
+        int(flat.size - counts[LABEL_NON_VEGETATION]),
+        int(counts[LABEL_HEALTHY]),
+        int(counts[LABEL_STRESSED])
+    )
+
+
+def _packed_label_stats(packed: PackedLabels) -> MaskStats:
+    """compute_label_stats on bit planes (label = sum of plane_k << k)"""
+    planes = packed.planes
+    higher = np.zeros_like(planes[0])
+    for plane in planes[2:]:
+        higher |= plane
+
+    bit0 = planes[0]
+    bit1 = planes[1] if len(planes) > 1 else np.zeros_like(bit0)
+    total = int(np.prod(packed.shape))
+
+    return MaskStats(
+        total,
+        _popcount(bit0 | bit1 | higher),
+        _popcount(bit0 & ~(bit1 | higher)),   # label 1
+        _popcount(bit1 & ~(bit0 | higher))    # label 2
+    )
+
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8) if np else None
+
+
+def _popcount(packed: Any) -> int:
+    """Number of set bits in a uint8 array"""
+    bitwise_count = getattr(np, 'bitwise_count', None)  # NumPy >= 2.0
+    if bitwise_count is not None:
+        return int(bitwise_count(packed).sum(dtype=np.int64))
+    return int(_POPCOUNT_TABLE[packed].sum(dtype=np.int64))
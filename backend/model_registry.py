@@ -0,0 +1,297 @@
+"""
+Model Registry Module
+Process-wide, versioned model store with warm loading and hot swapping
+
+Models are loaded once per process (at startup via warm_up(), or in each
+batch worker through its pool initializer) and stay resident. Request
+handlers only ever call get(), which returns the active ModelHandle and
+never loads weights. A new version is loaded off the request path and then
+swapped in atomically, so in-flight requests finish on the old version and
+later ones see the new one without a restart.
+
+Model families register a loader, e.g.:
+
+    registry.register_loader('vegetation', load_fn, default_version='classical-1')
+
+where the loaded model exposes predict(image) and optionally
+predict_batch(stacked_images). Models that are not safe
+to call from several threads set a `thread_safe = False` attribute.
+
+Preforked server workers and batch workers each hold their own registry.
+An activation is published to a small JSON file (Config.MODEL_STATE_PATH)
+that every registry checks (one stat) in get() and active_versions(), so
+all processes switch to the new version and agree on pipeline_version().
+A process that sees a new version loads it on that call, once.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+
+
+class ModelNotLoadedError(LookupError):
+    """Raised when a model is requested before it has been loaded"""
+
+
+class ModelHandle:
+    """
+    Thread-safe inference handle for one loaded model version
+
+    Models declared thread-safe are called concurrently; others are
+    serialized through a per-handle lock.
+    """
+
+    def __init__(self, name: str, version: str, model: Any,
+                 thread_safe: bool = True, load_seconds: float = 0.0):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.thread_safe = thread_safe
+        self.load_seconds = load_seconds
+        self.loaded_at = datetime.now().isoformat()
+        self._lock = threading.Lock()
+
+    def predict(self, *args, **kwargs) -> Any:
+        """Run inference on the wrapped model"""
+        if self.thread_safe:
+            return self.model.predict(*args, **kwargs)
+        with self._lock:
+            return self.model.predict(*args, **kwargs)
+
+    def predict_batch(self, batch: Any) -> Any:
+        """
+        Run inference on a stacked batch
+
+        Uses the model's own predict_batch() when it has one, otherwise
+        predicts item by item.
+        """
+        predict_batch = getattr(self.model, 'predict_batch', None)
+        if predict_batch is None:
+            return [self.predict(item) for item in batch]
+        if self.thread_safe:
+            return predict_batch(batch)
+        with self._lock:
+            return predict_batch(batch)
+
+    def to_dict(self) -> Dict:
+        """API representation"""
+        return {
+            'name': self.name,
+            'version': self.version,
+            'loadedAt': self.loaded_at,
+            'loadSeconds': round(self.load_seconds, 3)
+        }
+
+
+class ModelRegistry:
+    """Registry of model loaders and resident model versions"""
+
+    def __init__(self, state_path: Optional[str] = None):
+        """
+        Args:
+            state_path: JSON file of published active versions shared with
+                other processes (None = this process only)
+        """
+        self._lock = threading.Lock()
+        self._loaders: Dict[str, Callable[[str], Any]] = {}
+        self._defaults: Dict[str, str] = {}
+        self._loaded: Dict[str, Dict[str, ModelHandle]] = {}
+        self._active: Dict[str, ModelHandle] = {}
+        self._load_locks: Dict[tuple, threading.Lock] = {}
+        self.state_path = state_path
+        self._state_lock = threading.Lock()
+        self._state_mtime: Optional[int] = None  # state file version last applied
+
+    def register_loader(self, name: str, loader: Callable[[str], Any], default_version: str):
+        """
+        Register how to load a model family
+
+        Args:
+            name: Model family (e.g. 'vegetation')
+            loader: Callable(version) returning an object with predict()
+            default_version: Version activated by warm_up()
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._defaults[name] = default_version
+
+    def load(self, name: str, version: str) -> ModelHandle:
+        """
+        Load a version (once per process) without activating it
+
+        Concurrent calls for the same version wait for a single load.
+        """
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f'Unknown model: {name}')
+            handle = self._loaded.get(name, {}).get(version)
+            if handle is not None:
+                return handle
+            load_lock = self._load_locks.setdefault((name, version), threading.Lock())
+            loader = self._loaders[name]
+
+        with load_lock:
+            with self._lock:
+                handle = self._loaded.get(name, {}).get(version)
+            if handle is not None:
+                return handle
+
+            print(f"[MODEL REGISTRY] Loading {name} model version {version}")
+            start = time.perf_counter()
+            model = loader(version)
+            handle = ModelHandle(name, version, model,
+                                 thread_safe=getattr(model, 'thread_safe', True),
+                                 load_seconds=time.perf_counter() - start)
+
+            with self._lock:
+                self._loaded.setdefault(name, {})[version] = handle
+            print(f"[MODEL REGISTRY] ✅ {name} {version} loaded in {handle.load_seconds:.2f}s")
+            return handle
+
+    def activate(self, name: str, version: str) -> ModelHandle:
+        """
+        Load a version if needed and make it the active one (hot swap)
+
+        The previous version stays loaded for requests already holding its
+        handle; call unload() to release it.
+        """
+        handle = self.load(name, version)
+        with self._lock:
+            self._active[name] = handle
+        return handle
+
+    def publish(self, name: str, version: str) -> None:
+        """Record an activation in the state file for the other processes"""
+        if not self.state_path:
+            return
+        with self._state_lock:
+            versions = self._read_state()
+            versions[name] = version
+            directory = os.path.dirname(self.state_path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(versions, f)
+            os.replace(tmp, self.state_path)
+            self._state_mtime = self._state_version()
+
+    def clear_published(self) -> None:
+        """Forget published activations (server start: defaults apply again)"""
+        if not self.state_path:
+            return
+        with self._state_lock:
+            try:
+                os.remove(self.state_path)
+            except FileNotFoundError:
+                pass
+            self._state_mtime = None
+
+    def _state_version(self) -> Optional[int]:
+        try:
+            return os.stat(self.state_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_state(self) -> Dict[str, str]:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _sync(self) -> None:
+        """Activate versions another process published since the last check"""
+        if not self.state_path or self._state_version() == self._state_mtime:
+            return
+        with self._state_lock:
+            mtime = self._state_version()
+            if mtime == self._state_mtime:
+                return
+            for name, version in self._read_state().items():
+                with self._lock:
+                    active = self._active.get(name)
+                    known = name in self._loaders
+                if not known or (active is not None and active.version == version):
+                    continue
+                try:
+                    self.activate(name, version)
+                except Exception as e:
+                    # Keep serving the current version rather than fail every request
+                    print(f"[MODEL REGISTRY] ❌ Could not switch {name} to {version}: {e}")
+            self._state_mtime = mtime
+
+    def get(self, name: str) -> ModelHandle:
+        """
+        Get the active handle of a model family
+
+        Never loads, except once after another process published a new
+        version (see publish()).
+
+        Raises:
+            ModelNotLoadedError: If warm_up()/activate() has not run for it
+        """
+        self._sync()
+        with self._lock:
+            handle = self._active.get(name)
+        if handle is None:
+            raise ModelNotLoadedError(f"Model '{name}' is not loaded; call warm_up() at startup")
+        return handle
+
+    def unload(self, name: str, version: str) -> bool:
+        """Drop a loaded, inactive version; returns False if it is active or unknown"""
+        with self._lock:
+            active = self._active.get(name)
+            if active is not None and active.version == version:
+                return False
+            return self._loaded.get(name, {}).pop(version, None) is not None
+
+    def warm_up(self, versions: Optional[Dict[str, str]] = None):
+        """
+        Load and activate every registered model family
+
+        Args:
+            versions: Version per family; defaults to each loader's default_version
+        """
+        with self._lock:
+            targets = dict(self._defaults)
+        targets.update(versions or {})
+        for name, version in targets.items():
+            self.activate(name, version)
+        with self._state_lock:
+            self._state_mtime = None  # published activations still take precedence
+
+    def active_versions(self) -> Dict[str, str]:
+        """Active version per model family"""
+        self._sync()
+        with self._lock:
+            return {name: handle.version for name, handle in self._active.items()}
+
+    def list(self) -> List[Dict]:
+        """Describe all loaded versions"""
+        with self._lock:
+            return [
+                {**handle.to_dict(), 'active': self._active.get(name) is handle}
+                for name, versions in self._loaded.items()
+                for handle in versions.values()
+            ]
+
+
+_registry = ModelRegistry(Config.MODEL_STATE_PATH)
+
+
+def get_registry() -> ModelRegistry:
+    """Get the process-wide registry"""
+    return _registry
+
+
+def warm_up(versions: Optional[Dict[str, str]] = None):
+    """Warm the process-wide registry (also used as a worker pool initializer)"""
+    # Make sure the built-in model families have registered their loaders
+    import vegetation_detection  # noqa: F401
+    _registry.warm_up(versions)
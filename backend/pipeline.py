@@ -0,0 +1,175 @@
+"""
+Analysis Pipeline Module
+Runs the AI stages for a single image and fans batches out to worker processes
+
+Stages (per image):
+1. preprocessing.py - tiled, memory-mapped preprocessing
+2. vegetation_detection.py - vegetation detection and health classification
+3. chi_calculation.py - CHI calculation and region calibration
+
+The label raster is captured on the way through (artifacts.py) into a
+pending archive whose path is returned under 'artifact', so the caller can
+adopt it once the image has an id.
+
+Batches are distributed over a process pool sized to the host's cores, so
+CPU-bound analysis of many images runs in parallel outside the Flask worker.
+Each worker warms the model registry once when it starts, with the model
+versions active in the parent at pool creation.
+"""
+
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future, as_completed
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Any
+
+from config import Config
+from chi_generator import CHIGenerator
+import preprocessing
+import vegetation_detection
+import chi_calculation
+import model_registry
+from artifacts import ArtifactRecorder
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()  # request threads create/swap the pool concurrently
+_chi_gen = CHIGenerator()
+
+
+def analyze_image(image_path: str, area_type: str,
+                  sub_region: Optional[str] = None,
+                  keep_artifact: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Run preprocess → detect → classify → CHI for one image
+
+    Must stay a module-level function so it can be pickled into worker
+    processes.
+
+    Args:
+        image_path: Path to image file on local disk
+        area_type: Bengaluru or RVCE
+        sub_region: RVCE sub-region (optional)
+        keep_artifact: Write the packed label raster and index rasters to a
+            pending archive and return its path as 'artifact' (defaults to
+            Config.ARTIFACTS_ENABLED)
+
+    Returns:
+        Dictionary with chi_value, status, interpretation, vegetation_coverage,
+        healthy_vegetation, stressed_vegetation and confidence, plus
+        artifact (pending archive path, see ArtifactStore.adopt) when kept
+    """
+    if keep_artifact is None:
+        keep_artifact = Config.ARTIFACTS_ENABLED
+
+    tiles = preprocessing.preprocess_image(image_path, tiled=True)
+    recorder = ArtifactRecorder() if keep_artifact else None
+    try:
+        if recorder is not None:
+            tile_labels = recorder.record(tiles, vegetation_detection.detect_vegetation_tiled,
+                                          indices=vegetation_detection.index_rasters)
+        else:
+            tile_labels = vegetation_detection.detect_vegetation_tiled(tiles)
+        chi_data = chi_calculation.calculate_chi_tiled(tile_labels)
+        analysis = analysis_from_chi(chi_data, area_type, sub_region)
+    except BaseException:
+        if recorder is not None:
+            recorder.abort()
+        raise
+
+    if recorder is not None:
+        analysis['artifact'] = recorder.finish(pipeline_version())
+    return analysis
+
+
+def analysis_from_chi(chi_data: Dict[str, float], area_type: str,
+                      sub_region: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Calibrate a calculate_chi result for its region and add status and interpretation
+
+    Shared by analyze_image and rescore.py.
+    """
+    region = sub_region if sub_region else area_type
+
+    chi_value = float(chi_calculation.calibrate_chi_for_region(chi_data['chi_value'], region))
+    chi_value = round(chi_value, 2)
+    status = _chi_gen.get_status(chi_value)
+
+    return {
+        'chi_value': chi_value,
+        'status': status,
+        'interpretation': _chi_gen.get_interpretation(status),
+        'vegetation_coverage': float(chi_data['vegetation_coverage']),
+        'healthy_vegetation': float(chi_data['healthy_percentage']),
+        'stressed_vegetation': float(chi_data['stressed_percentage']),
+        'confidence': chi_data['confidence']
+    }
+
+
+def pipeline_version() -> str:
+    """Pipeline version plus the active model versions (e.g. '1.0.0+vegetation:classical-1')"""
+    models = model_registry.get_registry().active_versions()
+    return '+'.join([Config.PIPELINE_VERSION] + [f'{name}:{models[name]}' for name in sorted(models)])
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Get the process-wide pool used for batch analysis (created lazily)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=Config.BATCH_MAX_WORKERS,
+                initializer=model_registry.warm_up,
+                initargs=(model_registry.get_registry().active_versions(),)
+            )
+        return _executor
+
+
+def restart_executor() -> None:
+    """
+    Replace the batch pool after a model swap
+
+    Running analyses finish in the old workers; new submissions go to a
+    fresh pool whose workers warm up with the now-active model versions.
+    """
+    global _executor
+    with _executor_lock:
+        old, _executor = _executor, None
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def analyze_batch(items: Iterable[Tuple[Any, str, str, Optional[str]]]
+                  ) -> Iterator[Tuple[Any, Future]]:
+    """
+    Analyze many images in parallel, yielding results as they complete
+
+    Args:
+        items: Iterable of (key, image_path, area_type, sub_region)
+
+    Yields:
+        Tuple of (key, finished future); call future.result() to get the
+        analyze_image dictionary or re-raise the worker's exception
+
+    Closing the generator early (e.g. the client went away) cancels the
+    analyses that have not started yet.
+    """
+    executor = get_executor()
+    futures = {
+        executor.submit(analyze_image, image_path, area_type, sub_region): key
+        for key, image_path, area_type, sub_region in items
+    }
+
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def shutdown() -> None:
+    """Stop the batch pool (used on server shutdown)"""
+    global _executor
+    with _executor_lock:
+        old, _executor = _executor, None
+    if old is not None:
+        old.shutdown(wait=True, cancel_futures=True)
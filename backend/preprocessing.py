@@ -20,13 +20,61 @@ try:
     import numpy as np
 except Exception:
     np = None
-from typing import Tuple, Any
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+try:
+    import rasterio
+    from rasterio.enums import ColorInterp
+    from rasterio.windows import Window
+except Exception:
+    rasterio = None
+import mmap
+import os
+import tempfile
+import threading
+from typing import Tuple, Any, Iterator, NamedTuple
+
+from config import Config
 
 
-def preprocess_image(image_path: str) -> Any:
+# Tiled mode defaults (large orthophotos / city-scale mosaics)
+DEFAULT_TILE_SIZE = 512
+DEFAULT_TILE_OVERLAP = 32
+DECODE_STRIP_ROWS = 1024
+EXIF_ORIENTATION = 0x0112
+
+# Guards the process-wide PIL.Image.MAX_IMAGE_PIXELS (see _open_limited)
+_PIXEL_LIMIT_LOCK = threading.Lock()
+
+
+class Tile(NamedTuple):
+    """
+    One overlapping window of a large raster
+
+    Attributes:
+        data: Tile pixels as float32 (H, W, 3) normalized to 0-1, including overlap
+        row: Row of the tile's core region in the full image
+        col: Column of the tile's core region in the full image
+        core: (row_slice, col_slice) selecting the non-overlapping core inside data
+    """
+    data: Any
+    row: int
+    col: int
+    core: Tuple[slice, slice]
+
+
+def preprocess_image(image_path: str, tiled: bool = False,
+                     tile_size: int = DEFAULT_TILE_SIZE,
+                     overlap: int = DEFAULT_TILE_OVERLAP) -> Any:
     """
     Preprocess uploaded image for analysis
     
+    With tiled=True the image is never held in memory as a whole; a
+    generator of overlapping Tile windows is returned instead (see
+    iter_image_tiles), so peak memory is bounded by the tile size.
+    
     TODO: Implement actual preprocessing logic
     
     Steps:
@@ -39,9 +87,12 @@ def preprocess_image(image_path: str) -> Any:
     
     Args:
         image_path: Path to uploaded image file
+        tiled: Yield overlapping tiles instead of one resized array
+        tile_size: Core tile edge in pixels (tiled mode)
+        overlap: Context pixels added on each side of a tile (tiled mode)
         
     Returns:
-        Preprocessed image as numpy array
+        Preprocessed image as numpy array, or a Tile generator when tiled
         
     Example implementation (commented out):
     ```python
@@ -62,6 +113,9 @@ def preprocess_image(image_path: str) -> Any:
     return img
     ```
     """
+    if tiled:
+        return iter_image_tiles(image_path, tile_size=tile_size, overlap=overlap)
+
     print(f"[PREPROCESSING] Processing image: {image_path}")
     print("[PREPROCESSING] ⚠️ Using placeholder - implement actual preprocessing")
 
@@ -75,6 +129,241 @@ def preprocess_image(image_path: str) -> Any:
     return np.zeros((512, 512, 3), dtype=np.float32)
 
 
+def open_raster(image_path: str, cache_dir: str = None, max_pixels: int = None) -> Any:
+    """
+    Open an image as a read-only, memory-mapped (H, W, C) uint8 array
+    
+    - .npy rasters are mapped directly with np.load(mmap_mode='r')
+    - Everything else is decoded strip by strip into an anonymous temporary
+      file, which is then memory-mapped; later tile reads are served from
+      the page cache instead of RAM. Strips come from rasterio windowed
+      reads when it is installed, else from PIL: files stored in strips or
+      tiles (most TIFFs) decode only the file strips/tiles of each band,
+      single-stream PNG/JPEG are decoded whole, up to
+      Config.MAX_FULL_DECODE_PIXELS.
+    
+    For GeoTIFFs prefer iter_image_tiles, which reads windows straight from
+    disk through rasterio when it is installed.
+    
+    Args:
+        image_path: Path to image file
+        cache_dir: Directory for the spill file (defaults to system temp)
+        max_pixels: Refuse larger images (defaults to Config.MAX_IMAGE_PIXELS)
+        
+    Returns:
+        numpy.memmap of shape (H, W, 3)
+    """
+    if np is None:
+        raise RuntimeError('NumPy is required for memory-mapped rasters')
+
+    if image_path.lower().endswith('.npy'):
+        raster = np.load(image_path, mmap_mode='r')
+        if raster.ndim == 2:
+            raster = raster[:, :, None]
+        return raster
+
+    if max_pixels is None:
+        max_pixels = Config.MAX_IMAGE_PIXELS
+
+    if rasterio is not None:
+        raster = _spill_windowed(image_path, cache_dir, max_pixels)
+        if raster is not None:
+            return raster
+
+    if Image is None:
+        raise RuntimeError('Pillow is required to decode images (pip install Pillow)')
+
+    # Decode straight from a read-only memory map of the (spooled) file
+    with open(image_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            _open_limited(mapped, max_pixels) as img:
+        width, height = img.size
+        spill, raster = _spill_file(height, width, cache_dir)
+
+        if len(img.tile) > 1 and img.getexif().get(EXIF_ORIENTATION, 1) == 1:
+            for top, bottom, strip in _decode_bands(img, width):
+                raster[top:bottom] = np.asarray(strip.convert('RGB'))
+        else:
+            if width * height > Config.MAX_FULL_DECODE_PIXELS:
+                raise ValueError(
+                    f'{width}x{height} image needs a full decode, larger than '
+                    f'UCHI_MAX_FULL_DECODE_PIXELS; store it as a tiled TIFF or install rasterio'
+                )
+            # Convert strip by strip so no second full-size copy is created
+            for top in range(0, height, DECODE_STRIP_ROWS):
+                bottom = min(top + DECODE_STRIP_ROWS, height)
+                strip = img.crop((0, top, width, bottom)).convert('RGB')
+                raster[top:bottom] = np.asarray(strip)
+
+        raster.flush()
+
+    # mmap keeps its own handle to the spill file
+    spill.close()
+    raster.setflags(write=False)
+    return raster
+
+
+def _spill_file(height: int, width: int, cache_dir: str = None):
+    """Anonymous temporary file and a writable (H, W, 3) uint8 memmap over it"""
+    spill = tempfile.TemporaryFile(dir=cache_dir)
+    return spill, np.memmap(spill, dtype=np.uint8, mode='w+', shape=(height, width, 3))
+
+
+def _spill_windowed(image_path: str, cache_dir: str, max_pixels: int) -> Any:
+    """
+    open_raster through rasterio windowed reads, one DECODE_STRIP_ROWS strip
+    at a time; None if GDAL can't read the file or it is palette-indexed
+    """
+    try:
+        src = rasterio.open(image_path)
+    except rasterio.errors.RasterioIOError:
+        return None
+    with src:
+        if src.colorinterp[0] == ColorInterp.palette:
+            return None
+        height, width = src.height, src.width
+        _check_pixels(width, height, max_pixels)
+        bands = [1, 2, 3] if src.count >= 3 else [1, 1, 1]
+        spill, raster = _spill_file(height, width, cache_dir)
+        for top in range(0, height, DECODE_STRIP_ROWS):
+            bottom = min(top + DECODE_STRIP_ROWS, height)
+            window = Window(0, top, width, bottom - top)
+            raster[top:bottom] = np.moveaxis(src.read(bands, window=window, out_dtype=np.uint8), 0, -1)
+        raster.flush()
+    spill.close()
+    raster.setflags(write=False)
+    return raster
+
+
+def _check_pixels(width: int, height: int, max_pixels: int) -> None:
+    """Decompression-bomb guard"""
+    if max_pixels and width * height > max_pixels:
+        raise ValueError(
+            f'Image has {width * height} pixels, more than the limit of '
+            f'{max_pixels} (UCHI_MAX_IMAGE_PIXELS)'
+        )
+
+
+def _open_limited(fp, max_pixels: int):
+    """
+    Image.open with max_pixels as the decompression-bomb limit
+
+    Pillow's own guard is the process-wide Image.MAX_IMAGE_PIXELS. It is
+    lifted only for this header parse, under a lock, and the limit checked
+    here instead, so other callers keep Pillow's default.
+    """
+    with _PIXEL_LIMIT_LOCK:
+        default = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None
+        try:
+            img = Image.open(fp)
+        finally:
+            Image.MAX_IMAGE_PIXELS = default
+    try:
+        _check_pixels(*img.size, max_pixels)
+    except Exception:
+        img.close()
+        raise
+    return img
+
+
+def _decode_bands(img, width: int) -> Iterator[Tuple[int, int, Any]]:
+    """
+    Yield (top, bottom, image) bands of at least DECODE_STRIP_ROWS rows
+
+    Each band decodes only its own entries of img.tile (the file's strips
+    or tiles, each with its own offset), so one band is held in memory at
+    a time.
+    """
+    tiles = sorted(img.tile, key=lambda tile: tile[1][1])
+    fp = img.fp  # load() drops it
+    band, top, bottom = [], 0, 0
+    for tile in tiles + [None]:
+        if tile is None or (tile[1][1] >= bottom and bottom - top >= DECODE_STRIP_ROWS):
+            img.tile = [(decoder, (x0, y0 - top, x1, y1 - top), offset, args)
+                        for decoder, (x0, y0, x1, y1), offset, args in band]
+            img._size = (width, bottom - top)
+            img.fp = fp
+            img.load()
+            yield top, bottom, img
+            if tile is None:
+                return
+            band, top = [], tile[1][1]
+        band.append(tile)
+        bottom = max(bottom, tile[1][3])
+
+
+def iter_image_tiles(image_path: str, tile_size: int = DEFAULT_TILE_SIZE,
+                     overlap: int = DEFAULT_TILE_OVERLAP) -> Iterator[Tile]:
+    """
+    Yield overlapping tiles of a (possibly huge) image
+    
+    Core regions tile the image exactly once; each tile's data is padded
+    with up to `overlap` pixels of context on every side (clipped at the
+    image border). Consumers should crop their outputs with tile.core so
+    overlapping pixels are not counted twice.
+    
+    Args:
+        image_path: Path to image file (.tif/.png/.jpg/.npy)
+        tile_size: Core tile edge in pixels
+        overlap: Context pixels on each side
+        
+    Yields:
+        Tile with float32 data normalized to 0-1
+    """
+    if np is None:
+        raise RuntimeError('NumPy is required for tiled preprocessing')
+    if tile_size <= 0 or overlap < 0:
+        raise ValueError('tile_size must be positive and overlap non-negative')
+
+    ext = os.path.splitext(image_path)[1].lower()
+
+    if rasterio is not None and ext in ('.tif', '.tiff'):
+        # Windowed reads: only the tile is ever decoded
+        with rasterio.open(image_path) as src:
+            height, width = src.height, src.width
+            bands = [1, 2, 3] if src.count >= 3 else [1, 1, 1]
+
+            def read_window(top, left, bottom, right):
+                window = Window(left, top, right - left, bottom - top)
+                return np.moveaxis(src.read(bands, window=window), 0, -1)
+
+            yield from _generate_tiles(read_window, height, width, tile_size, overlap)
+        return
+
+    raster = open_raster(image_path)
+    height, width = raster.shape[:2]
+
+    def read_window(top, left, bottom, right):
+        window = raster[top:bottom, left:right]
+        if window.shape[2] == 1:
+            window = np.repeat(window, 3, axis=2)
+        return window[:, :, :3]
+
+    yield from _generate_tiles(read_window, height, width, tile_size, overlap)
+
+
+def _generate_tiles(read_window, height: int, width: int,
+                    tile_size: int, overlap: int) -> Iterator[Tile]:
+    """Walk the tile grid and normalize each window to float32"""
+    for row in range(0, height, tile_size):
+        for col in range(0, width, tile_size):
+            top = max(row - overlap, 0)
+            left = max(col - overlap, 0)
+            bottom = min(row + tile_size + overlap, height)
+            right = min(col + tile_size + overlap, width)
+
+            window = read_window(top, left, bottom, right)
+            data = np.empty(window.shape, dtype=np.float32)
+            np.multiply(window, 1.0 / 255.0, out=data, casting='unsafe')
+
+            core = (
+                slice(row - top, min(row + tile_size, height) - top),
+                slice(col - left, min(col + tile_size, width) - left),
+            )
+            yield Tile(data=data, row=row, col=col, core=core)
+
+
 def enhance_vegetation_features(image: Any) -> Any:
     """
     Enhance vegetation features in image
@@ -0,0 +1,340 @@
+"""
+Read Cache Module
+TTL read-through cache for the dashboard endpoints
+
+/get-bangalore-summary, /get-rvce-results and /compare/<region> are
+requested on every dashboard page load. Their responses are cached as
+serialized JSON with an ETag for a per-endpoint TTL (Config.READ_CACHE_TTLS).
+Each entry is tagged with the regions it reads (region_tags). A write to a
+region invalidates exactly the entries tagged with it, so a new upload
+shows up on the next request instead of after the TTL.
+
+A load that started before an invalidation is not stored: tags carry a
+generation counter, snapshotted before the query and checked on put.
+
+Backends (get_read_cache):
+- MemoryReadCache: per process, LRU-bounded by Config.READ_CACHE_MAX_ENTRIES.
+  Writes in other worker processes are only seen after the TTL, except
+  bulk rewrites announced with clear_shared() (an epoch file every
+  process checks on lookup).
+- RedisReadCache: shared by all worker processes (Config.READ_CACHE_URL,
+  e.g. redis://localhost:6379/0). Needs the redis package. Size is bounded
+  by the server's maxmemory-policy (use allkeys-lru).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from config import Config
+
+
+class CachedResponse(NamedTuple):
+    """Serialized JSON body and its ETag (unquoted)"""
+    body: bytes
+    etag: str
+
+
+def serialize(payload) -> CachedResponse:
+    """Serialize a JSON payload and derive its ETag from the bytes"""
+    body = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+    return CachedResponse(body, hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+def region_tags(area_type: str, sub_region: Optional[str] = None) -> List[str]:
+    """
+    Tags of the cached reads that a write to (area_type, sub_region) changes
+
+    'Bengaluru' covers the Bengaluru summary and comparison, 'RVCE' the
+    RVCE region list and 'RVCE/<sub_region>' that sub-region's comparison.
+    """
+    if area_type == 'RVCE' and sub_region:
+        return ['RVCE', f'RVCE/{sub_region}']
+    return [area_type]
+
+
+class ReadCache:
+    """Interface for read cache backends"""
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Cached response, or None if missing or expired"""
+        raise NotImplementedError
+
+    def token(self, tags: Iterable[str]):
+        """Snapshot of the tag generations; take it before loading"""
+        raise NotImplementedError
+
+    def put(self, key: str, payload, ttl: float, tags: Iterable[str], token) -> CachedResponse:
+        """
+        Serialize payload and cache it for ttl seconds
+
+        Skipped (the response is still returned) if ttl <= 0 or any tag was
+        invalidated since token was taken.
+        """
+        raise NotImplementedError
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """Drop every entry tagged with any of tags"""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        raise NotImplementedError
+
+    def get_or_load(self, key: str, ttl: float, tags: Iterable[str],
+                    loader: Callable[[], object]) -> CachedResponse:
+        """
+        Cached response for key, calling loader() on a miss
+
+        Concurrent misses of one key wait for a single load. Callers keep
+        the key space small (one key per endpoint and known region).
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self._count(hit=True)
+            return cached
+        with self._stats_lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            cached = self.get(key)
+            if cached is not None:
+                self._count(hit=True)
+                return cached
+            self._count(hit=False)
+            token = self.token(tags)
+            return self.put(key, loader(), ttl, tags, token)
+
+    def _count(self, hit: bool = False, invalidated: int = 0) -> None:
+        with self._stats_lock:
+            if invalidated:
+                self._invalidations += invalidated
+            elif hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def record(self, hit: bool) -> None:
+        """Count a lookup made with get()/put() directly (async callers)"""
+        self._count(hit=hit)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for /metrics"""
+        with self._stats_lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': self.backend,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hitRatio': round(self._hits / lookups, 3) if lookups else None,
+                'invalidations': self._invalidations
+            }
+
+
+class MemoryReadCache(ReadCache):
+    """In-process TTL cache with LRU eviction"""
+
+    backend = 'memory'
+
+    def __init__(self, max_entries: int = 1000, epoch_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: LRU bound
+            epoch_path: File touched by clear_shared(); everything is
+                dropped when its mtime changes
+        """
+        super().__init__()
+        self.max_entries = max_entries
+        self.epoch_path = epoch_path
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (response, expires, tags)
+        self._generations: Dict[str, int] = {}
+        self._epoch = self._read_epoch()
+
+    def _read_epoch(self) -> int:
+        if not self.epoch_path:
+            return 0
+        try:
+            return os.stat(self.epoch_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        epoch = self._read_epoch()
+        if epoch != self._epoch:
+            self._epoch = epoch
+            self.clear()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            response, expires, _ = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def token(self, tags: Iterable[str]):
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def put(self, key: str, payload, ttl: float, tags: Iterable[str], token) -> CachedResponse:
+        response = serialize(payload)
+        tags = tuple(tags)
+        with self._lock:
+            if ttl <= 0 or tuple(self._generations.get(tag, 0) for tag in tags) != token:
+                return response
+            self._entries[key] = (response, time.monotonic() + ttl, tags)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return response
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        tags = set(tags)
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            stale = [key for key, (_, _, entry_tags) in self._entries.items()
+                     if tags.intersection(entry_tags)]
+            for key in stale:
+                del self._entries[key]
+        self._count(invalidated=len(stale))
+
+    def clear(self) -> None:
+        with self._lock:
+            for tag in self._generations:
+                self._generations[tag] += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        with self._lock:
+            stats['entries'] = len(self._entries)
+        stats['maxEntries'] = self.max_entries
+        return stats
+
+
+class RedisReadCache(ReadCache):
+    """Read cache shared by all worker processes through Redis"""
+
+    backend = 'redis'
+
+    def __init__(self, url: str, prefix: str = 'uchi:read:'):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('redis is required for UCHI_READ_CACHE_URL')
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._watch_error = redis.WatchError
+
+    def _key(self, key: str) -> str:
+        return f'{self.prefix}entry:{key}'
+
+    def _tag(self, tag: str) -> str:
+        return f'{self.prefix}tag:{tag}'
+
+    def _generation(self, tag: str) -> str:
+        return f'{self.prefix}gen:{tag}'
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            raw = self.redis.get(self._key(key))
+        except Exception as e:  # Redis unavailable: serve uncached
+            print(f"⚠️  Read cache unavailable: {e}")
+            return None
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b'\n')
+        return CachedResponse(body, etag.decode('ascii'))
+
+    def token(self, tags: Iterable[str]):
+        try:
+            return tuple(self.redis.mget([self._generation(tag) for tag in tags]))
+        except Exception:
+            return None  # never matches, so put() skips
+
+    def put(self, key: str, payload, ttl: float, tags: Iterable[str], token) -> CachedResponse:
+        response = serialize(payload)
+        tags = tuple(tags)
+        if ttl <= 0:
+            return response
+        generations = [self._generation(tag) for tag in tags]
+        entry = self._key(key)
+        # WATCH makes the write fail if a tag is invalidated between check and SET
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(*generations)
+                if tuple(pipe.mget(generations)) != token:
+                    return response
+                pipe.multi()
+                pipe.set(entry, response.etag.encode('ascii') + b'\n' + response.body,
+                         px=int(ttl * 1000))
+                for tag in tags:
+                    pipe.sadd(self._tag(tag), entry)
+                pipe.execute()
+            except self._watch_error:
+                pass  # a tag was invalidated meanwhile
+            except Exception as e:
+                print(f"⚠️  Read cache put skipped for {key}: {e}")
+        return response
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        stale = 0
+        try:
+            for tag in set(tags):
+                with self.redis.pipeline() as pipe:
+                    pipe.incr(self._generation(tag))
+                    pipe.smembers(self._tag(tag))
+                    pipe.delete(self._tag(tag))
+                    _, entries, _ = pipe.execute()
+                if entries:
+                    stale += self.redis.delete(*entries)
+        except Exception as e:
+            # Entries expire after their TTL anyway
+            print(f"⚠️  Read cache invalidation failed: {e}")
+        self._count(invalidated=stale)
+
+    def clear(self) -> None:
+        for name in self.redis.scan_iter(match=f'{self.prefix}gen:*'):
+            self.redis.incr(name)
+        for pattern in (f'{self.prefix}entry:*', f'{self.prefix}tag:*'):
+            names = list(self.redis.scan_iter(match=pattern))
+            if names:
+                self.redis.delete(*names)
+
+
+def get_read_cache() -> ReadCache:
+    """Create the read cache selected by Config.READ_CACHE_URL (empty = in-process)"""
+    if Config.READ_CACHE_URL:
+        return RedisReadCache(Config.READ_CACHE_URL)
+    return MemoryReadCache(Config.READ_CACHE_MAX_ENTRIES, Config.READ_CACHE_EPOCH_PATH)
+
+
+def clear_shared() -> None:
+    """
+    Drop the cached reads of every server process
+
+    For writes made outside the servers (rescore.py): clears Redis, or
+    touches the epoch file the in-process caches check on lookup.
+    """
+    if Config.READ_CACHE_URL:
+        RedisReadCache(Config.READ_CACHE_URL).clear()
+        return
+    os.makedirs(os.path.dirname(Config.READ_CACHE_EPOCH_PATH), exist_ok=True)
+    with open(Config.READ_CACHE_EPOCH_PATH, 'a'):
+        pass
+    os.utime(Config.READ_CACHE_EPOCH_PATH, ns=(time.time_ns(), time.time_ns()))
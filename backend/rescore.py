@@ -0,0 +1,280 @@
+"""
+Re-score Command
+Recompute stored CHI results from persisted label artifacts
+
+Reads each result's artifact (artifacts.py) by its image id, recounts the
+packed labels and runs the current CHI formula and region calibration on
+the counts. No image is downloaded and no model is run, so a formula or
+calibration change can be applied to the whole history overnight:
+
+    python rescore.py
+    python rescore.py --area-type RVCE --date-from 2026-01-01 --dry-run
+    python rescore.py --resume          # continue after an interruption
+
+Results are streamed in keyset pages (Config.RESCORE_PAGE_SIZE). Each page
+is re-scored on a process pool worker, written back with one batched
+update, and then recorded in a checkpoint file. --resume restarts after
+the last written page. Pages are written in order, so the checkpoint never
+skips unwritten rows. A failed page read or write stops the run with the
+checkpoint left in place.
+
+Results whose image has no artifact (analyzed before artifacts were kept,
+or with Config.ARTIFACTS_ENABLED off) are skipped and counted as missing.
+Region rollups are rebuilt once at the end (also when a run stops after
+writing some pages), and the result cache and dashboard read cache are
+cleared so servers stop serving the old scores.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from database import get_database, BaseDatabase
+from artifacts import ArtifactStore
+from result_cache import ResultCache
+import chi_calculation
+import pipeline
+import read_cache
+
+
+RESCORE_FIELDS = ['id', 'imageId', 'areaType', 'subRegion', 'chiValue']
+COUNT_KEYS = ('scanned', 'rescored', 'changed', 'missing', 'failed')
+
+
+def rescore_result(result: Dict, store: ArtifactStore) -> Optional[Dict]:
+    """
+    Recompute one result from its artifact
+
+    Args:
+        result: Row from Database.get_results_page with RESCORE_FIELDS
+        store: Artifact store to read from
+
+    Returns:
+        pipeline.analysis_from_chi dictionary, or None if there is no artifact
+    """
+    image_id = result['imageId']
+    if image_id is None or not store.exists(image_id):
+        return None
+    # Same CHI path as pipeline.analyze_image, fed with the stored packed chunks
+    chi_data = chi_calculation.calculate_chi_tiled(
+        chunk.labels for chunk in store.iter_chunks(image_id)
+    )
+    return pipeline.analysis_from_chi(chi_data, result['areaType'], result['subRegion'])
+
+
+def rescore_page(results: List[Dict], artifact_path: str) -> Tuple[List[Dict], Dict[str, int]]:
+    """
+    Re-score one page of results (runs in a worker process)
+
+    Returns:
+        Tuple of (chi_results rows for Database.update_chi_results, counts)
+    """
+    store = ArtifactStore(artifact_path)
+    rows = []
+    counts = dict.fromkeys(COUNT_KEYS, 0)
+
+    for result in results:
+        counts['scanned'] += 1
+        try:
+            analysis = rescore_result(result, store)
+        except Exception as e:
+            print(f"❌ Result {result['id']} (image {result['imageId']}): {e}")
+            counts['failed'] += 1
+            continue
+        if analysis is None:
+            counts['missing'] += 1
+            continue
+
+        counts['rescored'] += 1
+        if analysis['chi_value'] != result['chiValue']:
+            counts['changed'] += 1
+        rows.append({
+            'id': result['id'],
+            'chi_value': analysis['chi_value'],
+            'status': analysis['status'],
+            'interpretation': analysis['interpretation'],
+            'vegetation_coverage': analysis['vegetation_coverage'],
+            'healthy_vegetation': analysis['healthy_vegetation'],
+            'stressed_vegetation': analysis['stressed_vegetation']
+        })
+
+    return rows, counts
+
+
+class Checkpoint:
+    """JSON file recording the cursor after the last written page"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self, filters: Dict) -> Tuple[Optional[str], Dict[str, int]]:
+        """
+        Cursor and counts of an interrupted run with the same filters
+
+        Raises:
+            ValueError: If the checkpoint was written for other filters
+        """
+        if not os.path.exists(self.path):
+            return None, dict.fromkeys(COUNT_KEYS, 0)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state['filters'] != filters:
+            raise ValueError(f"Checkpoint {self.path} is for filters {state['filters']}; "
+                             f"delete it or rerun with the same filters")
+        return state['cursor'], state['counts']
+
+    def save(self, cursor: str, filters: Dict, counts: Dict[str, int]):
+        """Atomically record progress"""
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'cursor': cursor, 'filters': filters, 'counts': counts,
+                       'updatedAt': datetime.now().isoformat()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def rescore_all(db: BaseDatabase, store: ArtifactStore, dry_run: bool = False,
+                workers: Optional[int] = None, page_size: int = Config.RESCORE_PAGE_SIZE,
+                checkpoint: Optional[Checkpoint] = None, resume: bool = False,
+                progress_every: int = 0, **filters) -> Dict[str, int]:
+    """
+    Re-score every matching result
+
+    Args:
+        db: Database to read and update
+        store: Artifact store
+        dry_run: Compute and report without writing (no checkpoint either)
+        workers: Worker processes (defaults to Config.BATCH_MAX_WORKERS)
+        page_size: Results per page
+        checkpoint: Progress file; written after every page
+        resume: Start after the checkpoint's last page
+        progress_every: Print progress every N pages (0 = never)
+        **filters: area_type / sub_region / date_from / date_to
+
+    Returns:
+        Counts: scanned, rescored, changed, missing, failed
+
+    Raises:
+        Exception: From a page read or write, or RuntimeError if region_rollups
+            could not be rebuilt; the checkpoint is kept for --resume
+    """
+    workers = workers or Config.BATCH_MAX_WORKERS
+    if checkpoint is not None and resume and not dry_run:
+        cursor, counts = checkpoint.load(filters)
+    else:
+        cursor, counts = None, dict.fromkeys(COUNT_KEYS, 0)
+
+    start = time.perf_counter()
+    pages = 0
+    written = 0
+    rebuilt = True
+    exhausted = False
+    pending = deque()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    # Keep every worker busy with a page queued behind it
+                    while not exhausted and len(pending) < 2 * workers:
+                        results, cursor = db.get_results_page(limit=page_size, cursor=cursor,
+                                                              fields=RESCORE_FIELDS, **filters)
+                        if results:
+                            pending.append((pool.submit(rescore_page, results, store.root), cursor))
+                        exhausted = cursor is None
+                    if not pending:
+                        break
+
+                    future, page_cursor = pending.popleft()
+                    rows, page_counts = future.result()
+                    if not dry_run:
+                        page_written = db.update_chi_results(rows)
+                        written += page_written
+                        page_counts['failed'] += len(rows) - page_written  # deleted meanwhile
+                    for key in COUNT_KEYS:
+                        counts[key] += page_counts[key]
+
+                    pages += 1
+                    if checkpoint is not None and not dry_run and page_cursor is not None:
+                        checkpoint.save(page_cursor, filters, counts)
+                    if progress_every and pages % progress_every == 0:
+                        rate = counts['scanned'] / (time.perf_counter() - start)
+                        print(f"[RESCORE] {counts['scanned']} results scanned ({rate:.0f}/s)")
+            except BaseException:
+                # The checkpoint stays at the last written page; don't wait for queued ones
+                for future, _ in pending:
+                    future.cancel()
+                raise
+    finally:
+        if written:
+            rebuilt = db.rebuild_region_rollups()
+            invalidate_caches()
+
+    if not rebuilt:
+        # Dashboards would keep the pre-rescore averages; --resume rewrites
+        # the last page and rebuilds again
+        raise RuntimeError('Rebuilding region_rollups failed')
+    if not dry_run and checkpoint is not None:
+        checkpoint.clear()
+    return counts
+
+
+def invalidate_caches():
+    """Drop cached uploads and dashboard reads that show pre-rescore scores"""
+    os.makedirs(os.path.dirname(Config.RESULT_CACHE_PATH), exist_ok=True)
+    ResultCache(Config.RESULT_CACHE_PATH).clear()
+    read_cache.clear_shared()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute CHI results from stored artifacts')
+    parser.add_argument('--area-type', choices=['Bengaluru', 'RVCE'])
+    parser.add_argument('--sub-region')
+    parser.add_argument('--date-from', help='YYYY-MM-DD (inclusive)')
+    parser.add_argument('--date-to', help='YYYY-MM-DD (inclusive)')
+    parser.add_argument('--artifact-path', default=Config.ARTIFACT_PATH)
+    parser.add_argument('--workers', type=int, default=Config.BATCH_MAX_WORKERS)
+    parser.add_argument('--page-size', type=int, default=Config.RESCORE_PAGE_SIZE)
+    parser.add_argument('--checkpoint', default=Config.RESCORE_CHECKPOINT_PATH)
+    parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint')
+    parser.add_argument('--dry-run', action='store_true', help='Report changes without writing')
+    args = parser.parse_args()
+
+    filters = {key: value for key, value in {
+        'area_type': args.area_type,
+        'sub_region': args.sub_region,
+        'date_from': args.date_from,
+        'date_to': args.date_to
+    }.items() if value}
+
+    start = time.perf_counter()
+    try:
+        counts = rescore_all(get_database(), ArtifactStore(args.artifact_path),
+                             dry_run=args.dry_run, workers=args.workers, page_size=args.page_size,
+                             checkpoint=Checkpoint(args.checkpoint), resume=args.resume,
+                             progress_every=10, **filters)
+    except Exception as e:
+        print(f"❌ Re-scoring stopped: {e}")
+        if not args.dry_run:
+            print("   Run again with --resume to continue after the last written page")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'[DRY RUN] ' if args.dry_run else ''}✅ Re-scored {counts['rescored']} of "
+          f"{counts['scanned']} results in {elapsed:.1f}s "
+          f"({counts['changed']} changed, {counts['missing']} without artifact, "
+          f"{counts['failed']} failed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Result Cache Module
+Content-addressed cache of CHI results keyed by image hash
+
+Duplicate uploads (the same drone frame sent twice) are detected by a
+streaming BLAKE2b digest of the uploaded bytes. Entries are keyed by
+digest, pipeline version and region (including the capture date, see
+app._cache_region), so a formula/model change, a different calibration
+region or another date never serves a stale result. The cache is
+persisted in SQLite and bounded by Config.RESULT_CACHE_MAX_ENTRIES with
+least-recently-used eviction.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+def new_digest():
+    """Create the hasher used for content addressing (BLAKE2b, 32-byte digest)"""
+    return hashlib.blake2b(digest_size=32)
+
+
+class ResultCache:
+    """Persistent, size-bounded LRU cache of CHI results"""
+
+    def __init__(self, db_path: str, max_entries: int = 10000):
+        """
+        Args:
+            db_path: SQLite file for cache entries
+            max_entries: Maximum number of cached results
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    digest TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    region TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    last_access TEXT NOT NULL,
+                    PRIMARY KEY (digest, version, region)
+                )
+            ''')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_result_cache_last_access ON result_cache(last_access)'
+            )
+
+    def get(self, digest: str, version: str, region: str) -> Optional[Dict]:
+        """Look up a cached result and mark it as recently used"""
+        key = (digest, version, region)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT result FROM result_cache WHERE digest = ? AND version = ? AND region = ?', key
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                'UPDATE result_cache SET last_access = ? WHERE digest = ? AND version = ? AND region = ?',
+                (datetime.now().isoformat(), *key)
+            )
+        return json.loads(row[0])
+
+    def put(self, digest: str, version: str, region: str, result: Dict):
+        """Store a result, evicting least-recently-used entries beyond max_entries"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO result_cache (digest, version, region, result, last_access) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (digest, version, region, json.dumps(result), datetime.now().isoformat())
+            )
+            self._conn.execute('''
+                DELETE FROM result_cache WHERE rowid IN (
+                    SELECT rowid FROM result_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+
+    def clear(self):
+        """Drop every entry (stored results were rewritten, e.g. by rescore.py)"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM result_cache')
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM result_cache').fetchone()[0]
@@ -0,0 +1,102 @@
+"""
+Startup Module
+Lazy module loading and import-time reporting for fast cold starts
+
+Heavy modules (the analysis pipeline, and with it NumPy, PIL and any model
+runtime) are bound with lazy_import(): the name is usable at once, but the
+module only executes on first attribute access. Importing app.py or a CLI
+therefore stays cheap, and a preforking server pays the cost once in its
+warm-up hook instead of in every spawned worker.
+
+import_report() runs a fresh interpreter with `-X importtime` and
+summarizes which modules dominate startup:
+
+    python app.py --import-report
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+
+def lazy_import(name: str):
+    """
+    Bind a module that is only executed on first attribute access
+
+    Returns the already imported module if there is one.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class ImportTiming(NamedTuple):
+    """One line of `-X importtime` output"""
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure_imports(module: str) -> List[ImportTiming]:
+    """Import a module in a fresh interpreter with -X importtime and parse the timings"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing {module} failed:\n{result.stderr[-2000:]}')
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append(ImportTiming(name.strip(), int(self_us), int(cumulative_us), depth))
+    return timings
+
+
+def import_report(module: str = 'app', top: int = 20) -> str:
+    """
+    Import-time breakdown of a module
+
+    Returns:
+        Report with the total and the slowest top-level imports (cumulative,
+        i.e. including what they import) and slowest single modules (self)
+    """
+    timings = measure_imports(module)
+    index = next((i for i, t in enumerate(timings) if t.module == module), None)
+    if index is None:
+        raise RuntimeError(f'{module} was already imported at interpreter startup')
+    root = timings[index]
+
+    # -X importtime lists a module's imports right before it, one level deeper
+    direct = []
+    for timing in reversed(timings[:index]):
+        if timing.depth <= root.depth:
+            break
+        if timing.depth == root.depth + 1:
+            direct.append(timing)
+    direct.sort(key=lambda t: t.cumulative_us, reverse=True)
+    total_ms = root.cumulative_us / 1000
+    slowest = sorted(timings, key=lambda t: t.self_us, reverse=True)
+
+    lines = [f"Import time of {module}: {total_ms:.1f} ms ({len(timings)} modules)",
+             '', 'Slowest imports (cumulative ms):']
+    lines += [f"  {t.cumulative_us / 1000:9.1f}  {t.module}" for t in direct[:top]]
+    lines += ['', 'Slowest modules (self ms):']
+    lines += [f"  {t.self_us / 1000:9.1f}  {t.module}" for t in slowest[:top]]
+    return '\n'.join(lines)
@@ -0,0 +1,219 @@
+"""
+Storage module for UCHI
+Pluggable image storage backends selected by Config.STORAGE_BACKEND
+
+- 'supabase': Supabase Storage bucket (default, cloud)
+- 'local': content-addressed directory under backend/uploads, for
+  air-gapped deployments and low-latency local development
+"""
+
+import mmap
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Optional
+
+from config import Config
+from result_cache import new_digest, HASH_CHUNK_SIZE
+
+
+class StorageBackend:
+    """Interface for image storage backends"""
+
+    # True if one stored object can back several uploads (identical content),
+    # so an object must not be deleted on behalf of a single failed upload
+    content_addressed = False
+
+    def upload(self, storage_path: str, data: bytes, content_type: str) -> str:
+        """
+        Store an object
+
+        Args:
+            storage_path: Requested path (e.g. "RVCE/20260101_120000_img.jpg")
+            data: File content
+            content_type: MIME type
+
+        Returns:
+            Path the object was actually stored under (record this in image_metadata)
+        """
+        raise NotImplementedError
+
+    def upload_file(self, storage_path: str, file_path: str, content_type: str,
+                    digest: Optional[str] = None) -> str:
+        """
+        Store an object from a local file without reading it into memory
+
+        Backends override this to stream; the default falls back to upload().
+
+        Args:
+            digest: Content digest if already known (from ingest)
+
+        Returns:
+            Path the object was actually stored under
+        """
+        with open(file_path, 'rb') as f:
+            return self.upload(storage_path, f.read(), content_type)
+
+    def read(self, storage_path: str) -> bytes:
+        """Read an object's content"""
+        raise NotImplementedError
+
+    def delete(self, storage_path: str) -> None:
+        """Remove an object (missing objects are ignored)"""
+        raise NotImplementedError
+
+    def is_available(self) -> bool:
+        """Check if the backend is usable"""
+        raise NotImplementedError
+
+
+class SupabaseStorage(StorageBackend):
+    """Supabase Storage bucket backend"""
+
+    def __init__(self, bucket: Optional[str] = None):
+        self._supabase = None
+        self.bucket = bucket or Config.SUPABASE_STORAGE_BUCKET
+
+    @property
+    def supabase(self):
+        """Supabase client, imported and connected on first access"""
+        if self._supabase is None:
+            from supabase_client import get_supabase
+            self._supabase = get_supabase()
+        return self._supabase
+
+    def upload(self, storage_path: str, data: bytes, content_type: str) -> str:
+        self.supabase.storage.from_(self.bucket).upload(
+            storage_path,
+            data,
+            {"content-type": content_type}
+        )
+        return storage_path
+
+    def upload_file(self, storage_path: str, file_path: str, content_type: str,
+                    digest: Optional[str] = None) -> str:
+        # storage3 opens the path itself and streams it as the request body
+        self.supabase.storage.from_(self.bucket).upload(
+            storage_path,
+            file_path,
+            {"content-type": content_type}
+        )
+        return storage_path
+
+    def read(self, storage_path: str) -> bytes:
+        return self.supabase.storage.from_(self.bucket).download(storage_path)
+
+    def delete(self, storage_path: str) -> None:
+        self.supabase.storage.from_(self.bucket).remove([storage_path])
+
+    def is_available(self) -> bool:
+        return self.supabase is not None
+
+
+class LocalStorage(StorageBackend):
+    """
+    Content-addressed local directory backend
+
+    Objects are stored once per content digest as
+    <root>/<aa>/<bb>/<blake2b digest><ext>, so duplicate uploads cost no
+    extra disk space. Writes go to a temp file and are renamed into
+    place atomically. Reads can be zero-copy through open_mmap().
+    """
+
+    content_addressed = True
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or Config.LOCAL_STORAGE_PATH
+        os.makedirs(self.root, exist_ok=True)
+
+    def upload(self, storage_path: str, data: bytes, content_type: str) -> str:
+        digest = new_digest()
+        digest.update(data)
+        object_path, target = self._object_target(storage_path, digest.hexdigest())
+
+        if not os.path.exists(target):
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+
+        return object_path
+
+    def upload_file(self, storage_path: str, file_path: str, content_type: str,
+                    digest: Optional[str] = None) -> str:
+        if digest is None:
+            hasher = new_digest()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+        object_path, target = self._object_target(storage_path, digest)
+
+        if not os.path.exists(target):
+            # Unique per call: concurrent uploads of the same content must not share it
+            tmp_path = f'{target}.{uuid.uuid4().hex}.tmp'
+            try:
+                try:
+                    # Hard link when on the same filesystem: no data is copied
+                    os.link(file_path, tmp_path)
+                except OSError:
+                    shutil.copyfile(file_path, tmp_path)
+                os.replace(tmp_path, target)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        return object_path
+
+    def _object_target(self, storage_path: str, digest: str):
+        """Content-addressed object path and its filesystem location"""
+        ext = os.path.splitext(storage_path)[1].lower()
+        object_path = f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+        target = self.local_path(object_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        return object_path, target
+
+    def local_path(self, storage_path: str) -> str:
+        """Absolute filesystem path of a stored object"""
+        path = os.path.normpath(os.path.join(self.root, storage_path))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f'Invalid storage path: {storage_path}')
+        return path
+
+    def open_mmap(self, storage_path: str) -> mmap.mmap:
+        """Map a stored object read-only (zero-copy; caller closes it)"""
+        with open(self.local_path(storage_path), 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, storage_path: str) -> bytes:
+        with open(self.local_path(storage_path), 'rb') as f:
+            return f.read()
+
+    def delete(self, storage_path: str) -> None:
+        try:
+            os.remove(self.local_path(storage_path))
+        except FileNotFoundError:
+            pass
+
+    def is_available(self) -> bool:
+        return os.path.isdir(self.root) and os.access(self.root, os.W_OK)
+
+
+STORAGE_BACKENDS = {
+    'supabase': SupabaseStorage,
+    'local': LocalStorage,
+}
+
+
+def get_storage() -> StorageBackend:
+    """Create the storage backend selected by Config.STORAGE_BACKEND"""
+    try:
+        backend = STORAGE_BACKENDS[Config.STORAGE_BACKEND]
+    except KeyError:
+        raise ValueError(
+            f"Unknown STORAGE_BACKEND '{Config.STORAGE_BACKEND}'. "
+            f"Must be one of: {list(STORAGE_BACKENDS)}"
+        )
+    return backend()
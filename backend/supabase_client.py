@@ -1,45 +1,202 @@
 """
 Supabase Client Configuration
 Handles connection to Supabase PostgreSQL and Storage
+
+The REST (PostgREST) and Storage clients share one pooled HTTP transport
+per process: a bounded keep-alive connection pool, explicit timeouts and
+bounded retries with exponential backoff (Config.SUPABASE_*). pool_stats()
+reports pool utilization for GET /metrics.
+
+The client is built on the first get_supabase() call, so importing this
+module (or database.py / storage.py) costs no network setup.
 """
 
 from supabase import create_client, Client
 from config import Config
-import os
+import random
+import threading
+import time
+from typing import Dict
+
+import httpx
+
+# Responses worth retrying (idempotent requests only)
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class PooledTransport(httpx.BaseTransport):
+    """
+    Keep-alive connection pool with bounded retries and utilization stats
+
+    Failures while connecting are retried for every request (nothing was
+    sent yet). Read errors and 429/5xx responses are retried only for
+    idempotent methods with an in-memory body, so inserts are never
+    duplicated and streamed uploads are never replayed half-read.
+    """
+
+    def __init__(self, pool_size: int, keepalive_seconds: float, retries: int, backoff: float):
+        self._transport = httpx.HTTPTransport(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=keepalive_seconds
+            )
+        )
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests = 0
+        self._retried = 0
+        self._failures = 0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            return self._send(request)
+        except Exception:
+            with self._lock:
+                self._failures += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _send(self, request: httpx.Request) -> httpx.Response:
+        replayable = (request.method in IDEMPOTENT_METHODS
+                      and isinstance(request.stream, httpx.ByteStream))
+        attempt = 0
+        while True:
+            try:
+                response = self._transport.handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if attempt >= self.retries:
+                    raise
+            except (httpx.ReadError, httpx.RemoteProtocolError):
+                # A pooled keep-alive connection may have been closed by the server
+                if not replayable or attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or not replayable or attempt >= self.retries:
+                    return response
+                response.close()
+
+            attempt += 1
+            with self._lock:
+                self._retried += 1
+            # Exponential backoff with jitter
+            time.sleep(self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random() / 2))
+
+    def stats(self) -> Dict:
+        """
+        Pool utilization since start
+
+        Returns:
+            Dictionary with poolSize, open/idle connections, in-flight and
+            peak in-flight requests, request, retry and failure counts
+        """
+        try:
+            connections = list(self._transport._pool.connections)
+            open_connections = len(connections)
+            idle_connections = sum(1 for connection in connections if connection.is_idle())
+        except AttributeError:  # transport internals differ across httpx versions
+            open_connections = idle_connections = None
+
+        with self._lock:
+            return {
+                'poolSize': self.pool_size,
+                'openConnections': open_connections,
+                'idleConnections': idle_connections,
+                'inFlight': self._in_flight,
+                'peakInFlight': self._peak_in_flight,
+                'utilization': round(self._peak_in_flight / self.pool_size, 3),
+                'requests': self._requests,
+                'retries': self._retried,
+                'failures': self._failures
+            }
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class _PooledSession(httpx.Client):
+    """httpx client accepted by the postgrest and storage3 clients (they call aclose())"""
+
+    def aclose(self) -> None:
+        self.close()
+
+
+def _use_session(api, session) -> None:
+    """Point a postgrest or storage3 client at session (storage3 also keeps it as _client)"""
+    api.session = session
+    if hasattr(api, '_client'):
+        api._client = session
 
 
 class SupabaseClient:
     """Singleton Supabase client"""
     
     _instance = None
+    _instance_lock = threading.Lock()
     _client: Client = None
+    _transport: PooledTransport = None
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(SupabaseClient, cls).__new__(cls)
-            cls._instance._initialize()
+            # Request threads can race to the first query; build one client and pool
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super(SupabaseClient, cls).__new__(cls)
+                    instance._initialize()
+                    cls._instance = instance
         return cls._instance
     
     def _initialize(self):
         """Initialize Supabase client using SERVICE_KEY for backend operations"""
         url = Config.SUPABASE_URL
         key = Config.SUPABASE_SERVICE_KEY  # Backend uses service key
-        
+    
         if not url or url == 'YOUR_SUPABASE_URL':
             print("⚠️  WARNING: Supabase URL not configured!")
             print("   Set SUPABASE_URL environment variable in .env file")
-        
+    
         if not key or key == 'YOUR_SUPABASE_SERVICE_KEY':
             print("⚠️  WARNING: Supabase Service Key not configured!")
             print("   Set SUPABASE_SERVICE_KEY environment variable in .env file")
-        
+    
         try:
             self._client = create_client(url, key)
+            self._install_pool()
             print("✅ Supabase client initialized successfully")
         except Exception as e:
             print(f"❌ Failed to initialize Supabase client: {e}")
             self._client = None
     
+    def _install_pool(self):
+        """Swap the per-client default HTTP sessions for sessions on one shared pool"""
+        self._transport = PooledTransport(
+            pool_size=Config.SUPABASE_POOL_SIZE,
+            keepalive_seconds=Config.SUPABASE_KEEPALIVE_SECONDS,
+            retries=Config.SUPABASE_RETRIES,
+            backoff=Config.SUPABASE_RETRY_BACKOFF
+        )
+        timeout = httpx.Timeout(Config.SUPABASE_TIMEOUT, connect=Config.SUPABASE_CONNECT_TIMEOUT)
+        for api in (self._client.postgrest, self._client.storage):
+            default = api.session
+            _use_session(api, _PooledSession(
+                base_url=default.base_url,
+                headers=default.headers,
+                timeout=timeout,
+                transport=self._transport
+            ))
+            default.close()
+    
     @property
     def client(self) -> Client:
         """Get Supabase client instance"""
@@ -48,12 +205,83 @@ class SupabaseClient:
     def is_connected(self) -> bool:
         """Check if Supabase client is properly initialized"""
         return self._client is not None
+    
+    def pool_stats(self) -> Dict:
+        """HTTP pool utilization (see PooledTransport.stats), or None if not connected"""
+        return self._transport.stats() if self._transport else None
 
 
-# Global instance
-supabase_client = SupabaseClient()
+class AsyncSupabaseClients:
+    """
+    asyncio REST (PostgREST) and Storage clients for asgi_app.py
+    
+    Built from the sync client's URLs and auth headers, on one pooled
+    httpx.AsyncClient transport (Config.SUPABASE_* limits and timeouts;
+    failed connects are retried by the transport).
+    """
+    
+    def __init__(self, client: Client):
+        from postgrest import AsyncPostgrestClient
+        from storage3 import AsyncStorageClient
+        
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=Config.SUPABASE_POOL_SIZE,
+                max_keepalive_connections=Config.SUPABASE_POOL_SIZE,
+                keepalive_expiry=Config.SUPABASE_KEEPALIVE_SECONDS
+            ),
+            retries=Config.SUPABASE_RETRIES
+        )
+        timeout = httpx.Timeout(Config.SUPABASE_TIMEOUT, connect=Config.SUPABASE_CONNECT_TIMEOUT)
+        headers = dict(client.options.headers)
+        self.postgrest = AsyncPostgrestClient(client.rest_url, headers=headers, schema=client.schema)
+        self.storage = AsyncStorageClient(client.storage_url, headers)
+        for api in (self.postgrest, self.storage):
+            default = api.session
+            _use_session(api, httpx.AsyncClient(
+                base_url=default.base_url,
+                headers=default.headers,
+                timeout=timeout,
+                transport=self._transport
+            ))
+    
+    async def aclose(self) -> None:
+        """Close the pooled connections"""
+        await self.postgrest.session.aclose()
+        await self.storage.session.aclose()
+
+
+_async_clients: AsyncSupabaseClients = None
+_async_clients_lock = threading.Lock()
+
+
+def get_async_supabase() -> AsyncSupabaseClients:
+    """Get the asyncio Supabase clients (created on first use, None if not connected)"""
+    global _async_clients
+    with _async_clients_lock:
+        if _async_clients is None:
+            client = get_supabase()
+            if client is None:
+                return None
+            _async_clients = AsyncSupabaseClients(client)
+        return _async_clients
+
+
+async def close_async_supabase() -> None:
+    """Close the asyncio clients, if created (asgi_app.py lifespan exit)"""
+    global _async_clients
+    with _async_clients_lock:
+        clients, _async_clients = _async_clients, None
+    if clients is not None:
+        await clients.aclose()
 
 
 def get_supabase() -> Client:
-    """Get Supabase client instance"""
-    return supabase_client.client
+    """Get Supabase client instance (created on first use, not at import)"""
+    return SupabaseClient().client
+
+
+def pool_stats() -> Dict:
+    """HTTP pool utilization, or None if the client has not been created yet"""
+    instance = SupabaseClient._instance
+    return instance.pool_stats() if instance else None
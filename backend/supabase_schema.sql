@@ -40,6 +40,8 @@ CREATE INDEX IF NOT EXISTS idx_chi_results_sub_region ON chi_results(sub_region)
 CREATE INDEX IF NOT EXISTS idx_chi_results_date ON chi_results(date DESC);
 CREATE INDEX IF NOT EXISTS idx_chi_results_created_at ON chi_results(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_image_metadata_area_type ON image_metadata(area_type);
+CREATE INDEX IF NOT EXISTS idx_chi_results_region_date ON chi_results(area_type, sub_region, date DESC);
+CREATE INDEX IF NOT EXISTS idx_chi_results_keyset ON chi_results(created_at DESC, id DESC);
 
 -- Comments for documentation
 COMMENT ON TABLE image_metadata IS 'Stores metadata for uploaded satellite/aerial images';
@@ -49,6 +51,258 @@ COMMENT ON COLUMN chi_results.vegetation_coverage IS 'Percentage of area covered
 COMMENT ON COLUMN chi_results.healthy_vegetation IS 'Percentage of healthy vegetation';
 COMMENT ON COLUMN chi_results.stressed_vegetation IS 'Percentage of stressed/unhealthy vegetation';
 
+-- Bulk write path: image_metadata + chi_results rows for many analyses in
+-- one round trip and one transaction (Database.insert_analyses)
+CREATE OR REPLACE FUNCTION insert_analyses(items JSONB)
+RETURNS TABLE (ordinal BIGINT, new_image_id BIGINT, new_result_id BIGINT) AS $$
+DECLARE
+    item JSONB;
+    item_index BIGINT;
+BEGIN
+    FOR item, item_index IN
+        SELECT value, n FROM jsonb_array_elements(items) WITH ORDINALITY AS t(value, n)
+    LOOP
+        INSERT INTO image_metadata (filename, storage_path, area_type, sub_region, date, uploaded_at)
+        VALUES (
+            item->>'filename', item->>'storage_path', item->>'area_type',
+            item->>'sub_region', (item->>'date')::DATE,
+            COALESCE((item->>'uploaded_at')::TIMESTAMPTZ, NOW())
+        )
+        RETURNING id INTO new_image_id;
+
+        INSERT INTO chi_results (
+            image_id, area_type, sub_region, chi_value, status, interpretation, date,
+            vegetation_coverage, healthy_vegetation, stressed_vegetation
+        )
+        VALUES (
+            new_image_id, item->>'area_type', item->>'sub_region',
+            (item->>'chi_value')::REAL, item->>'status', item->>'interpretation',
+            (item->>'date')::DATE, (item->>'vegetation_coverage')::REAL,
+            (item->>'healthy_vegetation')::REAL, (item->>'stressed_vegetation')::REAL
+        )
+        RETURNING id INTO new_result_id;
+
+        ordinal := item_index;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Bulk re-score path: overwrite the scores of existing results in one
+-- statement (Database.update_chi_results). Update only, so results deleted
+-- meanwhile stay deleted; returns the number of rows updated
+CREATE OR REPLACE FUNCTION update_chi_results(items JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE chi_results AS r
+    SET chi_value = i.chi_value,
+        status = i.status,
+        interpretation = i.interpretation,
+        vegetation_coverage = i.vegetation_coverage,
+        healthy_vegetation = i.healthy_vegetation,
+        stressed_vegetation = i.stressed_vegetation
+    FROM jsonb_to_recordset(items) AS i(
+        id BIGINT, chi_value REAL, status TEXT, interpretation TEXT,
+        vegetation_coverage REAL, healthy_vegetation REAL, stressed_vegetation REAL
+    )
+    WHERE r.id = i.id;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================
+-- Region rollups (maintained incrementally on insert)
+-- ============================================================
+-- One row per (area_type, sub_region, day) with running count, sum, sum of
+-- squares, min/max and the last two values, updated by a trigger on every
+-- chi_results insert. Dashboards read these instead of scanning history.
+-- sub_region is '' (not NULL) for area-level rows so it can be part of the key.
+
+CREATE TABLE IF NOT EXISTS region_rollups (
+    area_type TEXT NOT NULL,
+    sub_region TEXT NOT NULL DEFAULT '',
+    day DATE NOT NULL,
+    analyses BIGINT NOT NULL DEFAULT 0,
+    chi_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    chi_sum_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+    chi_min REAL,
+    chi_max REAL,
+    last_chi REAL,
+    prev_chi REAL,
+    last_at TIMESTAMPTZ,
+    last_id BIGINT,  -- chi_results id of last_chi; breaks last_at ties (rows inserted together)
+    PRIMARY KEY (area_type, sub_region, day)
+);
+
+ALTER TABLE region_rollups ADD COLUMN IF NOT EXISTS last_id BIGINT;  -- tables created before last_id
+
+DROP INDEX IF EXISTS idx_region_rollups_last_at;
+CREATE INDEX IF NOT EXISTS idx_region_rollups_latest ON region_rollups(area_type, sub_region, last_at DESC, last_id DESC);
+
+CREATE OR REPLACE FUNCTION update_region_rollup() RETURNS TRIGGER AS $$
+DECLARE
+    prior REAL;
+BEGIN
+    -- Most recent value of this region (any day) becomes prev_chi
+    SELECT last_chi INTO prior
+    FROM region_rollups
+    WHERE area_type = NEW.area_type AND sub_region = COALESCE(NEW.sub_region, '')
+    ORDER BY last_at DESC, last_id DESC
+    LIMIT 1;
+
+    INSERT INTO region_rollups AS r (
+        area_type, sub_region, day, analyses, chi_sum, chi_sum_sq,
+        chi_min, chi_max, last_chi, prev_chi, last_at, last_id
+    )
+    VALUES (
+        NEW.area_type, COALESCE(NEW.sub_region, ''), NEW.date, 1, NEW.chi_value,
+        NEW.chi_value * NEW.chi_value, NEW.chi_value, NEW.chi_value, NEW.chi_value,
+        prior, NEW.created_at, NEW.id
+    )
+    ON CONFLICT (area_type, sub_region, day) DO UPDATE SET
+        analyses = r.analyses + 1,
+        chi_sum = r.chi_sum + EXCLUDED.chi_sum,
+        chi_sum_sq = r.chi_sum_sq + EXCLUDED.chi_sum_sq,
+        chi_min = LEAST(r.chi_min, EXCLUDED.chi_min),
+        chi_max = GREATEST(r.chi_max, EXCLUDED.chi_max),
+        last_chi = EXCLUDED.last_chi,
+        prev_chi = EXCLUDED.prev_chi,
+        last_at = EXCLUDED.last_at,
+        last_id = EXCLUDED.last_id;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_chi_results_rollup ON chi_results;
+CREATE TRIGGER trg_chi_results_rollup
+    AFTER INSERT ON chi_results
+    FOR EACH ROW EXECUTE FUNCTION update_region_rollup();
+
+-- One-time backfill from existing history (no-op once rollups exist)
+INSERT INTO region_rollups (
+    area_type, sub_region, day, analyses, chi_sum, chi_sum_sq,
+    chi_min, chi_max, last_chi, prev_chi, last_at, last_id
+)
+SELECT
+    area_type, sub_region, day, COUNT(*), SUM(chi_value), SUM(chi_value * chi_value),
+    MIN(chi_value), MAX(chi_value),
+    MAX(chi_value) FILTER (WHERE rn = 1),
+    MAX(prev_chi) FILTER (WHERE rn = 1),
+    MAX(created_at),
+    MAX(id) FILTER (WHERE rn = 1)
+FROM (
+    SELECT
+        area_type,
+        COALESCE(sub_region, '') AS sub_region,
+        date AS day,
+        id,
+        chi_value,
+        created_at,
+        LAG(chi_value) OVER (PARTITION BY area_type, COALESCE(sub_region, '') ORDER BY created_at, id) AS prev_chi,
+        ROW_NUMBER() OVER (PARTITION BY area_type, COALESCE(sub_region, ''), date ORDER BY created_at DESC, id DESC) AS rn
+    FROM chi_results
+) AS ordered
+WHERE NOT EXISTS (SELECT 1 FROM region_rollups)
+GROUP BY area_type, sub_region, day;
+
+COMMENT ON TABLE region_rollups IS 'Per-region daily CHI aggregates maintained by trg_chi_results_rollup';
+
+-- Full rebuild after chi_results rows were updated in place (rescore.py);
+-- the trigger only maintains rollups on insert
+CREATE OR REPLACE FUNCTION rebuild_region_rollups() RETURNS VOID AS $$
+BEGIN
+    DELETE FROM region_rollups;
+
+    INSERT INTO region_rollups (
+        area_type, sub_region, day, analyses, chi_sum, chi_sum_sq,
+        chi_min, chi_max, last_chi, prev_chi, last_at, last_id
+    )
+    SELECT
+        area_type, sub_region, day, COUNT(*), SUM(chi_value), SUM(chi_value * chi_value),
+        MIN(chi_value), MAX(chi_value),
+        MAX(chi_value) FILTER (WHERE rn = 1),
+        MAX(prev_chi) FILTER (WHERE rn = 1),
+        MAX(created_at),
+        MAX(id) FILTER (WHERE rn = 1)
+    FROM (
+        SELECT
+            area_type,
+            COALESCE(sub_region, '') AS sub_region,
+            date AS day,
+            id,
+            chi_value,
+            created_at,
+            LAG(chi_value) OVER (PARTITION BY area_type, COALESCE(sub_region, '') ORDER BY created_at, id) AS prev_chi,
+            ROW_NUMBER() OVER (PARTITION BY area_type, COALESCE(sub_region, ''), date ORDER BY created_at DESC, id DESC) AS rn
+        FROM chi_results
+    ) AS ordered
+    GROUP BY area_type, sub_region, day;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rollups written before last_id existed are rebuilt once
+SELECT rebuild_region_rollups() WHERE EXISTS (SELECT 1 FROM region_rollups WHERE last_id IS NULL);
+
+-- ============================================================
+-- Aggregation views (dashboard endpoints)
+-- ============================================================
+-- Per-area and per-region avg/count/latest for /get-bangalore-summary and
+-- /get-rvce-results, computed from region_rollups (one row per region-day)
+-- rather than the whole chi_results history. Safe to re-run.
+
+DROP VIEW IF EXISTS chi_area_summary;
+DROP VIEW IF EXISTS chi_region_summary;
+
+-- View: chi_area_summary (one row per area_type)
+CREATE VIEW chi_area_summary AS
+WITH ranked AS (
+    SELECT
+        r.*,
+        ROW_NUMBER() OVER (PARTITION BY area_type ORDER BY last_at DESC, last_id DESC) AS rn
+    FROM region_rollups r
+)
+SELECT
+    area_type,
+    SUM(analyses) AS analyses,
+    SUM(chi_sum) / NULLIF(SUM(analyses), 0) AS avg_chi,
+    MAX(last_at) AS last_updated,
+    MAX(last_chi) FILTER (WHERE rn = 1) AS latest_chi,
+    MAX(prev_chi) FILTER (WHERE rn = 1) AS previous_chi,
+    MIN(chi_min) AS min_chi,
+    MAX(chi_max) AS max_chi,
+    SUM(chi_sum_sq) AS chi_sum_sq
+FROM ranked
+GROUP BY area_type;
+
+-- View: chi_region_summary (one row per area_type + sub_region)
+CREATE VIEW chi_region_summary AS
+WITH ranked AS (
+    SELECT
+        r.*,
+        ROW_NUMBER() OVER (PARTITION BY area_type, sub_region ORDER BY last_at DESC, last_id DESC) AS rn
+    FROM region_rollups r
+)
+SELECT
+    area_type,
+    NULLIF(sub_region, '') AS sub_region,
+    SUM(analyses) AS analyses,
+    SUM(chi_sum) / NULLIF(SUM(analyses), 0) AS avg_chi,
+    MAX(last_at) AS last_updated,
+    MAX(last_chi) FILTER (WHERE rn = 1) AS latest_chi,
+    MAX(prev_chi) FILTER (WHERE rn = 1) AS previous_chi,
+    MIN(chi_min) AS min_chi,
+    MAX(chi_max) AS max_chi,
+    SUM(chi_sum_sq) AS chi_sum_sq
+FROM ranked
+GROUP BY area_type, sub_region;
+
+COMMENT ON VIEW chi_area_summary IS 'Per-area CHI average, count and latest values';
+COMMENT ON VIEW chi_region_summary IS 'Per-region CHI average, count and latest values';
+
 -- ============================================================
 -- After running this SQL:
 -- 1. Go to Table Editor to verify tables were created
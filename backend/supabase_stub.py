@@ -0,0 +1,248 @@
+"""
+Supabase Stub Server
+In-memory stand-in for the Supabase REST and Storage APIs, for offline load tests
+
+Implements just enough of PostgREST (/rest/v1) and Storage (/storage/v1)
+for the backend's write and read paths: inserts return the stored rows with
+ids, the insert_analyses RPC returns ids per item, update_chi_results
+updates stored rows by id, selects return stored rows (filters are
+ignored) and objects are kept in memory. Connections are
+HTTP/1.1 keep-alive, and an artificial latency and error rate can be set to
+exercise the client pool and its retries:
+
+    python supabase_stub.py serve --port 54321 --latency-ms 20
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_KEY=stub.stub.stub python app.py
+
+    python supabase_stub.py bench --requests 2000 --concurrency 32
+
+bench starts a stub in-process, runs concurrent inserts through
+database.Database and prints throughput, latency percentiles and the
+client's pool stats (supabase_client.pool_stats).
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+STUB_KEY = 'stub.stub.stub'  # create_client only checks the JWT shape
+
+
+class StubState:
+    """Tables and storage objects of one stub server"""
+
+    def __init__(self, latency_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.tables = defaultdict(list)
+        self.next_id = defaultdict(int)
+        self.objects = {}
+
+    def insert(self, table: str, rows: list) -> list:
+        with self.lock:
+            stored = []
+            for row in rows:
+                self.next_id[table] += 1
+                stored.append({**row, 'id': self.next_id[table]})
+            self.tables[table].extend(stored)
+            return stored
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """PostgREST / Storage request handler (state is on the server)"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _reply(self, status: int, payload=None, raw: bytes = None, content_type='application/json'):
+        body = raw if raw is not None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str):
+        state: StubState = self.server.state
+        body = self._body()
+        if state.latency:
+            time.sleep(state.latency)
+        if state.error_rate and random.random() < state.error_rate:
+            return self._reply(503, {'message': 'stub: injected failure'})
+
+        path = urlsplit(self.path).path
+        if path.startswith('/rest/v1/rpc/'):
+            return self._rpc(state, path[len('/rest/v1/rpc/'):], json.loads(body or b'{}'))
+        if path.startswith('/rest/v1/'):
+            return self._table(state, method, path[len('/rest/v1/'):], body)
+        if path.startswith('/storage/v1/object/'):
+            return self._object(state, method, path[len('/storage/v1/object/'):], body)
+        return self._reply(404, {'message': f'stub: no route for {path}'})
+
+    def _rpc(self, state: StubState, name: str, params: dict):
+        if name == 'insert_analyses':
+            rows = []
+            for ordinal, item in enumerate(params.get('items', []), start=1):
+                image = state.insert('image_metadata', [item])[0]
+                result = state.insert('chi_results', [{**item, 'image_id': image['id']}])[0]
+                rows.append({'ordinal': ordinal, 'new_image_id': image['id'],
+                             'new_result_id': result['id']})
+            return self._reply(200, rows)
+        if name == 'update_chi_results':
+            updates = {item['id']: item for item in params.get('items', [])}
+            updated = 0
+            with state.lock:
+                for row in state.tables['chi_results']:
+                    item = updates.get(row['id'])
+                    if item is not None:
+                        row.update({key: value for key, value in item.items() if key != 'id'})
+                        updated += 1
+            return self._reply(200, updated)
+        return self._reply(200, None)
+
+    def _table(self, state: StubState, method: str, table: str, body: bytes):
+        if method == 'GET':
+            with state.lock:
+                rows = list(state.tables[table])
+            return self._reply(200, rows)
+        if method == 'POST':
+            payload = json.loads(body or b'[]')
+            rows = state.insert(table, payload if isinstance(payload, list) else [payload])
+            return self._reply(201, rows)
+        # PATCH / DELETE: accepted, nothing changed
+        return self._reply(200, [])
+
+    def _object(self, state: StubState, method: str, key: str, body: bytes):
+        if method in ('POST', 'PUT'):
+            with state.lock:
+                state.objects[key] = body
+            return self._reply(200, {'Key': key})
+        if method == 'GET':
+            key = key[len('authenticated/'):] if key.startswith('authenticated/') else key
+            with state.lock:
+                data = state.objects.get(key)
+            if data is None:
+                return self._reply(404, {'message': 'stub: object not found'})
+            return self._reply(200, raw=data, content_type='application/octet-stream')
+        if method == 'DELETE':
+            return self._reply(200, [])
+        return self._reply(405, {'message': 'stub: method not allowed'})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+def start_stub(port: int = 0, latency_ms: float = 0.0, error_rate: float = 0.0,
+               host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Start a stub server on a daemon thread (port 0 picks a free port)"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(latency_ms, error_rate)
+    threading.Thread(target=server.serve_forever, name='supabase-stub', daemon=True).start()
+    return server
+
+
+def bench(requests: int, concurrency: int, latency_ms: float, error_rate: float, batch: int):
+    """Run concurrent inserts against an in-process stub and print the results"""
+    server = start_stub(latency_ms=latency_ms, error_rate=error_rate)
+    # Config reads the environment on import, so point it at the stub first
+    os.environ['SUPABASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+    os.environ['SUPABASE_SERVICE_KEY'] = STUB_KEY
+    from database import Database
+    from supabase_client import pool_stats
+
+    db = Database()
+    analysis = {
+        'filename': 'bench.jpg', 'storage_path': 'RVCE/bench.jpg', 'area_type': 'RVCE',
+        'sub_region': 'Campus', 'date': '2026-01-01', 'chi_value': 70.0, 'status': 'Good',
+        'interpretation': 'bench', 'vegetation_coverage': 50.0,
+        'healthy_vegetation': 40.0, 'stressed_vegetation': 10.0
+    }
+
+    def write(_):
+        started = time.perf_counter()
+        if batch > 1:
+            db.insert_analyses([analysis] * batch)
+        else:
+            db.insert_chi_result(1, analysis['area_type'], analysis['sub_region'],
+                                 analysis['chi_value'], analysis['status'],
+                                 analysis['interpretation'], analysis['date'],
+                                 analysis['vegetation_coverage'],
+                                 analysis['healthy_vegetation'],
+                                 analysis['stressed_vegetation'])
+        return time.perf_counter() - started
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(write, range(requests)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    def percentile(p):
+        return latencies[int(p * (len(latencies) - 1))] * 1000
+
+    print(f"✅ {requests} requests ({requests * batch} rows) in {elapsed:.2f}s: "
+          f"{requests / elapsed:.0f} req/s, p50 {percentile(0.5):.1f} ms, "
+          f"p95 {percentile(0.95):.1f} ms, p99 {percentile(0.99):.1f} ms")
+    print(f"   Pool: {json.dumps(pool_stats())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='In-memory Supabase stub for offline load tests')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Run the stub server')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=54321)
+    serve.add_argument('--latency-ms', type=float, default=0.0, help='Delay added to every request')
+    serve.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered 503')
+
+    load = commands.add_parser('bench', help='Load-test the pooled client against an in-process stub')
+    load.add_argument('--requests', type=int, default=1000)
+    load.add_argument('--concurrency', type=int, default=32)
+    load.add_argument('--latency-ms', type=float, default=5.0)
+    load.add_argument('--error-rate', type=float, default=0.0)
+    load.add_argument('--batch', type=int, default=1, help='Analyses per insert_analyses call (1 = single inserts)')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        server = start_stub(args.port, args.latency_ms, args.error_rate, host=args.host)
+        print(f"✅ Supabase stub listening on http://{args.host}:{server.server_address[1]}")
+        print(f"   Use SUPABASE_URL=http://{args.host}:{server.server_address[1]} "
+              f"SUPABASE_SERVICE_KEY={STUB_KEY}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        bench(args.requests, args.concurrency, args.latency_ms, args.error_rate, args.batch)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,13 @@
 """
 Vegetation Detection Module
-PLACEHOLDER - To be implemented with AI/ML models
+Classical color-space segmentation today, AI/ML models later
 
-This module will handle:
+This module handles:
 1. Vegetation segmentation from satellite/aerial imagery
-2. Healthy vs stressed vegetation classification
+   (Excess Green + Otsu threshold + morphology, see detect_vegetation)
+2. Healthy vs stressed vegetation classification (GRVI)
 3. Vegetation coverage calculation
-4. Species identification (optional advanced feature)
+4. Species identification (optional advanced feature, not implemented)
 
 Future Implementation Approaches:
 1. Deep Learning: Use U-Net, DeepLab, or similar segmentation models
@@ -19,128 +20,365 @@ Recommended Models:
 - Custom trained models on vegetation datasets
 """
 
+import os
+import threading
+from collections import deque
+
 try:
     import numpy as np
 except Exception:
     np = None
-from typing import Dict, Tuple, Any
+from typing import Dict, Tuple, Any, Iterable, Iterator
+
+from config import Config
+from model_registry import get_registry
+from batching import MicroBatcher
+from mask_stats import (
+    MaskStats, compute_mask_stats, compute_label_stats, split_labels,
+    LABEL_NON_VEGETATION, LABEL_HEALTHY, LABEL_STRESSED
+)
+
+
+# Excess Green (2G - R - B, on 0-255 channels) segmentation. The Otsu
+# threshold adapts to each frame/tile but is bounded, so a tile that is all
+# canopy (or all pavement) is not split in half along its own histogram.
+EXG_THRESHOLD_RANGE = (20, 50)
 
+# Opening then closing with a (2r+1) x (2r+1) square removes isolated
+# speckle and fills pinholes in the canopy
+MORPHOLOGY_RADIUS = 1
 
-def detect_vegetation(image: Any) -> Any:
+# Vegetation pixels with GRVI = (G - R) / (G + R) above this are healthy;
+# yellowing/browning leaves drive red above green
+GRVI_HEALTHY_THRESHOLD = 0.05
+
+
+def detect_vegetation(image: Any, threshold: int = None,
+                      morphology_radius: int = MORPHOLOGY_RADIUS) -> Any:
     """
-    Detect and segment vegetation in image
+    Detect and segment vegetation in an RGB image
     
-    TODO: Implement actual vegetation detection using AI/ML
+    Classical color-space segmentation: Excess Green index thresholded with
+    Otsu's method (clamped to EXG_THRESHOLD_RANGE), followed by a binary
+    opening and closing. All steps are vectorized NumPy over uint8/int16
+    arrays; a 4k x 4k frame takes well under a second on one core.
     
-    Approaches:
-    1. Deep Learning (Recommended):
-       - Load pre-trained segmentation model (U-Net, DeepLabV3)
-       - Run inference on preprocessed image
-       - Return binary mask of vegetation areas
-       
-    2. Traditional Computer Vision:
-       - Convert to HSV color space
-       - Threshold green channel
-       - Apply morphological operations
-       - Return vegetation mask
+    A learned segmentation model (U-Net, DeepLabV3) can replace this later
+    behind the same signature.
     
     Args:
-        image: Preprocessed image (numpy array)
+        image: RGB image, uint8 (0-255) or float (0-1) as produced by
+            preprocessing; extra bands beyond RGB are ignored
+        threshold: Fixed ExG threshold; None picks one per image with Otsu
+        morphology_radius: Structuring element radius (0 disables cleanup)
         
     Returns:
-        Binary mask where 1 = vegetation, 0 = non-vegetation
-        
-    Example implementation (commented out):
-    ```python
-    import tensorflow as tf
-    
-    # Load trained model
-    model = tf.keras.models.load_model('models/vegetation_segmentation.h5')
+        Binary uint8 mask where 1 = vegetation, 0 = non-vegetation
+    """
+    # If numpy is unavailable, return a minimal placeholder
+    if np is None:
+        print('[VEGETATION DETECTION] NumPy not available — returning minimal placeholder mask')
+        return [[0]]
+
+    exg = excess_green(to_uint8(image))
+
+    if threshold is None:
+        low, high = EXG_THRESHOLD_RANGE
+        threshold = min(max(otsu_threshold(exg), low), high)
+
+    mask = exg > threshold
+    if morphology_radius > 0:
+        mask = binary_closing(binary_opening(mask, morphology_radius), morphology_radius)
+
+    return mask.view(np.uint8)
+
+
+def detect_vegetation_batch(images: Any, threshold: int = None,
+                            morphology_radius: int = MORPHOLOGY_RADIUS) -> Any:
+    """
+    Segment a stack of same-sized images in one pass
     
-    # Prepare input
-    img_input = np.expand_dims(image, axis=0)
+    Same result as detect_vegetation on each image (Otsu thresholds are
+    still chosen per image), but the ExG, comparison and morphology run as
+    single operations over the whole (N, H, W, C) array.
     
-    # Predict
-    mask = model.predict(img_input)[0]
+    Args:
+        images: Array of shape (N, H, W, C), uint8 or float 0-1
+        
+    Returns:
+        uint8 masks of shape (N, H, W)
+    """
+    exg = excess_green(to_uint8(images))
+
+    if threshold is None:
+        low, high = EXG_THRESHOLD_RANGE
+        thresholds = np.array([min(max(otsu_threshold(item), low), high) for item in exg],
+                              dtype=np.int16)
+    else:
+        thresholds = np.full(len(exg), threshold, dtype=np.int16)
+
+    masks = exg > thresholds[:, np.newaxis, np.newaxis]
+    if morphology_radius > 0:
+        masks = binary_closing(binary_opening(masks, morphology_radius), morphology_radius)
+
+    return masks.view(np.uint8)
+
+
+def classify_vegetation_labels(image: Any, mask: Any) -> Any:
+    """
+    Classify vegetation health into a single label raster
     
-    # Threshold
-    vegetation_mask = (mask > 0.5).astype(np.uint8)
+    Uses the Green-Red Vegetation Index GRVI = (G - R) / (G + R): green,
+    photosynthetically active canopy has G well above R, while chlorosis
+    (yellowing) and necrosis (browning) push red up. Deterministic, so the
+    same image always gets the same breakdown.
     
-    return vegetation_mask
-    ```
+    Args:
+        image: Original preprocessed image (uint8 or float 0-1 RGB)
+        mask: Vegetation segmentation mask
+        
+    Returns:
+        uint8 raster: LABEL_NON_VEGETATION (0), LABEL_HEALTHY (1) or
+        LABEL_STRESSED (2) per pixel (see mask_stats)
     """
-    print("[VEGETATION DETECTION] Detecting vegetation in image")
-    print("[VEGETATION DETECTION] ⚠️ Using placeholder - implement AI model")
-
-    # If numpy is unavailable, return a minimal placeholder
+    # If numpy is unavailable, label all vegetation healthy (one byte per pixel)
     if np is None:
-        print('[VEGETATION DETECTION] NumPy not available — returning minimal placeholder mask')
-        return [[0]]
+        print('[VEGETATION DETECTION] NumPy not available — returning minimal health labels')
+        return [bytearray(LABEL_HEALTHY if v else LABEL_NON_VEGETATION for v in row) for row in mask]
+
+    rgb = to_uint8(image)
+    red = rgb[..., 0].astype(np.int32)
+    green = rgb[..., 1].astype(np.int32)
 
-    # Placeholder: return dummy mask
-    height, width = image.shape[:2]
-    dummy_mask = np.random.rand(height, width) > 0.6
+    # GRVI > t  <=>  1000 * (G - R) > 1000 * t * (G + R), in integer arithmetic
+    scale = int(round(GRVI_HEALTHY_THRESHOLD * 1000))
+    healthy = (green - red) * 1000 > scale * (green + red)
 
-    return dummy_mask.astype(np.uint8)
+    labels = np.array(mask, dtype=bool).view(np.uint8)  # vegetation -> 1 (healthy)
+    stressed = labels.view(bool) & ~healthy
+    labels += stressed.view(np.uint8)  # stressed -> 2
+    return labels
 
 
 def classify_vegetation_health(image: Any, mask: Any) -> Tuple[Any, Any]:
     """
     Classify vegetation into healthy and stressed categories
     
-    TODO: Implement vegetation health classification
-    
-    Indicators of stressed vegetation:
-    - Yellowing (chlorosis)
-    - Browning (necrosis)
-    - Reduced reflectance in NIR band
-    - Lower NDVI values
+    Separate-mask form of classify_vegetation_labels; prefer the label
+    raster, which needs a third of the memory.
     
     Args:
         image: Original preprocessed image
         mask: Vegetation segmentation mask
         
     Returns:
-        Tuple of (healthy_mask, stressed_mask)
-        
-    Example implementation:
-    ```python
-    # Extract vegetation pixels
-    veg_pixels = image[mask == 1]
+        Tuple of (healthy_mask, stressed_mask), uint8, disjoint, covering mask
+    """
+    labels = classify_vegetation_labels(image, mask)
+    if np is None:
+        return ([[int(v == LABEL_HEALTHY) for v in row] for row in labels],
+                [[int(v == LABEL_STRESSED) for v in row] for row in labels])
+    _, healthy_mask, stressed_mask = split_labels(labels)
+    return healthy_mask, stressed_mask
+
+
+def to_uint8(image: Any) -> Any:
+    """Return the RGB bands of an image as uint8 (float input is taken as 0-1)"""
+    image = np.asarray(image)
+    if image.ndim == 2:
+        image = image[..., np.newaxis]
+    if image.shape[-1] < 3:
+        image = np.repeat(image[..., :1], 3, axis=2)
+    rgb = image[..., :3]
+
+    if rgb.dtype == np.uint8:
+        return rgb
+
+    out = np.empty(rgb.shape, dtype=np.uint8)
+    if np.issubdtype(rgb.dtype, np.floating):
+        scaled = np.multiply(rgb, 255.0, dtype=np.float32)
+        scaled += 0.5
+        np.clip(scaled, 0, 255, out=scaled)
+        out[...] = scaled
+    else:
+        np.clip(rgb, 0, 255, out=out, casting='unsafe')
+    return out
+
+
+def excess_green(rgb: Any) -> Any:
+    """Excess Green index 2G - R - B of a uint8 RGB image, as int16 (-510..510)"""
+    exg = rgb[..., 1].astype(np.int16)
+    exg *= 2
+    exg -= rgb[..., 0]
+    exg -= rgb[..., 2]
+    return exg
+
+
+def index_rasters(image: Any) -> Dict[str, Any]:
+    """
+    Spectral index rasters behind segmentation and health classification
     
-    # Calculate health indicators
-    # E.g., green ratio, NDVI if multispectral
-    green_ratio = veg_pixels[:, :, 1] / (veg_pixels.sum(axis=2) + 1e-6)
+    Kept with the label artifacts (artifacts.ArtifactRecorder), so formulas
+    that weigh index values can be re-scored without the original image.
     
-    # Classify
-    healthy = green_ratio > threshold
-    stressed = ~healthy
+    Returns:
+        {'exg': Excess Green as int16, 'grvi': GRVI as float32 (-1..1, 0 on black)}
+    """
+    rgb = to_uint8(image)
+    red = rgb[..., 0].astype(np.float32)
+    green = rgb[..., 1].astype(np.float32)
+    total = red + green
+    grvi = np.divide(green - red, total, out=np.zeros_like(total), where=total > 0)
+    return {'exg': excess_green(rgb), 'grvi': grvi}
+
+
+def otsu_threshold(values: Any) -> int:
+    """
+    Otsu's threshold for an integer-valued array
     
-    return healthy_mask, stressed_mask
-    ```
+    Builds the histogram with one bincount and evaluates the between-class
+    variance for every candidate threshold at once via cumulative sums.
+    
+    Returns:
+        Threshold t; pixels with value > t form the foreground class
     """
-    print("[VEGETATION DETECTION] Classifying vegetation health")
-    print("[VEGETATION DETECTION] ⚠️ Using placeholder - implement classification")
+    values = np.asarray(values)
+    if values.size == 0:
+        return 0
+    low = int(values.min())
+    hist = np.bincount((values - low).ravel()).astype(np.float64)
 
-    # If numpy is unavailable, return simple placeholders
-    if np is None:
-        print('[VEGETATION DETECTION] NumPy not available — returning minimal health masks')
-        return mask, [[0 for _ in range(len(mask[0]))] for _ in range(len(mask))]
+    levels = np.arange(hist.size, dtype=np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    mass_bg = np.cumsum(hist * levels)
+    mass_fg = mass_bg[-1] - mass_bg
 
-    # Placeholder: split vegetation randomly
-    healthy_mask = mask.copy()
-    stressed_mask = np.zeros_like(mask)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = weight_bg * weight_fg * (mass_bg / weight_bg - mass_fg / weight_fg) ** 2
+    between = np.nan_to_num(between, nan=0.0, posinf=0.0, neginf=0.0)
 
-    # Simulate 70% healthy, 30% stressed
-    stressed_indices = np.random.rand(*mask.shape) < 0.3
-    healthy_mask[stressed_indices] = 0
-    stressed_mask[stressed_indices & (mask == 1)] = 1
+    return int(np.argmax(between)) + low
 
-    return healthy_mask, stressed_mask
+
+def binary_erosion(mask: Any, radius: int = 1) -> Any:
+    """Erode a boolean mask with a (2r+1) square (pixels outside the image don't erode)"""
+    return _separable_filter(mask, radius, np.logical_and)
+
+
+def binary_dilation(mask: Any, radius: int = 1) -> Any:
+    """Dilate a boolean mask with a (2r+1) square"""
+    return _separable_filter(mask, radius, np.logical_or)
 
 
-def calculate_vegetation_metrics(mask: Any, healthy_mask: Any, 
-                                  stressed_mask: Any) -> Dict[str, float]:
+def binary_opening(mask: Any, radius: int = 1) -> Any:
+    """Erosion followed by dilation: removes specks smaller than the element"""
+    return binary_dilation(binary_erosion(mask, radius), radius)
+
+
+def binary_closing(mask: Any, radius: int = 1) -> Any:
+    """Dilation followed by erosion: fills holes smaller than the element"""
+    return binary_erosion(binary_dilation(mask, radius), radius)
+
+
+def _separable_filter(mask: Any, radius: int, combine) -> Any:
+    """
+    Square min/max filter as two 1-D passes of shifted whole-array ops
+    
+    Each pass combines the mask with copies of itself shifted by 1..radius
+    pixels along one axis, so the cost is 4 * radius vectorized boolean
+    operations regardless of image size.
+    """
+    out = np.array(mask, dtype=bool)
+    # Filter the last two (row, column) axes, so a stack of masks works too
+    for axis in (out.ndim - 2, out.ndim - 1):
+        src = out.copy()
+        for k in range(1, radius + 1):
+            if k >= out.shape[axis]:
+                break
+            lead = [slice(None)] * out.ndim
+            lag = [slice(None)] * out.ndim
+            lead[axis], lag[axis] = slice(k, None), slice(None, -k)
+            combine(out[tuple(lead)], src[tuple(lag)], out=out[tuple(lead)])
+            combine(out[tuple(lag)], src[tuple(lead)], out=out[tuple(lag)])
+    return out
+
+
+def detect_vegetation_tiled(tiles: Iterable[Any]) -> Iterator[Any]:
+    """
+    Run detection and health classification tile by tile
+    
+    Consumes the generator from preprocessing.preprocess_image(path, tiled=True)
+    and crops every mask to the tile's core region, so overlap context is
+    used for detection but never counted twice downstream. Segmentation uses
+    the active 'vegetation' model from the registry, which must have been
+    warmed up (model_registry.warm_up) in this process, through the shared
+    micro-batcher when Config.MICROBATCH_ENABLED is set.
+    
+    Args:
+        tiles: Iterable of preprocessing.Tile
+        
+    Yields:
+        uint8 label raster (see classify_vegetation_labels) for each core
+    """
+    batcher = get_batcher()
+    if batcher is None:
+        model = get_registry().get(MODEL_NAME)
+        for tile in tiles:
+            yield _tile_labels(tile, model.predict(tile.data))
+        return
+
+    # Keep up to one batch of this image's tiles in flight; they are stacked
+    # together with tiles from concurrent requests by the shared batcher
+    pending = deque()
+    for tile in tiles:
+        pending.append((tile, batcher.submit(tile.data)))
+        if len(pending) >= batcher.max_batch_size:
+            tile, future = pending.popleft()
+            yield _tile_labels(tile, future.result())
+    while pending:
+        tile, future = pending.popleft()
+        yield _tile_labels(tile, future.result())
+
+
+def _tile_labels(tile: Any, mask: Any) -> Any:
+    """Classify a tile's vegetation mask and crop the labels to the tile core"""
+    return classify_vegetation_labels(tile.data, mask)[tile.core]
+
+
+_batcher = None
+_batcher_pid = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """
+    Get this process's segmentation micro-batcher (None if disabled)
+    
+    Created lazily, and again after a fork, since batcher threads do not
+    survive into pool worker processes. Batches always run on the model
+    version active at that moment, so hot swaps apply immediately.
+    """
+    global _batcher, _batcher_pid
+    if not Config.MICROBATCH_ENABLED:
+        return None
+    with _batcher_lock:
+        if _batcher is None or _batcher_pid != os.getpid():
+            _batcher = MicroBatcher(
+                lambda batch: get_registry().get(MODEL_NAME).predict_batch(batch),
+                max_batch_size=Config.MICROBATCH_MAX_SIZE,
+                max_wait_ms=Config.MICROBATCH_MAX_WAIT_MS,
+                workers=Config.MICROBATCH_WORKERS,
+                name='uchi-segment'
+            )
+            _batcher_pid = os.getpid()
+        return _batcher
+
+
+def calculate_vegetation_metrics(mask: Any, healthy_mask: Any = None, 
+                                  stressed_mask: Any = None,
+                                  stats: MaskStats = None,
+                                  labels: Any = None) -> Dict[str, float]:
     """
     Calculate vegetation coverage metrics
     
@@ -148,59 +386,107 @@ def calculate_vegetation_metrics(mask: Any, healthy_mask: Any,
         mask: Total vegetation mask
         healthy_mask: Healthy vegetation mask
         stressed_mask: Stressed vegetation mask
+        stats: Precomputed mask_stats.MaskStats; skips counting the masks again
+        labels: Label raster (plain or PackedLabels) instead of the three masks
         
     Returns:
         Dictionary with metrics
     """
-    # If numpy is unavailable, compute simple counts using Python
-    if np is None:
-        print('[VEGETATION DETECTION] NumPy not available — computing simple metrics')
-        total_pixels = len(mask) * len(mask[0]) if mask and mask[0] else 1
-        veg_pixels = sum(sum(1 for v in row if v) for row in mask)
-        healthy_pixels = sum(sum(1 for v in row if v) for row in healthy_mask)
-        stressed_pixels = sum(sum(1 for v in row if v) for row in stressed_mask)
-
-        metrics = {
-            'total_coverage': (veg_pixels / total_pixels) * 100,
-            'healthy_percentage': (healthy_pixels / (veg_pixels + 1e-6)) * 100,
-            'stressed_percentage': (stressed_pixels / (veg_pixels + 1e-6)) * 100,
-            'vegetation_pixels': int(veg_pixels),
-            'healthy_pixels': int(healthy_pixels),
-            'stressed_pixels': int(stressed_pixels)
-        }
-
-        return metrics
-
-    total_pixels = mask.size
-    veg_pixels = np.sum(mask)
-    healthy_pixels = np.sum(healthy_mask)
-    stressed_pixels = np.sum(stressed_mask)
+    if stats is None:
+        stats = (compute_label_stats(labels) if labels is not None
+                 else compute_mask_stats(mask, healthy_mask, stressed_mask))
 
     metrics = {
-        'total_coverage': (veg_pixels / total_pixels) * 100,
-        'healthy_percentage': (healthy_pixels / (veg_pixels + 1e-6)) * 100,
-        'stressed_percentage': (stressed_pixels / (veg_pixels + 1e-6)) * 100,
-        'vegetation_pixels': int(veg_pixels),
-        'healthy_pixels': int(healthy_pixels),
-        'stressed_pixels': int(stressed_pixels)
+        'total_coverage': stats.coverage,
+        'healthy_percentage': stats.healthy_percentage,
+        'stressed_percentage': stats.stressed_percentage,
+        'vegetation_pixels': stats.vegetation_pixels,
+        'healthy_pixels': stats.healthy_pixels,
+        'stressed_pixels': stats.stressed_pixels
     }
 
     return metrics
 
 
+class ClassicalSegmenter:
+    """Model wrapper around detect_vegetation (no weights, thread-safe)"""
+
+    thread_safe = True
+
+    def __init__(self, threshold: int = None, morphology_radius: int = MORPHOLOGY_RADIUS):
+        self.threshold = threshold
+        self.morphology_radius = morphology_radius
+
+    def predict(self, image: Any) -> Any:
+        return detect_vegetation(image, threshold=self.threshold,
+                                 morphology_radius=self.morphology_radius)
+
+    def predict_batch(self, images: Any) -> Any:
+        return detect_vegetation_batch(images, threshold=self.threshold,
+                                       morphology_radius=self.morphology_radius)
+
+
+class KerasSegmenter:
+    """Model wrapper for a saved Keras segmentation model (mask = sigmoid > 0.5)"""
+
+    # Keras predict() is not reentrant across threads in every TF build
+    thread_safe = False
+
+    def __init__(self, model: Any):
+        self.model = model
+
+    def predict(self, image: Any) -> Any:
+        return self.predict_batch(np.expand_dims(image, axis=0))[0]
+
+    def predict_batch(self, images: Any) -> Any:
+        probabilities = self.model.predict(np.asarray(images, dtype=np.float32), verbose=0)
+        return (probabilities[..., 0] > 0.5).astype(np.uint8)
+
+
+MODEL_NAME = 'vegetation'
+CLASSICAL_VERSION_PREFIX = 'classical'
+
+
 def load_vegetation_model(model_path: str = None):
     """
-    Load pre-trained vegetation detection model
+    Load a vegetation detection model version
     
-    TODO: Implement model loading
+    Registered as the model registry's 'vegetation' loader, so it runs once
+    per process and version; use get_registry().get('vegetation') for
+    inference instead of calling this per request.
     
     Args:
-        model_path: Path to saved model file
+        model_path: Version name ('classical-*' for the ExG segmenter) or
+            path of an exported model. A bare version is looked up as
+            Config.MODEL_FOLDER/vegetation/<version>.onnx (ONNX Runtime,
+            preferred) and then <version>.keras (TensorFlow)
         
     Returns:
-        Loaded model
+        Model object with predict(image) -> vegetation mask
     """
-    print("[VEGETATION DETECTION] Loading vegetation detection model")
-    print("[VEGETATION DETECTION] ⚠️ Model loading not implemented yet")
-    
-    return None
+    version = model_path or Config.VEGETATION_MODEL_VERSION
+    if version.startswith(CLASSICAL_VERSION_PREFIX):
+        return ClassicalSegmenter()
+
+    path = version
+    if not os.path.exists(path):
+        candidates = [os.path.join(Config.MODEL_FOLDER, MODEL_NAME, f'{version}{ext}')
+                      for ext in ('.onnx', '.keras')]
+        path = next((candidate for candidate in candidates if os.path.exists(candidate)), None)
+    if path is None:
+        raise FileNotFoundError(f'Vegetation model not found: {version}')
+
+    if path.endswith('.onnx'):
+        from onnx_inference import OnnxSegmenter
+        return OnnxSegmenter(path)
+
+    try:
+        import tensorflow as tf
+    except ImportError:
+        raise RuntimeError('TensorFlow is required to load Keras vegetation models')
+
+    return KerasSegmenter(tf.keras.models.load_model(path))
+
+
+get_registry().register_loader(MODEL_NAME, load_vegetation_model,
+                               default_version=Config.VEGETATION_MODEL_VERSION)
@@ -129,7 +129,7 @@ export const healthCheck = async (): Promise<HealthCheckResponse> => {
     services: {
       database: true,
       storage: true,
-      aiModule: false, // Will be true when AI integration is complete
+      aiModule: true,
     },
   };
 };